@@ -0,0 +1,56 @@
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from api.v1.responses import representation_etag
+from core.config import response_compression_settings
+from core.content_encoding import encode, negotiate
+from core.timing import phase
+
+
+class CompressionMiddleware:
+    """
+    Сжимает ответы, для которых нет заранее сжатого варианта (страницы курсора, ошибки, метрики).
+    Ответы из кеша приходят уже с Content-Encoding и не трогаются, как и потоковые ответы из нескольких частей.
+    Написан как ASGI-middleware, а не через call_next: так на каждый запрос не создается лишняя задача.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        encoding = negotiate(Headers(scope=scope).get('accept-encoding')) if scope['type'] == 'http' else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Message | None = None
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start
+            if message['type'] == 'http.response.start':
+                # Заголовки отправляем вместе с первой частью тела, когда станет ясно, сжимать ли его.
+                start = message
+                return
+            if start is None:
+                await send(message)
+                return
+            body = message.get('body', b'')
+            headers = MutableHeaders(raw=start['headers'])
+            if (
+                    not message.get('more_body') and 'content-encoding' not in headers
+                    and len(body) >= response_compression_settings.min_size
+            ):
+                with phase('compress'):
+                    body = encode(body, encoding)
+                headers['Content-Encoding'] = encoding
+                headers['Content-Length'] = str(len(body))
+                if 'etag' in headers:
+                    # Строгий ETag сжатого представления отличается от ETag несжатого.
+                    headers['ETag'] = representation_etag(headers['etag'], encoding)
+                headers.add_vary_header('Accept-Encoding')
+                message = {**message, 'body': body}
+            await send(start)
+            start = None
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
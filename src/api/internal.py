@@ -0,0 +1,35 @@
+import secrets
+from http import HTTPStatus
+from typing import Annotated
+
+from fastapi import APIRouter, Header, HTTPException
+from pydantic import BaseModel, Field, StringConstraints
+
+from core.config import internal_api_settings
+from services.invalidation import invalidate
+
+# Создаем объект router для служебных эндпоинтов.
+router = APIRouter()
+
+# Тег сущности: вид и UUID.
+Tag = Annotated[str, StringConstraints(
+    pattern=r'^(film|genre|person):[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$'
+)]
+
+
+class InvalidateRequest(BaseModel):
+    tags: list[Tag] = Field(..., min_length=1, max_length=1000)
+
+
+class InvalidateResult(BaseModel):
+    deleted: int
+
+
+@router.post('/cache/invalidate', include_in_schema=False)
+async def cache_invalidate(
+        body: InvalidateRequest, x_internal_token: Annotated[str | None, Header()] = None
+) -> InvalidateResult:
+    # Сравнение за постоянное время, чтобы токен нельзя было подобрать по времени ответа.
+    if not x_internal_token or not secrets.compare_digest(x_internal_token, internal_api_settings.token):
+        raise HTTPException(status_code=HTTPStatus.FORBIDDEN, detail='forbidden')
+    return InvalidateResult(deleted=await invalidate(body.tags))
@@ -0,0 +1,58 @@
+import time
+
+from fastapi import APIRouter, Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.metrics import REQUEST_LATENCY, REQUESTS_IN_PROGRESS, RESPONSE_SIZE, render
+
+# Создаем объект router для служебного эндпоинта метрик.
+router = APIRouter()
+
+
+@router.get('', include_in_schema=False)
+async def metrics() -> Response:
+    data, content_type = render()
+    # Тип содержимого уже включает кодировку, поэтому задаем заголовок напрямую.
+    return Response(content=data, headers={'Content-Type': content_type})
+
+
+class MetricsMiddleware:
+    """
+    Измеряет время обработки и размер тела ответа каждого HTTP-запроса.
+    Написан как ASGI-middleware, а не через call_next: статус и размер берутся из отправляемых сообщений.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        method = scope['method']
+        in_progress = REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        started = time.perf_counter()
+        status: int | None = None
+        size = 0
+
+        async def send_measured(message: Message) -> None:
+            nonlocal status, size
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            elif message['type'] == 'http.response.body':
+                size += len(message.get('body', b''))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_measured)
+        finally:
+            in_progress.dec()
+            # Шаблон пути (/api/v1/films/{film_id}) вместо фактического, чтобы число серий не росло с данными.
+            # Роутер записывает найденный маршрут в тот же scope.
+            route = scope.get('route')
+            path = route.path if route is not None else 'unmatched'
+            REQUEST_LATENCY.labels(method, path, status or 500).observe(time.perf_counter() - started)
+            if status is not None:
+                RESPONSE_SIZE.labels(path).observe(size)
@@ -0,0 +1,44 @@
+import logging
+import time
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core import timing
+from core.config import server_timing_settings
+
+logger = logging.getLogger(__name__)
+
+
+class ServerTimingMiddleware:
+    """
+    Добавляет к ответу заголовок Server-Timing с длительностями фаз обработки
+    (redis, decode, elastic, validate, serialize, compress) и пишет в лог медленные запросы.
+    Написан как ASGI-middleware, а не через call_next: заголовок дописывается в начало ответа при отправке.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        timings = timing.start()
+        started = time.perf_counter()
+        total, value = 0.0, None
+
+        async def send_timed(message: Message) -> None:
+            nonlocal total, value
+            if message['type'] == 'http.response.start':
+                # Время считается до начала ответа, как и длительности фаз, которые к этому моменту известны.
+                total = time.perf_counter() - started
+                value = timing.header(timings, total)
+                MutableHeaders(scope=message)['Server-Timing'] = value
+            await send(message)
+
+        await self.app(scope, receive, send_timed)
+
+        if value and server_timing_settings.slow_request_ms and total * 1000 >= server_timing_settings.slow_request_ms:
+            logger.warning('Slow request %s %s: %.1f ms (%s)', scope['method'], scope['path'], total * 1000, value)
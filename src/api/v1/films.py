@@ -1,13 +1,19 @@
 from http import HTTPStatus
-from typing import Annotated
+from typing import Annotated, Awaitable
 from uuid import UUID, uuid4
 
-from annotated_types import Gt, Le
-from fastapi import APIRouter, Depends, HTTPException, Path
+from annotated_types import Ge, Gt, Le
+from fastapi import APIRouter, Depends, HTTPException, Path, Response
+from fastapi.responses import StreamingResponse
 from fastapi.params import Query
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, TypeAdapter
 
-from services.film import FilmService, get_film_service
+from models import film as models
+from services.film import FILM_EXPORT_FIELDS, FilmService, get_film_service
+from .responses import (
+    accept_encoding, cached_json_response, cursor_json_response, export_fields, gather_total, HAS_NEXT_HEADER,
+    if_none_match, ndjson_response, NEXT_CURSOR_HEADER, pagination_headers, TOTAL_COUNT_HEADER
+)
 
 # Создаем объект router, в котором будут регистрироваться обработчики.
 router = APIRouter()
@@ -81,22 +87,76 @@ class FilmDetails(Film):
     )
 
 
+films_adapter = TypeAdapter(list[Film])
+
+
+def films_json(films: list[models.FilmShort]) -> bytes:
+    # Перекладываем данные из models.FilmShort в Film и сериализуем в тело ответа.
+    return films_adapter.dump_json([Film(**film.model_dump()) for film in films])
+
+
+def film_details_json(film: models.Film) -> bytes:
+    # Перекладываем данные из models.Film в FilmDetails и сериализуем в тело ответа.
+    return FilmDetails(**film.model_dump()).model_dump_json()
+
+
+# Film_filters_params - общие для списка и поиска фильмов параметры отбора. Повторяющиеся genre и genre_id
+# отбирают фильмы хотя бы одного из перечисленных жанров. Async def - чтобы FastAPI не выполнял ее в пуле потоков
+async def film_filters_params(
+        genre: Annotated[list[str] | None, Query(description='Фильтр по названию жанра', example='Drama')] = None,
+        genre_id: Annotated[list[UUID] | None, Query(description='Фильтр по идентификатору жанра')] = None,
+        imdb_rating_gte: Annotated[float | None, Query(description='Рейтинг не ниже'), Ge(0), Le(10)] = None,
+        imdb_rating_lte: Annotated[float | None, Query(description='Рейтинг не выше'), Ge(0), Le(10)] = None,
+) -> dict:
+    return {'genre': genre, 'genre_id': genre_id, 'rating_gte': imdb_rating_gte, 'rating_lte': imdb_rating_lte}
+
+
+async def films_page(film_service: FilmService, *, cursor: str, total: Awaitable | None, **kwargs) -> Response:
+    try:
+        (films, next_cursor), total = await gather_total(film_service.get_films_page(cursor=cursor, **kwargs), total)
+    except ValueError:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail='invalid cursor')
+    if not films:
+        # Если ни один фильм не найден, отдаём 404 статус
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail='films not found')
+
+    headers = pagination_headers(total, next_cursor=next_cursor) if total else None
+    return cursor_json_response(films_json(films), next_cursor, headers)
+
+
 @router.get('/', response_model=list[Film],
             description='Получение списка фильмов', name='Получение списка фильмов')
 async def films_list(
-        genre: Annotated[str, Query(description='Фильтр по жанрам', example='Drama')] = None,
         sort: Annotated[str | None, Query(enum=['imdb_rating', '-imdb_rating'], description='Сортировка')] = None,
         page_size: Annotated[int, Query(description='Число элементов на странице'), Gt(0), Le(100)] = 50,
         page_number: Annotated[int, Query(description='Номер страницы '), Gt(0)] = 1,
+        cursor: Annotated[str | None, Query(
+            description='Курсор страницы: включает курсорную пагинацию вместо page_number. Пустое значение - '
+                        f'первая страница, курсор следующей страницы возвращается в заголовке {NEXT_CURSOR_HEADER}'
+        )] = None,
+        with_total: Annotated[bool, Query(
+            description=f'Вернуть число найденных фильмов в заголовке {TOTAL_COUNT_HEADER} '
+                        f'и признак следующей страницы в заголовке {HAS_NEXT_HEADER}'
+        )] = False,
+        filters: dict = Depends(film_filters_params),
+        etags: list[str] = Depends(if_none_match),
+        encoding: str | None = Depends(accept_encoding),
         film_service: FilmService = Depends(get_film_service)
-) -> list[Film]:
-    films = await film_service.get_films(sort=sort, genre=genre, page=page_number, per_page=page_size)
+) -> Response:
+    total = film_service.count_films(**filters) if with_total else None
+    if cursor is not None:
+        return await films_page(film_service, cursor=cursor, total=total, sort=sort, per_page=page_size, **filters)
+
+    films, total = await gather_total(film_service.get_films_response(
+        serializer=films_json, sort=sort, page=page_number, per_page=page_size,
+        etags=etags, encoding=encoding, **filters
+    ), total)
     if not films:
         # Если ни один фильм не найден, отдаём 404 статус
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail='films not found')
 
-    # Перекладываем данные из models.Film в Film.
-    return list(map(lambda film: Film(**film.model_dump()), films))
+    headers = pagination_headers(total, page=page_number, per_page=page_size) if total else None
+    return cached_json_response(films, etags, encoding, headers)
 
 
 @router.get('/search', response_model=list[Film],
@@ -106,15 +166,53 @@ async def films_search(
         sort: Annotated[str | None, Query(enum=['imdb_rating', '-imdb_rating'], description='Сортировка')] = None,
         page_size: Annotated[int, Query(description='Число элементов на странице'), Gt(0), Le(100)] = 50,
         page_number: Annotated[int, Query(description='Номер страницы '), Gt(0)] = 1,
+        cursor: Annotated[str | None, Query(
+            description='Курсор страницы: включает курсорную пагинацию вместо page_number. Пустое значение - '
+                        f'первая страница, курсор следующей страницы возвращается в заголовке {NEXT_CURSOR_HEADER}'
+        )] = None,
+        with_total: Annotated[bool, Query(
+            description=f'Вернуть число найденных фильмов в заголовке {TOTAL_COUNT_HEADER} '
+                        f'и признак следующей страницы в заголовке {HAS_NEXT_HEADER}'
+        )] = False,
+        filters: dict = Depends(film_filters_params),
+        etags: list[str] = Depends(if_none_match),
+        encoding: str | None = Depends(accept_encoding),
         film_service: FilmService = Depends(get_film_service)
-) -> list[Film]:
-    films = await film_service.get_films(sort=sort, query=query, page=page_number, per_page=page_size)
+) -> Response:
+    total = film_service.count_films(query=query, **filters) if with_total else None
+    if cursor is not None:
+        return await films_page(
+            film_service, cursor=cursor, total=total, sort=sort, query=query, per_page=page_size, **filters
+        )
+
+    films, total = await gather_total(film_service.get_films_response(
+        serializer=films_json, sort=sort, query=query, page=page_number, per_page=page_size,
+        etags=etags, encoding=encoding, **filters
+    ), total)
     if not films:
         # Если ни один фильм не найден, отдаём 404 статус
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail='films not found')
 
-    # Перекладываем данные из models.Film в Film.
-    return list(map(lambda film: Film(**film.model_dump()), films))
+    headers = pagination_headers(total, page=page_number, per_page=page_size) if total else None
+    return cached_json_response(films, etags, encoding, headers)
+
+
+# Выгрузка объявлена до /{film_id}, иначе путь /export разбирался бы как идентификатор фильма.
+@router.get('/export', response_class=StreamingResponse,
+            description='Потоковая выгрузка всех фильмов в формате NDJSON (фильм на строку, по возрастанию uuid)',
+            name='Выгрузка фильмов')
+async def films_export(
+        fields: Annotated[list[str] | None, Query(
+            description=f'Выгружаемые поля (по умолчанию все): {", ".join(FILM_EXPORT_FIELDS)}. uuid выгружается всегда'
+        )] = None,
+        after: Annotated[UUID | None, Query(
+            description='uuid последнего полученного фильма: выгрузка продолжается со следующего'
+        )] = None,
+        encoding: str | None = Depends(accept_encoding),
+        film_service: FilmService = Depends(get_film_service)
+) -> StreamingResponse:
+    fields = export_fields(fields, FILM_EXPORT_FIELDS)
+    return ndjson_response(film_service.export(fields=fields, after=after), encoding)
 
 
 # Регистрируем обработчик для запроса данных о фильме.
@@ -123,12 +221,15 @@ async def films_search(
 async def film_details(
         film_id: UUID = Path(..., description='Идентификатор фильма',
                              example='3d825f60-9fff-4dfe-b294-1a45fa1e115d'),
+        etags: list[str] = Depends(if_none_match),
+        encoding: str | None = Depends(accept_encoding),
         film_service: FilmService = Depends(get_film_service)
-) -> FilmDetails:
-    film = await film_service.get_by_id(film_id)
+) -> Response:
+    film = await film_service.get_by_id_response(
+        film_id, serializer=film_details_json, etags=etags, encoding=encoding
+    )
     if not film:
         # Если фильм не найден, отдаём 404 статус
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail='film not found')
 
-    # Перекладываем данные из models.Film в Film.
-    return FilmDetails(**film.model_dump())
+    return cached_json_response(film, etags, encoding)
@@ -3,11 +3,13 @@ from typing import Annotated
 from uuid import UUID, uuid4
 
 from annotated_types import Gt, Le
-from fastapi import APIRouter, Depends, HTTPException, Path
+from fastapi import APIRouter, Depends, HTTPException, Path, Response
 from fastapi.params import Query
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, TypeAdapter
 
+from models import genre as models
 from services.genre import GenreService, get_genre_service
+from .responses import accept_encoding, cached_json_response, if_none_match
 
 # Создаем объект router, в котором будут регистрироваться обработчики.
 router = APIRouter()
@@ -21,21 +23,37 @@ class Genre(BaseModel):
     name: str = Field(..., description="Название жанра", example='Adventure')
 
 
+genres_adapter = TypeAdapter(list[Genre])
+
+
+def genres_json(genres: list[models.Genre]) -> bytes:
+    # Перекладываем данные из models.Genre в Genre и сериализуем в тело ответа.
+    return genres_adapter.dump_json([Genre(**genre.model_dump()) for genre in genres])
+
+
+def genre_json(genre: models.Genre) -> bytes:
+    # Перекладываем данные из models.Genre в Genre и сериализуем в тело ответа.
+    return Genre(**genre.model_dump()).model_dump_json()
+
+
 # Регистрируем обработчик для запроса данных о жанре.
 @router.get('/{genre_id}', response_model=Genre,
             description='Получение информации о жанре', name='Получение информации о жанре')
 async def genre_details(
         genre_id: UUID = Path(..., description='Идентификатор жанра',
                               example='6d141ad2-d407-4252-bda4-95590aaf062a'),
+        etags: list[str] = Depends(if_none_match),
+        encoding: str | None = Depends(accept_encoding),
         genre_service: GenreService = Depends(get_genre_service)
-) -> Genre:
-    genre = await genre_service.get_by_id(genre_id)
+) -> Response:
+    genre = await genre_service.get_by_id_response(
+        genre_id, serializer=genre_json, etags=etags, encoding=encoding
+    )
     if not genre:
         # Если жанр не найден, отдаём 404 статус
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail='genre not found')
 
-    # Перекладываем данные из models.Genre в Genre.
-    return Genre(**genre.model_dump())
+    return cached_json_response(genre, etags, encoding)
 
 
 @router.get('/', response_model=list[Genre],
@@ -43,12 +61,16 @@ async def genre_details(
 async def genres_list(
         page_size: Annotated[int, Query(description='Число элементов на странице'), Gt(0), Le(100)] = 50,
         page_number: Annotated[int, Query(description='Номер страницы '), Gt(0)] = 1,
+        etags: list[str] = Depends(if_none_match),
+        encoding: str | None = Depends(accept_encoding),
         genre_service: GenreService = Depends(get_genre_service)
-) -> list[Genre]:
-    genres = await genre_service.get_genres(page=page_number, per_page=page_size)
+) -> Response:
+    genres = await genre_service.get_genres_response(
+        serializer=genres_json, page=page_number, per_page=page_size,
+        etags=etags, encoding=encoding
+    )
     if not genres:
         # Если ни один фильм не найден, отдаём 404 статус
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail='genres not found')
 
-    # Перекладываем данные из models.Genre в Genre.
-    return list(map(lambda genre: Genre(**genre.model_dump()), genres))
+    return cached_json_response(genres, etags, encoding)
@@ -3,13 +3,19 @@ from typing import Annotated
 from uuid import UUID, uuid4
 
 from annotated_types import Gt, Le
-from fastapi import APIRouter, Depends, HTTPException, Path
+from fastapi import APIRouter, Depends, HTTPException, Path, Response
+from fastapi.responses import StreamingResponse
 from fastapi.params import Query
-from pydantic import BaseModel, Field
-
-from .films import Film
+from pydantic import BaseModel, Field, TypeAdapter
+
+from .films import Film, films_json
+from .responses import (
+    accept_encoding, cached_json_response, cursor_json_response, export_fields, gather_total, HAS_NEXT_HEADER,
+    if_none_match, ndjson_response, NEXT_CURSOR_HEADER, pagination_headers, TOTAL_COUNT_HEADER
+)
+from models import person as models
 from services.film import FilmService, get_film_service
-from services.person import PersonService, get_person_service
+from services.person import PERSON_EXPORT_FIELDS, PersonService, get_person_service
 
 # Создаем объект router, в котором будут регистрироваться обработчики.
 router = APIRouter()
@@ -39,21 +45,56 @@ class Person(BaseModel):
     )
 
 
+persons_adapter = TypeAdapter(list[Person])
+
+
+def persons_json(persons: list[models.Person]) -> bytes:
+    # Перекладываем данные из models.Person в Person и сериализуем в тело ответа.
+    return persons_adapter.dump_json([Person(**person.model_dump()) for person in persons])
+
+
+def person_json(person: models.Person) -> bytes:
+    # Перекладываем данные из models.Person в Person и сериализуем в тело ответа.
+    return Person(**person.model_dump()).model_dump_json()
+
+
+# Выгрузка объявлена до /{person_id}, иначе путь /export разбирался бы как идентификатор персоны.
+@router.get('/export', response_class=StreamingResponse,
+            description='Потоковая выгрузка всех персон в формате NDJSON (персона на строку, по возрастанию uuid)',
+            name='Выгрузка персон')
+async def persons_export(
+        fields: Annotated[list[str] | None, Query(
+            description=f'Выгружаемые поля (по умолчанию все): {", ".join(PERSON_EXPORT_FIELDS)}. '
+                        'uuid выгружается всегда'
+        )] = None,
+        after: Annotated[UUID | None, Query(
+            description='uuid последней полученной персоны: выгрузка продолжается со следующей'
+        )] = None,
+        encoding: str | None = Depends(accept_encoding),
+        person_service: PersonService = Depends(get_person_service)
+) -> StreamingResponse:
+    fields = export_fields(fields, PERSON_EXPORT_FIELDS)
+    return ndjson_response(person_service.export(fields=fields, after=after), encoding)
+
+
 # Регистрируем обработчик для запроса данных о персоне.
 @router.get('/{person_id}', response_model=Person,
             description='Получение информации о персоне', name='Получение информации о персоне')
 async def person_details(
         person_id: UUID = Path(..., description='Идентификатор персоны',
                                example='bdf146ce-d0f4-44be-8bde-4834573e18a7'),
+        etags: list[str] = Depends(if_none_match),
+        encoding: str | None = Depends(accept_encoding),
         person_service: PersonService = Depends(get_person_service)
-) -> Person:
-    person = await person_service.get_by_id(person_id)
+) -> Response:
+    person = await person_service.get_by_id_response(
+        person_id, serializer=person_json, etags=etags, encoding=encoding
+    )
     if not person:
         # Если персона не найдена, отдаём 404 статус
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail='person not found')
 
-    # Перекладываем данные из models.Person в Person.
-    return Person(**person.model_dump())
+    return cached_json_response(person, etags, encoding)
 
 
 @router.get('/{person_id}/film/', response_model=list[Film],
@@ -62,19 +103,23 @@ async def films_by_person(
         person_id: UUID = Path(..., description='Идентификатор персоны',
                                example='bdf146ce-d0f4-44be-8bde-4834573e18a7'),
         person_service: PersonService = Depends(get_person_service),
+        etags: list[str] = Depends(if_none_match),
+        encoding: str | None = Depends(accept_encoding),
         film_service: FilmService = Depends(get_film_service)
-) -> list[Film]:
-    person = await person_service.get_by_id(person_id)
-    if not person:
-        # Если персона не найдена, отдаём 404 статус
-        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail='person not found')
-    films = [await film_service.get_by_id(film_id) for film_id in set(n.uuid for n in person.films)]
+) -> Response:
+    # Фильмы персоны запрашиваются пачкой: число обращений к кешу и базе не зависит от числа фильмов.
+    films = await person_service.get_films_response(
+        person_id, films_loader=film_service.get_many, serializer=films_json, etags=etags,
+        encoding=encoding
+    )
     if not films:
+        if not await person_service.get_by_id(person_id):
+            # Если персона не найдена, отдаём 404 статус
+            raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail='person not found')
         # Если ни один фильм по персоне не найден, отдаём 404 статус
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail='films for the person not found')
 
-    # Перекладываем данные из models.Film в Film.
-    return list(map(lambda film: Film(**film.model_dump()), films))
+    return cached_json_response(films, etags, encoding)
 
 
 @router.get('/search/', response_model=list[Person],
@@ -83,12 +128,38 @@ async def persons_search(
         query: Annotated[str, Query(description='строка поиска', example='Lucas')] = None,
         page_size: Annotated[int, Query(description='Число элементов на странице'), Gt(0), Le(100)] = 50,
         page_number: Annotated[int, Query(description='Номер страницы '), Gt(0)] = 1,
+        cursor: Annotated[str | None, Query(
+            description='Курсор страницы: включает курсорную пагинацию вместо page_number. Пустое значение - '
+                        f'первая страница, курсор следующей страницы возвращается в заголовке {NEXT_CURSOR_HEADER}'
+        )] = None,
+        with_total: Annotated[bool, Query(
+            description=f'Вернуть число найденных персон в заголовке {TOTAL_COUNT_HEADER} '
+                        f'и признак следующей страницы в заголовке {HAS_NEXT_HEADER}'
+        )] = False,
+        etags: list[str] = Depends(if_none_match),
+        encoding: str | None = Depends(accept_encoding),
         person_service: PersonService = Depends(get_person_service)
-) -> list[Person]:
-    persons = await person_service.get_persons(query=query, page=page_number, per_page=page_size)
+) -> Response:
+    total = person_service.count_persons(query=query) if with_total else None
+    if cursor is not None:
+        try:
+            (persons, next_cursor), total = await gather_total(person_service.get_persons_page(
+                cursor=cursor, query=query, per_page=page_size
+            ), total)
+        except ValueError:
+            raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail='invalid cursor')
+        if not persons:
+            raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail='Persons not found')
+        headers = pagination_headers(total, next_cursor=next_cursor) if total else None
+        return cursor_json_response(persons_json(persons), next_cursor, headers)
+
+    persons, total = await gather_total(person_service.get_persons_response(
+        serializer=persons_json, query=query, page=page_number, per_page=page_size,
+        etags=etags, encoding=encoding
+    ), total)
     if not persons:
         # Если ни один фильм не найден, отдаём 404 статус
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail='Persons not found')
 
-    # Перекладываем данные из models.Person в Person.
-    return list(map(lambda person: Person(**person.model_dump()), persons))
+    headers = pagination_headers(total, page=page_number, per_page=page_size) if total else None
+    return cached_json_response(persons, etags, encoding, headers)
@@ -0,0 +1,125 @@
+import asyncio
+import time
+from http import HTTPStatus
+from typing import Annotated, AsyncIterator, Awaitable, Sequence
+
+from fastapi import Header, HTTPException, Response
+from fastapi.responses import StreamingResponse
+
+from core.config import response_compression_settings
+from core.content_encoding import encode_stream, negotiate
+from db.cache import CachedResponse
+from db.database import Total
+
+# Заголовок с курсором следующей страницы в режиме курсорной пагинации.
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+# Заголовки метаданных пагинации: число найденных элементов, точное ли оно (eq) или это нижняя граница (gte),
+# и есть ли следующая страница.
+TOTAL_COUNT_HEADER = 'X-Total-Count'
+TOTAL_RELATION_HEADER = 'X-Total-Count-Relation'
+HAS_NEXT_HEADER = 'X-Has-Next'
+
+
+# Зависимости объявлены через async def: FastAPI выполняет синхронные зависимости в пуле потоков,
+# а для разбора заголовка переключение потоков дороже самой работы.
+async def if_none_match(
+        if_none_match: Annotated[str | None, Header(description='ETag-и сохраненных у клиента версий ответа')] = None
+) -> list[str]:
+    # Для If-None-Match сравнение слабое (RFC 9110), поэтому признак W/ отбрасываем. Суффикс кодировки
+    # оставляем: ETag сжатого представления совпадает только с ETag того же представления.
+    if not if_none_match:
+        return []
+    return [etag for etag in (item.strip().removeprefix('W/') for item in if_none_match.split(',')) if etag]
+
+
+async def accept_encoding(
+        accept_encoding: Annotated[str | None, Header(description='Допустимые кодировки сжатия ответа')] = None
+) -> str | None:
+    return negotiate(accept_encoding)
+
+
+def representation_etag(etag: str, encoding: str | None) -> str:
+    # Строгий ETag сжатого представления должен отличаться от ETag несжатого.
+    return etag[:-1] + f'-{encoding}"' if encoding else etag
+
+
+def cache_headers(cached: CachedResponse, encoding: str | None = None) -> dict[str, str]:
+    headers = {}
+    if cached.etag:
+        headers['ETag'] = representation_etag(cached.etag, encoding)
+    if response_compression_settings.enabled:
+        headers['Vary'] = 'Accept-Encoding'
+    # Клиент и CDN могут хранить ответ, пока он свеж и в нашем кеше.
+    if cached.expiry is not None:
+        headers['Cache-Control'] = f'max-age={max(int(cached.expiry - time.time()), 0)}'
+    elif cached.ttl is not None:
+        headers['Cache-Control'] = f'max-age={int(cached.ttl)}'
+    return headers
+
+
+async def gather_total(page: Awaitable, total: Awaitable[Total] | None) -> tuple[object, Total | None]:
+    # Подсчет элементов (если он запрошен) идет параллельно с загрузкой страницы.
+    if total is None:
+        return await page, None
+    page, total = await asyncio.gather(page, total)
+    return page, total
+
+
+def pagination_headers(total: Total, *, page: int | None = None, per_page: int | None = None,
+                       next_cursor: str | None = None) -> dict[str, str]:
+    # В режиме курсора следующая страница есть, если есть ее курсор, иначе - если элементы не кончились
+    # на текущей странице. За пределом подсчета (exact=False) страницы недоступны из-за max_result_window.
+    has_next = next_cursor is not None if page is None else page * per_page < total.value
+    return {
+        TOTAL_COUNT_HEADER: str(total.value),
+        TOTAL_RELATION_HEADER: 'eq' if total.exact else 'gte',
+        HAS_NEXT_HEADER: 'true' if has_next else 'false',
+    }
+
+
+def cached_json_response(
+        cached: CachedResponse, etags: Sequence[str] = (), encoding: str | None = None,
+        extra_headers: dict[str, str] | None = None
+) -> Response:
+    body, content_encoding = cached.body, cached.encoding
+    if content_encoding is None and encoding in cached.variants:
+        # Только что загруженный ответ: сжатый вариант уже подготовлен при записи в кеш.
+        body, content_encoding = cached.variants[encoding], encoding
+    headers = cache_headers(cached, content_encoding)
+    if extra_headers:
+        headers.update(extra_headers)
+    if cached.not_modified or cached.etag and (headers['ETag'] in etags or '*' in etags):
+        # Версия клиента актуальна: тело не передаем.
+        return Response(status_code=HTTPStatus.NOT_MODIFIED, headers=headers)
+    if content_encoding:
+        headers['Content-Encoding'] = content_encoding
+    # Отдаем сохраненные в кеше байты как есть, без валидации и повторной сериализации.
+    return Response(content=body, media_type='application/json', headers=headers)
+
+
+def cursor_json_response(
+        body: bytes, next_cursor: str | None, extra_headers: dict[str, str] | None = None
+) -> Response:
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {}
+    if extra_headers:
+        headers.update(extra_headers)
+    return Response(content=body, media_type='application/json', headers=headers)
+
+
+def export_fields(fields: list[str] | None, allowed: list[str]) -> list[str] | None:
+    # Проекция выгрузки: только поля из allowed, идентификатор нужен клиенту для продолжения выгрузки.
+    if not fields:
+        return None
+    unknown = set(fields).difference(allowed)
+    if unknown:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=f'unknown fields: {", ".join(sorted(unknown))}')
+    return list(dict.fromkeys(['uuid', *fields]))
+
+
+def ndjson_response(chunks: AsyncIterator[bytes], encoding: str | None) -> StreamingResponse:
+    # Поток не проходит через CompressionMiddleware (она сжимает только цельные тела), поэтому сжимаем сами.
+    headers = {'Vary': 'Accept-Encoding'} if response_compression_settings.enabled else {}
+    if encoding:
+        chunks = encode_stream(chunks, encoding)
+        headers['Content-Encoding'] = encoding
+    return StreamingResponse(chunks, media_type='application/x-ndjson', headers=headers)
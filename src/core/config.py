@@ -27,20 +27,170 @@ class RedisSettings(BaseSettings):
 class ElasticSettings(BaseSettings):
     host: str = Field('127.0.0.1')
     port: int = Field(9200)
+    # Время жизни point-in-time для курсорной пагинации. По умолчанию выключено: PIT открывается на каждый
+    # первый запрос страницы, даже если клиент дальше не пойдет, а без него курсор остается корректным.
+    pit_keep_alive: str | None = Field(None)
 
     model_config = SettingsConfigDict(env_prefix='elastic_', env_file='.env')
 
 
-# Класс настройки Elasticsearch
+# Класс выбора хранилища документов
+class DatabaseSettings(BaseSettings):
+    # elastic - Elasticsearch, memory - документы в памяти процесса, загружаемые из memory_data_dir.
+    engine: str = Field('elastic')
+    memory_data_dir: str = Field('data')
+
+    model_config = SettingsConfigDict(env_prefix='database_', env_file='.env')
+
+
+# Класс настройки локального (in-process) кеша перед Redis
+class LocalCacheSettings(BaseSettings):
+    enabled: bool = Field(True)
+    max_size: int = Field(1024)
+    ttl: float = Field(5)
+
+    model_config = SettingsConfigDict(env_prefix='local_cache_', env_file='.env')
+
+
+# Класс настройки кеширования в сервисах
+class CacheSettings(BaseSettings):
+    # Кеширование отсутствия объектов и пустых результатов поиска.
+    negative_enabled: bool = Field(True)
+    negative_ttl: int = Field(30)
+    # Stale-while-revalidate: сколько секунд после истечения свежести ответ еще можно отдавать,
+    # обновляя его в фоне. 0 отключает режим для сущности.
+    film_stale_ttl: int = Field(60 * 5)
+    person_stale_ttl: int = Field(60 * 5)
+    genre_stale_ttl: int = Field(60 * 30)
+    # XFetch: агрессивность вероятностного досрочного обновления ответов (больше - раньше, 0 отключает).
+    xfetch_beta: float = Field(1.0)
+    # Сжатие значений в Redis: порог размера в байтах (0 отключает) и уровень сжатия zlib.
+    compress_threshold: int = Field(1024)
+    compress_level: int = Field(6)
+    # Формат значений в Redis: json или msgpack (требует пакет msgpack).
+    codec: str = Field('json')
+    # Помечать записи тегами сущностей (film:<uuid>, genre:<uuid>, person:<uuid>) для адресного сброса.
+    tags_enabled: bool = Field(True)
+    # Версия формата значений, добавляется префиксом ко всем ключам. Меняется вместе с форматом значений:
+    # при поэтапном выкатывании и откате процессы разных версий не читают чужие записи. Пустое значение -
+    # ключи без префикса, общие с версиями до v2 (списки и модели старого формата при этом дочитываются).
+    # В v3 множества тегов стали упорядоченными множествами.
+    key_version: str = Field('v3')
+
+    model_config = SettingsConfigDict(env_prefix='cache_', env_file='.env')
+
+
+# Класс настройки справочника жанров в памяти процесса
+class GenreCatalogSettings(BaseSettings):
+    enabled: bool = Field(False)
+    # Интервал фонового обновления справочника, секунды.
+    refresh_interval: float = Field(60 * 5)
+
+    model_config = SettingsConfigDict(env_prefix='genre_catalog_', env_file='.env')
+
+
+# Класс настройки прогрева кеша
+class WarmupSettings(BaseSettings):
+    # Прогревать кеш в фоне при старте приложения. Прогрев запускает один воркер на выкладку: тот, кто первым
+    # взял блокировку в Redis; остальные воркеры пропускают прогрев, пока она не истечет.
+    on_startup: bool = Field(False)
+    # Время жизни блокировки прогрева (с). Ключ блокировки учитывает версию ключей кеша.
+    lock_ttl: int = Field(600)
+    # Число первых страниц /films для каждой сортировки и жанра.
+    pages: int = Field(3)
+    # Число карточек фильмов с наибольшим рейтингом.
+    top_films: int = Field(100)
+    # Наибольшее число одновременных загрузок.
+    concurrency: int = Field(8)
+
+    model_config = SettingsConfigDict(env_prefix='warmup_', env_file='.env')
+
+
+# Класс настройки заголовка Server-Timing и журнала медленных запросов
+class ServerTimingSettings(BaseSettings):
+    enabled: bool = Field(True)
+    # Запросы дольше порога (мс) пишутся в лог с разбивкой по фазам, 0 - не писать.
+    slow_request_ms: float = Field(0)
+
+    model_config = SettingsConfigDict(env_prefix='server_timing_', env_file='.env')
+
+
+# Класс настройки сжатия ответов API
+class ResponseCompressionSettings(BaseSettings):
+    enabled: bool = Field(True)
+    # Ответы меньше порога (байт) не сжимаются.
+    min_size: int = Field(1024)
+    gzip_level: int = Field(6)
+    # Brotli используется, если установлен пакет brotli.
+    brotli_quality: int = Field(5)
+
+    model_config = SettingsConfigDict(env_prefix='response_compression_', env_file='.env')
+
+
+# Класс настройки служебного API (/internal)
+class InternalApiSettings(BaseSettings):
+    # Токен в заголовке X-Internal-Token; пока он не задан, служебные эндпоинты не подключаются.
+    token: str | None = Field(None)
+
+    model_config = SettingsConfigDict(env_prefix='internal_api_', env_file='.env')
+
+
+# Класс настройки метаданных пагинации
+class PaginationSettings(BaseSettings):
+    # Предел подсчета найденных документов: дальше глубина постраничной выдачи все равно ограничена
+    # index.max_result_window Elasticsearch (по умолчанию 10000).
+    total_hits_cap: int = Field(10000)
+    # Время жизни подсчитанного числа документов в кеше, секунды.
+    count_ttl: int = Field(60)
+
+    model_config = SettingsConfigDict(env_prefix='pagination_', env_file='.env')
+
+
+# Класс настройки потоковой выгрузки каталога
+class ExportSettings(BaseSettings):
+    # Число документов, запрашиваемых из базы за раз: в памяти процесса одновременно держится одна пачка.
+    batch_size: int = Field(1000)
+
+    model_config = SettingsConfigDict(env_prefix='export_', env_file='.env')
+
+
+# Класс настройки Gunicorn
 class GunicornSettings(BaseSettings):
     host: str = Field('0.0.0.0')
     port: int = Field(8000)
-    workers: int = Field(2)
+    # Профиль воркера: performance - uvloop и httptools, compat - asyncio и h11 на чистом Python.
+    profile: str = Field('performance')
+    # Число воркеров; 0 - по числу доступных процессу ядер, умноженному на workers_per_core,
+    # но не больше max_workers (0 - без ограничения).
+    workers: int = Field(0)
+    workers_per_core: float = Field(1)
+    max_workers: int = Field(0)
+    # Сколько секунд держать простаивающее keep-alive соединение (больше, чем у балансировщика перед сервисом).
+    keepalive: int = Field(5)
+    # Очередь ожидающих accept соединений.
+    backlog: int = Field(2048)
+    # Перезапуск воркера после max_requests запросов (0 - не перезапускать); случайная добавка
+    # до max_requests_jitter не дает воркерам перезапуститься одновременно.
+    max_requests: int = Field(10000)
+    max_requests_jitter: int = Field(1000)
     loglevel: str = Field('debug')
+    # Общий каталог метрик Prometheus для всех воркеров.
+    metrics_dir: str = Field('/tmp/prometheus')
+
     model_config = SettingsConfigDict(env_prefix='gunicorn_', env_file='.env')
 
 
 redis_settings = RedisSettings()
+local_cache_settings = LocalCacheSettings()
+cache_settings = CacheSettings()
+genre_catalog_settings = GenreCatalogSettings()
+warmup_settings = WarmupSettings()
 elastic_settings = ElasticSettings()
+database_settings = DatabaseSettings()
 project_settings = ProjectSettings()
 gunicorn_settings = GunicornSettings()
+server_timing_settings = ServerTimingSettings()
+internal_api_settings = InternalApiSettings()
+response_compression_settings = ResponseCompressionSettings()
+pagination_settings = PaginationSettings()
+export_settings = ExportSettings()
@@ -0,0 +1,64 @@
+import gzip
+import zlib
+from typing import AsyncIterator
+
+from core.config import response_compression_settings
+
+try:
+    import brotli
+except ImportError:  # brotli - необязательная зависимость, без нее ответы сжимаются только gzip.
+    brotli = None
+
+# Поддерживаемые кодировки ответа в порядке предпочтения сервера.
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def encode(body: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=response_compression_settings.brotli_quality)
+    # Нулевое время в заголовке gzip: одинаковое тело всегда дает одинаковые байты.
+    return gzip.compress(body, compresslevel=response_compression_settings.gzip_level, mtime=0)
+
+
+async def encode_stream(chunks: AsyncIterator[bytes], encoding: str) -> AsyncIterator[bytes]:
+    # Потоковое сжатие: каждая часть сжимается и сбрасывается клиенту сразу, не дожидаясь конца тела.
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=response_compression_settings.brotli_quality)
+        async for chunk in chunks:
+            yield compressor.process(chunk) + compressor.flush()
+        yield compressor.finish()
+        return
+    compressor = zlib.compressobj(response_compression_settings.gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+def encode_all(body: bytes | str) -> dict[str, bytes]:
+    # Сжатые варианты тела во всех поддерживаемых кодировках; маленькие тела не сжимаются.
+    if not response_compression_settings.enabled or len(body) < response_compression_settings.min_size:
+        return {}
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    return {encoding: encode(body, encoding) for encoding in ENCODINGS}
+
+
+def negotiate(accept_encoding: str | None) -> str | None:
+    # Выбирает кодировку по заголовку Accept-Encoding: наибольший q, при равенстве - порядок ENCODINGS.
+    if not accept_encoding or not response_compression_settings.enabled:
+        return None
+    weights = {}
+    for item in accept_encoding.split(','):
+        coding, _, params = item.strip().partition(';')
+        weight = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding.strip().lower()] = weight
+    default = weights.get('*', 0.0)
+    candidates = [(weights.get(encoding, default), -i, encoding) for i, encoding in enumerate(ENCODINGS)]
+    weight, _, encoding = max(candidates)
+    return encoding if weight > 0 else None
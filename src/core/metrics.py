@@ -0,0 +1,81 @@
+import os
+import re
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+)
+from prometheus_client import multiprocess
+
+# Метрики приложения в формате Prometheus.
+# При запуске под gunicorn каждый воркер пишет значения в общий каталог PROMETHEUS_MULTIPROC_DIR
+# (задается в gunicorn.conf.py), а /metrics собирает их со всех воркеров.
+
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'HTTP request latency', ['method', 'route', 'status']
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    'http_requests_in_progress', 'HTTP requests being processed', ['method'], multiprocess_mode='livesum'
+)
+RESPONSE_SIZE = Histogram(
+    'http_response_size_bytes', 'HTTP response body size', ['route'], buckets=SIZE_BUCKETS
+)
+CACHE_REQUESTS = Counter(
+    'cache_requests_total', 'Cache lookups by result (hit, miss, error)', ['layer', 'namespace', 'result']
+)
+CACHE_VALUE_SIZE = Histogram(
+    'cache_value_size_bytes', 'Size of values read from the cache', ['namespace'], buckets=SIZE_BUCKETS
+)
+CACHE_COMPRESSION_BYTES = Counter(
+    'cache_compression_bytes_total', 'Size of compressed cache values before (raw) and after (stored) compression',
+    ['kind']
+)
+CACHE_COMPRESSION_SECONDS = Counter(
+    'cache_compression_seconds_total', 'CPU time spent on cache value compression', ['operation']
+)
+ELASTIC_LATENCY = Histogram(
+    'elastic_request_duration_seconds', 'Elasticsearch call latency', ['operation', 'source']
+)
+
+# Пространство имен ключа кеша: префикс до идентификатора или параметров запроса
+# (movie, movies, response:movie, ...).
+NAMESPACE_RE = re.compile(r'(?:response:)?[a-z_]+')
+
+
+def key_namespace(name: bytes | str) -> str:
+    if isinstance(name, bytes):
+        name = name.decode('utf-8', 'replace')
+    match = NAMESPACE_RE.match(name)
+    return match.group() if match else 'other'
+
+
+def cache_lookup(layer: str, name: bytes | str, data: object) -> None:
+    # Отмечает попадание или промах; для прочитанных байтов заодно учитывает их размер.
+    namespace = key_namespace(name)
+    CACHE_REQUESTS.labels(layer, namespace, 'miss' if data is None else 'hit').inc()
+    if isinstance(data, bytes):
+        CACHE_VALUE_SIZE.labels(namespace).observe(len(data))
+
+
+@contextmanager
+def cache_errors(layer: str, name: bytes | str):
+    try:
+        yield
+    except Exception:
+        CACHE_REQUESTS.labels(layer, key_namespace(name), 'error').inc()
+        raise
+
+
+# Registry возвращает реестр, из которого отдаются метрики: в многопроцессном режиме - сводный по всем воркерам
+def registry() -> CollectorRegistry:
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return REGISTRY
+    collector_registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(collector_registry)
+    return collector_registry
+
+
+def render() -> tuple[bytes, str]:
+    return generate_latest(registry()), CONTENT_TYPE_LATEST
@@ -0,0 +1,34 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Длительности фаз обработки текущего запроса (секунды) для заголовка Server-Timing.
+# Словарь создается на каждый запрос в middleware; вне запроса замеры не ведутся.
+_timings: ContextVar[dict[str, float] | None] = ContextVar('server_timings', default=None)
+
+
+def start() -> dict[str, float]:
+    timings = {}
+    _timings.set(timings)
+    return timings
+
+
+@contextmanager
+def phase(name: str):
+    # Время фазы суммируется: за один запрос к Redis или Elasticsearch могут обращаться несколько раз.
+    timings = _timings.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - started
+
+
+def header(timings: dict[str, float], total: float) -> str:
+    # Формат W3C Server-Timing, длительности в миллисекундах.
+    metrics = [f'{name};dur={duration * 1000:.2f}' for name, duration in timings.items()]
+    metrics.append(f'total;dur={total * 1000:.2f}')
+    return ', '.join(metrics)
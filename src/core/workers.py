@@ -0,0 +1,9 @@
+from uvicorn.workers import UvicornWorker
+
+
+class UvicornHttptoolsWorker(UvicornWorker):
+    """
+    Воркер uvicorn с циклом событий uvloop и HTTP-парсером httptools (C-расширения из uvicorn[standard]).
+    В отличие от loop/http='auto' не откатывается молча на asyncio и h11, если пакеты не установлены.
+    """
+    CONFIG_KWARGS = {'loop': 'uvloop', 'http': 'httptools'}
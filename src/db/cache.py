@@ -1,4 +1,45 @@
 from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Iterable, Sequence
+
+
+class NotFound:
+    """Отметка в кеше о том, что объекта нет в базе (негативное кеширование)"""
+
+    def __bool__(self):
+        return False
+
+    def __repr__(self):
+        return 'NOT_FOUND'
+
+
+# Единственный экземпляр отметки. Кеш возвращает его вместо None, если ранее было сохранено отсутствие объекта.
+NOT_FOUND = NotFound()
+
+
+@dataclass(slots=True)
+class CachedResponse:
+    """Готовое к отдаче тело ответа API, сохраненное в кеше"""
+    body: bytes
+    """Сериализованное тело ответа (JSON)"""
+    ttl: float | None = None
+    """Оставшееся время жизни записи в кеше, секунды (None - неизвестно или бессрочно)"""
+    delta: float = 0
+    """Время вычисления ответа, секунды"""
+    expiry: float | None = None
+    """Момент (unix time), после которого ответ считается устаревшим"""
+    refresh: bool = False
+    """Признак того, что ответ пора обновить (выставляется кешем при чтении)"""
+    tags: frozenset[str] = frozenset()
+    """Теги сущностей, входящих в ответ (используются только при записи)"""
+    etag: str | None = None
+    """Строгий ETag тела ответа в кавычках, вычисляется один раз при записи"""
+    not_modified: bool = False
+    """ETag совпал с одним из переданных при чтении, тело не загружалось (body пустое)"""
+    encoding: str | None = None
+    """Content-Encoding тела (None - несжатое)"""
+    variants: dict[str, bytes] = field(default_factory=dict)
+    """Заранее сжатые варианты несжатого тела по Content-Encoding"""
 
 
 class Cache(ABC):
@@ -12,7 +53,42 @@ class Cache(ABC):
         pass
 
     @abstractmethod
-    async def set(self, name: bytes | str, value: object, ex: int | None = None) -> None:
+    async def mget(self, names: list[bytes | str], return_class: object.__class__) -> list:
+        pass
+
+    # Set сохраняет значение. Запись помечается тегами входящих в него сущностей и дополнительными tags.
+    @abstractmethod
+    async def set(self, name: bytes | str, value: object, ex: int | None = None, tags: Iterable[str] = ()) -> None:
+        pass
+
+    @abstractmethod
+    async def mset(self, mapping: dict[bytes | str, object], ex: int | None = None) -> None:
+        pass
+
+    # Get_response возвращает готовый ответ. Если его ETag совпадает с одним из etags (значения If-None-Match),
+    # кеш может не загружать тело и вернуть ответ с not_modified=True.
+    # Если задан encoding и есть заранее сжатый вариант тела, кеш может вернуть его вместо несжатого.
+    @abstractmethod
+    async def get_response(
+            self, name: bytes | str, etags: Sequence[str] = (), encoding: str | None = None
+    ) -> CachedResponse | None:
+        pass
+
+    # Set_response сохраняет ответ, помечая его тегами response.tags и tags; отметку NOT_FOUND - только tags
+    @abstractmethod
+    async def set_response(
+            self, name: bytes | str, response: CachedResponse, ex: int | None = None, tags: Iterable[str] = ()
+    ) -> None:
+        pass
+
+    # Invalidate удаляет все записи, помеченные любым из тегов, и возвращает число удаленных записей
+    @abstractmethod
+    async def invalidate(self, tags: Iterable[str]) -> int:
+        pass
+
+    # Acquire ставит блокировку name на ex секунд, если ее еще нет, и возвращает True, если блокировка взята
+    @abstractmethod
+    async def acquire(self, name: bytes | str, ex: int) -> bool:
         pass
 
     @abstractmethod
@@ -0,0 +1,117 @@
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from uuid import UUID
+
+from pydantic import BaseModel, TypeAdapter
+
+try:
+    import msgpack
+except ImportError:  # msgpack - необязательная зависимость, нужна только для MsgpackCodec.
+    msgpack = None
+
+# Первый байт значения в формате msgpack. JSON с него начинаться не может, поэтому значения
+# разных форматов читаются независимо от того, какой кодек выбран для записи.
+MSGPACK_HEADER = b'\x02'
+# Код расширения msgpack для UUID (16 байт вместо 36-символьной строки).
+UUID_EXT_CODE = 1
+
+
+@lru_cache()
+def list_adapter(item_class: object.__class__) -> TypeAdapter:
+    # Адаптер разбирает и собирает весь список за один проход.
+    return TypeAdapter(list[item_class])
+
+
+class Codec(ABC):
+    """
+    Формат сериализации моделей и списков моделей в кеше.
+    """
+
+    name: str
+
+    @abstractmethod
+    def dumps(self, value: BaseModel | list) -> bytes:
+        pass
+
+    @abstractmethod
+    def loads(self, data: bytes, return_class: object.__class__) -> object.__class__:
+        pass
+
+    @abstractmethod
+    def loads_list(self, data: bytes, return_class: object.__class__) -> list:
+        pass
+
+
+class JsonCodec(Codec):
+    name = 'json'
+
+    def dumps(self, value: BaseModel | list) -> bytes:
+        if isinstance(value, list):
+            return list_adapter(type(value[0])).dump_json(value) if value else b'[]'
+        return value.model_dump_json().encode('utf-8')
+
+    def loads(self, data: bytes, return_class: object.__class__) -> object.__class__:
+        return return_class.model_validate_json(data)
+
+    def loads_list(self, data: bytes, return_class: object.__class__) -> list:
+        return list_adapter(return_class).validate_json(data)
+
+
+class MsgpackCodec(Codec):
+    """
+    Компактный бинарный формат: UUID хранятся 16 байтами, числа и строки не переразбираются из текста.
+    """
+
+    name = 'msgpack'
+
+    def __init__(self):
+        if msgpack is None:
+            raise RuntimeError('msgpack codec requires the msgpack package')
+
+    def dumps(self, value: BaseModel | list) -> bytes:
+        if isinstance(value, list):
+            obj = list_adapter(type(value[0])).dump_python(value) if value else []
+        else:
+            obj = value.model_dump()
+        return MSGPACK_HEADER + msgpack.packb(obj, default=self._default)
+
+    def loads(self, data: bytes, return_class: object.__class__) -> object.__class__:
+        return return_class.model_validate(self._unpack(data))
+
+    def loads_list(self, data: bytes, return_class: object.__class__) -> list:
+        return list_adapter(return_class).validate_python(self._unpack(data))
+
+    def _unpack(self, data: bytes) -> object:
+        return msgpack.unpackb(memoryview(data)[len(MSGPACK_HEADER):], ext_hook=self._ext_hook)
+
+    @staticmethod
+    def _default(obj: object) -> object:
+        if isinstance(obj, UUID):
+            return msgpack.ExtType(UUID_EXT_CODE, obj.bytes)
+        raise TypeError(f'Cannot serialize {type(obj).__name__}')
+
+    @staticmethod
+    def _ext_hook(code: int, data: bytes) -> object:
+        if code == UUID_EXT_CODE:
+            return UUID(bytes=data)
+        return msgpack.ExtType(code, data)
+
+
+json_codec = JsonCodec()
+msgpack_codec = MsgpackCodec() if msgpack is not None else None
+
+
+# Get_codec возвращает кодек для записи по имени из настроек
+def get_codec(name: str) -> Codec:
+    if name == JsonCodec.name:
+        return json_codec
+    if name == MsgpackCodec.name:
+        return msgpack_codec or MsgpackCodec()
+    raise ValueError(f'Unknown cache codec: {name}')
+
+
+# Codec_for выбирает кодек для чтения по первому байту значения
+def codec_for(data: bytes) -> Codec:
+    if data.startswith(MSGPACK_HEADER):
+        return msgpack_codec or MsgpackCodec()
+    return json_codec
@@ -0,0 +1,67 @@
+import time
+import zlib
+
+from core.metrics import CACHE_COMPRESSION_BYTES, CACHE_COMPRESSION_SECONDS
+
+# Первый байт сжатого значения. Несжатые значения - это JSON, который с такого байта начинаться не может,
+# поэтому сжатые и несжатые записи могут лежать в кеше вперемешку.
+ZLIB_HEADER = b'\x01'
+
+
+class Compressor:
+    """
+    Прозрачное сжатие значений кеша (zlib), размер которых не меньше threshold байт
+    (threshold=None - только распаковка ранее сжатых значений).
+    Считает суммарные размеры до и после сжатия и процессорное время на сжатие и распаковку.
+    """
+
+    def __init__(self, threshold: int | None = 1024, level: int = 6):
+        self.threshold = threshold
+        self.level = level
+        # Счетчики для оценки выигрыша по памяти и стоимости по CPU.
+        self.compressed = 0
+        self.decompressed = 0
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+        self.compress_seconds = 0.0
+        self.decompress_seconds = 0.0
+
+    def compress(self, data: bytes | str) -> bytes:
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        if self.threshold is None or len(data) < self.threshold:
+            return data
+        started = time.process_time()
+        packed = ZLIB_HEADER + zlib.compress(data, self.level)
+        elapsed = time.process_time() - started
+        self.compress_seconds += elapsed
+        self.compressed += 1
+        self.raw_bytes += len(data)
+        self.stored_bytes += len(packed)
+        CACHE_COMPRESSION_SECONDS.labels('compress').inc(elapsed)
+        CACHE_COMPRESSION_BYTES.labels('raw').inc(len(data))
+        CACHE_COMPRESSION_BYTES.labels('stored').inc(len(packed))
+        return packed
+
+    def decompress(self, data: bytes) -> bytes:
+        if not data.startswith(ZLIB_HEADER):
+            return data
+        started = time.process_time()
+        unpacked = zlib.decompress(data[len(ZLIB_HEADER):])
+        elapsed = time.process_time() - started
+        self.decompress_seconds += elapsed
+        CACHE_COMPRESSION_SECONDS.labels('decompress').inc(elapsed)
+        self.decompressed += 1
+        return unpacked
+
+    def stats(self) -> dict[str, int | float]:
+        return {
+            'compressed': self.compressed,
+            'decompressed': self.decompressed,
+            'raw_bytes': self.raw_bytes,
+            'stored_bytes': self.stored_bytes,
+            # Во сколько раз уменьшились сжатые значения.
+            'ratio': self.raw_bytes / self.stored_bytes if self.stored_bytes else 0.0,
+            'compress_seconds': self.compress_seconds,
+            'decompress_seconds': self.decompress_seconds,
+        }
@@ -1,18 +1,87 @@
+import base64
+import hashlib
 from abc import ABC, abstractmethod
-from pydantic import UUID4
+from dataclasses import dataclass
+from typing import AsyncIterator
+
+import orjson
+from pydantic import BaseModel, UUID4
+
+
+@dataclass(frozen=True, slots=True)
+class AnyOf:
+    """Условие отбора: значение поля совпадает хотя бы с одним из values"""
+    field: str
+    values: tuple
+    text: bool = False
+    """Поле текстовое: значение совпадает, если содержит все слова из values (иначе - точное совпадение)"""
+
+
+@dataclass(frozen=True, slots=True)
+class Range:
+    """Условие отбора: значение поля в границах gte..lte включительно (None - граница не задана)"""
+    field: str
+    gte: float | None = None
+    lte: float | None = None
+
+
+class Total(BaseModel):
+    """Число найденных документов"""
+    value: int
+    """Число документов, но не больше запрошенного предела"""
+    exact: bool = True
+    """Число точное (False - документов не меньше value)"""
+
+
+# Условие отбора документов. Условия не влияют на релевантность, поле с точкой - поле вложенного объекта.
+Filter = AnyOf | Range
 
 
 class DataBase(ABC):
 
+    # Параметр fields во всех методах ограничивает набор возвращаемых полей документа (None - все поля).
+    # Параметр filters в методах поиска - условия отбора, которые должны выполняться все одновременно.
+
     @abstractmethod
-    async def get(self, source: str, id_: UUID4, return_class: object.__class__) -> object.__class__ | None:
+    async def get(self, source: str, id_: UUID4, return_class: object.__class__,
+                  fields: list[str] | None = None) -> object.__class__ | None:
+        pass
+
+    @abstractmethod
+    async def mget(self, source: str, ids: list[UUID4], return_class: object.__class__,
+                   fields: list[str] | None = None) -> list:
         pass
 
     @abstractmethod
     async def search(self, source: str, return_class: object.__class__, search_field: str | None = None,
                      search_string: str | None = None, filter_field: str | None = None,
                      filter_string: str | None = None, sort: str | None = None, page: int | None = 1,
-                     per_page: int | None = 1) -> list | None:
+                     per_page: int | None = 1, fields: list[str] | None = None,
+                     filters: list[Filter] | None = None) -> list | None:
+        pass
+
+    # Search_after возвращает страницу результатов поиска и непрозрачный курсор следующей страницы
+    # (None, если страница последняя). Время получения страницы не зависит от ее глубины.
+    @abstractmethod
+    async def search_after(self, source: str, return_class: object.__class__, search_field: str | None = None,
+                           search_string: str | None = None, filter_field: str | None = None,
+                           filter_string: str | None = None, sort: str | None = None, per_page: int | None = 1,
+                           fields: list[str] | None = None, cursor: str | None = None,
+                           filters: list[Filter] | None = None) -> tuple[list, str | None]:
+        pass
+
+    # Count возвращает число документов, подходящих под условия поиска, досчитывая не дальше limit.
+    @abstractmethod
+    async def count(self, source: str, search_field: str | None = None, search_string: str | None = None,
+                    filter_field: str | None = None, filter_string: str | None = None,
+                    filters: list[Filter] | None = None, limit: int = 10000) -> Total:
+        pass
+
+    # Scan обходит все документы индекса в порядке идентификаторов и отдает их пачками по batch_size
+    # (словари документов с полями fields). After - идентификатор документа, после которого продолжить обход.
+    @abstractmethod
+    def scan(self, source: str, fields: list[str] | None = None, after: str | None = None,
+             batch_size: int = 1000) -> AsyncIterator[list[dict]]:
         pass
 
     @abstractmethod
@@ -24,6 +93,40 @@ class DataBase(ABC):
         pass
 
 
+def encode_cursor(state: dict) -> str:
+    return base64.urlsafe_b64encode(orjson.dumps(state)).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> dict:
+    # Некорректный курсор - ошибка клиента, поэтому наружу отдаем ValueError.
+    try:
+        state = orjson.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, UnicodeEncodeError) as exc:
+        raise ValueError('invalid cursor') from exc
+    if not isinstance(state, dict):
+        raise ValueError('invalid cursor')
+    return state
+
+
+def cursor_scope(*parts: object) -> str:
+    # Отпечаток запроса, для которого выдан курсор: источник, условия поиска и сортировка.
+    return hashlib.blake2b(orjson.dumps(parts), digest_size=8).hexdigest()
+
+
+def read_cursor(cursor: str, scope: str, sort_size: int) -> dict:
+    # Курсор принимается только для того же запроса, для которого он выдан, и только с ключом сортировки
+    # нужной длины из простых значений; иначе это ошибка клиента (ValueError), а не запрос в базу.
+    state = decode_cursor(cursor)
+    after = state.get('after')
+    if (
+            state.get('scope') != scope or not isinstance(after, list) or len(after) != sort_size
+            or not all(value is None or isinstance(value, (str, int, float)) for value in after)
+            or not isinstance(state.get('pit'), (str, type(None)))
+    ):
+        raise ValueError('invalid cursor')
+    return state
+
+
 db: DataBase | None = None
 
 
@@ -1,47 +1,254 @@
-from elasticsearch import AsyncElasticsearch, NotFoundError
+from typing import AsyncIterator
+
+from elasticsearch import AsyncElasticsearch, BadRequestError, NotFoundError
 from pydantic import UUID4
 
-from db.database import DataBase
+from core.metrics import ELASTIC_LATENCY
+from core.timing import phase
+from db.database import AnyOf, cursor_scope, DataBase, encode_cursor, Filter, Range, read_cursor, Total
+
+# Поле-тайбрейкер для курсорной пагинации: уникально и проиндексировано как keyword во всех индексах.
+TIEBREAKER_FIELD = 'uuid'
 
 
 class Elastic(DataBase):
 
-    def __init__(self, db_instance: AsyncElasticsearch):
+    def __init__(self, db_instance: AsyncElasticsearch, pit_keep_alive: str | None = None):
         self.db_instance = db_instance
+        self.pit_keep_alive = pit_keep_alive
 
-    async def get(self, source: str, id_: UUID4, return_class: object.__class__) -> object.__class__ | None:
+    async def get(self, source: str, id_: UUID4, return_class: object.__class__,
+                  fields: list[str] | None = None) -> object.__class__ | None:
         try:
-            doc = await self.db_instance.get(index=source, id=id_)
+            with ELASTIC_LATENCY.labels('get', source).time(), phase('elastic'):
+                doc = await self.db_instance.get(index=source, id=id_, source_includes=fields)
         except NotFoundError:
             return None
-        return return_class(**doc['_source'])
+        with phase('validate'):
+            return return_class(**doc['_source'])
+
+    async def mget(self, source: str, ids: list[UUID4], return_class: object.__class__,
+                   fields: list[str] | None = None) -> list:
+        if not ids:
+            return []
+        try:
+            with ELASTIC_LATENCY.labels('mget', source).time(), phase('elastic'):
+                doc = await self.db_instance.mget(
+                    index=source, ids=[str(id_) for id_ in ids], source_includes=fields
+                )
+        except NotFoundError:
+            return []
+        # Отсутствующие документы возвращаются с found=False, пропускаем их.
+        with phase('validate'):
+            return [return_class(**item['_source']) for item in doc['docs'] if item.get('found')]
 
     async def search(self, source: str, return_class: object.__class__, search_field: str | None = None,
                      search_string: str | None = None, filter_field: str | None = None,
                      filter_string: str | None = None, sort: str | None = None, page: int | None = 1,
-                     per_page: int | None = 1) -> list | None:
-        try:
-            must = []
-            if filter_field and filter_string:
-                must.append({
-                    "nested": {"path": filter_field.split('.')[0],
-                               "query": {"bool": {"must": [{"match": {filter_field: filter_string}}]}}}
-                })
-            if search_field and search_string:
-                must.append({"match": {search_field: search_string}})
-            doc = await self.db_instance.search(
-                index=source,
-                body={"query": {"bool": {"must": must}}},
-                from_=(page - 1) * per_page,
-                size=per_page,
-                sort=(sort[1:] + ":desc" if sort[0] == '-' else sort) if sort else None
-            )
+                     per_page: int | None = 1, fields: list[str] | None = None,
+                     filters: list[Filter] | None = None) -> list | None:
+        # fields передается в Elasticsearch как _source filtering: лишние поля не читаются и не передаются.
+        try:
+            with ELASTIC_LATENCY.labels('search', source).time(), phase('elastic'):
+                doc = await self.db_instance.search(
+                    index=source,
+                    body={"query": self._query(search_field, search_string, filter_field, filter_string, filters)},
+                    from_=(page - 1) * per_page,
+                    size=per_page,
+                    sort=(sort[1:] + ":desc" if sort[0] == '-' else sort) if sort else None,
+                    source_includes=fields,
+                    # Общее число документов считается отдельно (count), здесь его подсчет только замедлял бы поиск.
+                    track_total_hits=False
+                )
         except NotFoundError:
             return None
-        return list(map(lambda item: return_class(**item['_source']), doc['hits']['hits']))
+        with phase('validate'):
+            return list(map(lambda item: return_class(**item['_source']), doc['hits']['hits']))
+
+    async def search_after(self, source: str, return_class: object.__class__, search_field: str | None = None,
+                           search_string: str | None = None, filter_field: str | None = None,
+                           filter_string: str | None = None, sort: str | None = None, per_page: int | None = 1,
+                           fields: list[str] | None = None, cursor: str | None = None,
+                           filters: list[Filter] | None = None) -> tuple[list, str | None]:
+        # Курсор хранит значения сортировки последнего документа страницы, отпечаток запроса и, если включено,
+        # идентификатор PIT.
+        query = self._query(search_field, search_string, filter_field, filter_string, filters)
+        search_sort = self._cursor_sort(sort, by_score=bool(search_field and search_string))
+        scope = cursor_scope(source, search_field, search_string, filter_field, filter_string, filters, sort)
+        state = read_cursor(cursor, scope, len(search_sort)) if cursor else {}
+        pit_id = state.get('pit')
+        if pit_id and not self.pit_keep_alive:
+            # PIT выключен, значит, такой курсор выдан не нами.
+            raise ValueError('invalid cursor')
+        if pit_id is None and self.pit_keep_alive and not cursor:
+            # Закрепляем выдачу за снимком индекса, чтобы страницы не смещались при обновлении данных.
+            pit = await self.db_instance.open_point_in_time(index=source, keep_alive=self.pit_keep_alive)
+            pit_id = pit['id']
+
+        try:
+            doc, pit_id = await self._cursor_page(
+                source, query, search_sort, per_page, fields, state.get('after'), pit_id
+            )
+        except BadRequestError as exc:
+            # Значения курсора не подошли индексу (например, поддельный PIT или ключ сортировки другого типа).
+            if not cursor:
+                raise
+            raise ValueError('invalid cursor') from exc
+        if doc is None:
+            return [], None
+
+        hits = doc['hits']['hits']
+        if len(hits) < per_page:
+            # Страница последняя: снимок больше не нужен.
+            if pit_id:
+                await self._close_pit(pit_id)
+            next_cursor = None
+        else:
+            next_cursor = encode_cursor({'after': hits[-1]['sort'], 'pit': pit_id, 'scope': scope})
+        with phase('validate'):
+            return [return_class(**item['_source']) for item in hits], next_cursor
+
+    async def count(self, source: str, search_field: str | None = None, search_string: str | None = None,
+                    filter_field: str | None = None, filter_string: str | None = None,
+                    filters: list[Filter] | None = None, limit: int = 10000) -> Total:
+        # Вместо _count выполняется поиск без документов: подсчет останавливается на limit, а результат
+        # кешируется в shard request cache и при повторе отдается без обхода индекса.
+        try:
+            with ELASTIC_LATENCY.labels('count', source).time(), phase('elastic'):
+                doc = await self.db_instance.search(
+                    index=source,
+                    query=self._query(search_field, search_string, filter_field, filter_string, filters),
+                    size=0,
+                    track_total_hits=limit,
+                    request_cache=True
+                )
+        except NotFoundError:
+            return Total(value=0)
+        total = doc['hits']['total']
+        return Total(value=total['value'], exact=total['relation'] == 'eq')
+
+    async def scan(self, source: str, fields: list[str] | None = None, after: str | None = None,
+                   batch_size: int = 1000) -> AsyncIterator[list[dict]]:
+        # Обход снимка индекса (PIT) через search_after: стоимость пачки не зависит от глубины обхода,
+        # в отличие от from_, а в памяти держится только текущая пачка.
+        pit_id = None
+        if self.pit_keep_alive:
+            try:
+                pit = await self.db_instance.open_point_in_time(index=source, keep_alive=self.pit_keep_alive)
+            except NotFoundError:
+                return
+            pit_id = pit['id']
+        query = {'match_all': {}}
+        sort = self._cursor_sort(None, by_score=False)
+        search_after = [after] if after else None
+        try:
+            while True:
+                try:
+                    doc = await self._search_page(source, query, sort, batch_size, fields, search_after, pit_id)
+                except NotFoundError:
+                    if pit_id is None:
+                        return
+                    # PIT истек (клиент долго не читал поток): продолжаем с той же позиции без снимка.
+                    pit_id = None
+                    continue
+                hits = doc['hits']['hits']
+                pit_id = doc.get('pit_id', pit_id)
+                if hits:
+                    yield [hit['_source'] for hit in hits]
+                if len(hits) < batch_size:
+                    return
+                search_after = hits[-1]['sort']
+        finally:
+            # При обрыве соединения закрыть снимок может не успеть: тогда он истечет сам через pit_keep_alive.
+            if pit_id:
+                await self._close_pit(pit_id)
 
     async def ping(self):
         await self.db_instance.ping()
 
     async def close(self):
         await self.db_instance.close()
+
+    async def _close_pit(self, pit_id: str) -> None:
+        try:
+            await self.db_instance.close_point_in_time(id=pit_id)
+        except NotFoundError:
+            # Снимок уже истек сам.
+            pass
+
+    async def _cursor_page(self, source: str, query: dict, sort: list, per_page: int, fields: list[str] | None,
+                           after: list | None, pit_id: str | None) -> tuple[dict | None, str | None]:
+        try:
+            doc = await self._search_page(source, query, sort, per_page, fields, after, pit_id)
+        except NotFoundError:
+            if pit_id is None:
+                return None, None
+            # PIT истек: продолжаем с той же позиции без снимка.
+            try:
+                doc = await self._search_page(source, query, sort, per_page, fields, after, None)
+            except NotFoundError:
+                return None, None
+            return doc, None
+        return doc, doc.get('pit_id', pit_id)
+
+    async def _search_page(self, source: str, query: dict, sort: list, per_page: int, fields: list[str] | None,
+                           after: list | None, pit_id: str | None) -> dict:
+        with ELASTIC_LATENCY.labels('search_after', source).time(), phase('elastic'):
+            if pit_id:
+                # При поиске по PIT индекс не указывается: он зафиксирован в снимке.
+                return await self.db_instance.search(
+                    query=query, sort=sort, size=per_page, search_after=after, source_includes=fields,
+                    pit={'id': pit_id, 'keep_alive': self.pit_keep_alive}, track_total_hits=False
+                )
+            return await self.db_instance.search(
+                index=source, query=query, sort=sort, size=per_page, search_after=after, source_includes=fields,
+                track_total_hits=False
+            )
+
+    @classmethod
+    def _query(cls, search_field: str | None, search_string: str | None, filter_field: str | None,
+               filter_string: str | None, filters: list[Filter] | None = None) -> dict:
+        # Релевантность считается только по строке поиска, все остальные условия идут в контекст фильтра:
+        # они не оцениваются, а их результаты Elasticsearch кеширует и переиспользует между запросами.
+        conditions = list(filters or ())
+        if filter_field and filter_string:
+            conditions.append(AnyOf(filter_field, (filter_string,), text=True))
+        filter_ = [cls._filter(condition) for condition in conditions]
+        if search_field and search_string:
+            query = {"bool": {"must": [{"match": {search_field: search_string}}]}}
+            if filter_:
+                query["bool"]["filter"] = filter_
+            return query
+        if filter_:
+            # Без строки поиска оценка одинакова у всех документов, поэтому не считаем ее вовсе.
+            return {"constant_score": {"filter": {"bool": {"filter": filter_}}}}
+        return {"match_all": {}}
+
+    @staticmethod
+    def _filter(condition: Filter) -> dict:
+        if isinstance(condition, Range):
+            bounds = {name: value for name, value in (('gte', condition.gte), ('lte', condition.lte))
+                      if value is not None}
+            clause = {"range": {condition.field: bounds}}
+        elif condition.text:
+            # Текстовое поле: значение подходит, если содержит все слова хотя бы одного из values.
+            matches = [{"match": {condition.field: {"query": str(value), "operator": "and"}}}
+                       for value in condition.values]
+            clause = matches[0] if len(matches) == 1 else {"bool": {"should": matches, "minimum_should_match": 1}}
+        else:
+            clause = {"terms": {condition.field: [str(value) for value in condition.values]}}
+        if '.' in condition.field:
+            # Поля с точкой (genre.uuid, genre.name) принадлежат вложенным объектам.
+            clause = {"nested": {"path": condition.field.split('.')[0], "query": clause}}
+        return clause
+
+    @staticmethod
+    def _cursor_sort(sort: str | None, by_score: bool) -> list:
+        # Для search_after порядок должен быть полным, поэтому всегда добавляем тайбрейкер.
+        search_sort = []
+        if sort:
+            search_sort.append({sort[1:]: 'desc'} if sort[0] == '-' else {sort: 'asc'})
+        elif by_score:
+            search_sort.append({'_score': 'desc'})
+        search_sort.append({TIEBREAKER_FIELD: 'asc'})
+        return search_sort
@@ -0,0 +1,163 @@
+import dataclasses
+import time
+from collections import OrderedDict
+from typing import Iterable, Sequence
+
+from core.content_encoding import ENCODINGS
+from core.metrics import cache_lookup
+from db.cache import Cache, CachedResponse
+
+# Метка слоя кеша в метриках.
+LAYER = 'local'
+
+
+class LocalCache(Cache):
+    """
+    Двухуровневый кеш: ограниченный по размеру LRU-кеш с TTL в памяти процесса (L1)
+    перед внешним кешем (L2, например RedisDb).
+    """
+
+    def __init__(self, cache_instance: Cache, max_size: int = 1024, ttl: float = 5):
+        self.cache_instance = cache_instance
+        self.max_size = max_size
+        self.ttl = ttl
+        self._items: OrderedDict[str, tuple[float, object]] = OrderedDict()
+        # Счетчики попаданий и промахов L1.
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, name: bytes | str, return_class: object.__class__) -> object.__class__ | None:
+        key = self._key(name)
+        item = self._get_local(key)
+        if item is not None:
+            return item
+
+        item = await self.cache_instance.get(name, return_class)
+        if item is not None:
+            self._set_local(key, item)
+        return item
+
+    async def get_list(self, name: bytes | str, return_class: object.__class__) -> list | None:
+        key = self._key(name)
+        items = self._get_local(key)
+        if items is not None:
+            return items
+
+        items = await self.cache_instance.get_list(name, return_class)
+        if items is not None:
+            self._set_local(key, items)
+        return items
+
+    async def mget(self, names: list[bytes | str], return_class: object.__class__) -> list:
+        items = [self._get_local(self._key(name)) for name in names]
+        missing = [index for index, item in enumerate(items) if item is None]
+        if missing:
+            # Из L2 запрашиваем одним вызовом только то, чего нет в L1.
+            loaded = await self.cache_instance.mget([names[index] for index in missing], return_class)
+            for index, item in zip(missing, loaded):
+                if item is not None:
+                    self._set_local(self._key(names[index]), item)
+                items[index] = item
+        return items
+
+    async def set(self, name: bytes | str, value: object, ex: int | None = None, tags: Iterable[str] = ()) -> None:
+        await self.cache_instance.set(name, value, ex, tags)
+        # Сериализованное значение нельзя положить в L1 без повторного разбора,
+        # поэтому просто сбрасываем устаревшую запись: следующее чтение возьмет ее из L2.
+        self._items.pop(self._key(name), None)
+
+    async def mset(self, mapping: dict[bytes | str, object], ex: int | None = None) -> None:
+        await self.cache_instance.mset(mapping, ex)
+        for name in mapping:
+            self._items.pop(self._key(name), None)
+
+    async def get_response(
+            self, name: bytes | str, etags: Sequence[str] = (), encoding: str | None = None
+    ) -> CachedResponse | None:
+        # Для каждой кодировки в L1 лежит свой вариант ответа.
+        key = self._response_key(name, encoding)
+        entry = self._get_local(key)
+        if entry is not None:
+            stored_at, response = entry
+            if response and response.ttl is not None:
+                # Оставшееся время жизни в L2 уменьшилось, пока запись лежала в L1.
+                return dataclasses.replace(response, ttl=response.ttl - (time.monotonic() - stored_at))
+            return response
+
+        response = await self.cache_instance.get_response(name, etags, encoding)
+        # Ответ без тела (ETag совпал) в L1 не кладем: следующему клиенту может понадобиться тело.
+        if response is not None and not (response and response.not_modified):
+            # Решение о досрочном обновлении принимается при чтении из L2 и в L1 не переносится:
+            # иначе каждое попадание в L1 запускало бы обновление повторно.
+            local = dataclasses.replace(response, refresh=False) if response else response
+            self._set_local(key, (time.monotonic(), local))
+        return response
+
+    async def set_response(
+            self, name: bytes | str, response: CachedResponse, ex: int | None = None, tags: Iterable[str] = ()
+    ) -> None:
+        await self.cache_instance.set_response(name, response, ex, tags)
+        # Готовый ответ неизменяем, поэтому его можно сразу положить в L1 - вместе со сжатыми вариантами.
+        # Если варианта в какой-то кодировке нет (тело меньше порога сжатия), в ней отдается несжатое тело.
+        stored_at = time.monotonic()
+        plain = dataclasses.replace(response, ttl=ex, variants={}) if response else response
+        self._set_local(self._key(name), (stored_at, plain))
+        for encoding in ENCODINGS:
+            variant = plain
+            if response and encoding in response.variants:
+                variant = dataclasses.replace(plain, body=response.variants[encoding], encoding=encoding)
+            self._set_local(self._response_key(name, encoding), (stored_at, variant))
+
+    async def invalidate(self, tags: Iterable[str]) -> int:
+        deleted = await self.cache_instance.invalidate(tags)
+        # L1 не знает тегов своих записей, поэтому сбрасываем его целиком; в других процессах
+        # устаревшие записи L1 истекут сами не позже чем через ttl секунд.
+        self._items.clear()
+        return deleted
+
+    async def acquire(self, name: bytes | str, ex: int) -> bool:
+        return await self.cache_instance.acquire(name, ex)
+
+    async def ping(self):
+        await self.cache_instance.ping()
+
+    async def close(self):
+        self._items.clear()
+        await self.cache_instance.close()
+
+    def stats(self) -> dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._items)}
+
+    def _get_local(self, key: str) -> object | None:
+        entry = self._items.get(key)
+        if entry is None:
+            self.misses += 1
+            cache_lookup(LAYER, key, None)
+            return None
+
+        expires_at, item = entry
+        if expires_at <= time.monotonic():
+            del self._items[key]
+            self.misses += 1
+            cache_lookup(LAYER, key, None)
+            return None
+
+        self._items.move_to_end(key)
+        self.hits += 1
+        cache_lookup(LAYER, key, item)
+        return item
+
+    def _set_local(self, key: str, item: object) -> None:
+        self._items[key] = (time.monotonic() + self.ttl, item)
+        self._items.move_to_end(key)
+        # Вытесняем самые давно использованные записи при превышении размера.
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    @staticmethod
+    def _key(name: bytes | str) -> str:
+        return name.decode('utf-8') if isinstance(name, bytes) else name
+
+    @classmethod
+    def _response_key(cls, name: bytes | str, encoding: str | None) -> str:
+        return cls._key(name) + '|' + encoding if encoding else cls._key(name)
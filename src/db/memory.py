@@ -0,0 +1,287 @@
+import bisect
+import math
+import re
+from collections import defaultdict
+from pathlib import Path
+from typing import AsyncIterator
+
+import orjson
+from pydantic import UUID4
+
+from db.database import AnyOf, cursor_scope, DataBase, encode_cursor, Filter, read_cursor, Total
+
+# Поля, индексы по которым строятся сразу при загрузке: поиск по названию и имени, фильтр по жанру.
+INDEXED_FIELDS = {
+    'movies': ('title', 'genre.name'),
+    'persons': ('full_name',),
+}
+# Поля, по которым при загрузке заранее упорядочиваются документы.
+SORTED_FIELDS = {
+    'movies': ('imdb_rating',),
+}
+
+TOKEN_RE = re.compile(r'\w+')
+# Стоп-слова английского анализатора Elasticsearch (_english_).
+STOPWORDS = frozenset((
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'but', 'by', 'for', 'if', 'in', 'into', 'is', 'it', 'no', 'not',
+    'of', 'on', 'or', 'such', 'that', 'the', 'their', 'then', 'there', 'these', 'they', 'this', 'to', 'was',
+    'will', 'with',
+))
+
+
+def tokenize(text: str) -> list[str]:
+    # Приближение анализатора индексов: стандартный токенизатор, нижний регистр, английские стоп-слова.
+    return [token for token in TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+class Index:
+    """
+    Документы одного индекса с построенными по ним структурами поиска.
+    """
+
+    def __init__(self, docs: list[dict]):
+        self.docs = docs
+        self.positions = {doc['uuid']: position for position, doc in enumerate(docs)}
+        # Поле -> токен -> {позиция документа: число вхождений}.
+        self.postings: dict[str, dict[str, dict[int, int]]] = {}
+        # Поле (с минусом - по убыванию) -> позиции всех документов в порядке сортировки.
+        self.orders: dict[str, list[int]] = {}
+
+    def postings_for(self, field: str) -> dict[str, dict[int, int]]:
+        postings = self.postings.get(field)
+        if postings is None:
+            postings = defaultdict(dict)
+            for position, doc in enumerate(self.docs):
+                for value in self._values(doc, field.split('.')):
+                    for token in tokenize(str(value)):
+                        postings[token][position] = postings[token].get(position, 0) + 1
+            self.postings[field] = postings = dict(postings)
+        return postings
+
+    def order_for(self, sort: str) -> list[int]:
+        # sort - имя поля, с минусом для порядка по убыванию. Документы без значения, как и в Elasticsearch,
+        # идут в конце в обоих направлениях.
+        order = self.orders.get(sort)
+        if order is None:
+            field = sort.lstrip('-')
+            present = [position for position, doc in enumerate(self.docs) if doc.get(field) is not None]
+            missing = [position for position, doc in enumerate(self.docs) if doc.get(field) is None]
+            # Сортировка устойчивая: документы с равными значениями остаются в порядке загрузки.
+            present.sort(key=lambda position: self.docs[position][field], reverse=sort.startswith('-'))
+            self.orders[sort] = order = present + missing
+        return order
+
+    def match(self, field: str, text: str) -> dict[int, float]:
+        # Запрос match: документ подходит, если содержит хотя бы один токен запроса (OR).
+        # Релевантность - сумма tf * idf по совпавшим токенам.
+        postings = self.postings_for(field)
+        scores: dict[int, float] = defaultdict(float)
+        for token in tokenize(text):
+            matched = postings.get(token)
+            if not matched:
+                continue
+            idf = math.log(1 + len(self.docs) / len(matched))
+            for position, frequency in matched.items():
+                scores[position] += frequency * idf
+        return scores
+
+    def select(self, condition: Filter) -> set[int]:
+        # Позиции документов, удовлетворяющих условию отбора.
+        if isinstance(condition, AnyOf) and condition.text:
+            # Как match с operator=and: документ содержит все токены хотя бы одного из значений.
+            postings = self.postings_for(condition.field)
+            selected = set()
+            for value in condition.values:
+                tokens = tokenize(str(value))
+                if tokens:
+                    selected |= set.intersection(*(set(postings.get(token, ())) for token in tokens))
+            return selected
+        path = condition.field.split('.')
+        if isinstance(condition, AnyOf):
+            values = {str(value) for value in condition.values}
+            return {position for position, doc in enumerate(self.docs)
+                    if any(str(value) in values for value in self._values(doc, path))}
+        low = -math.inf if condition.gte is None else condition.gte
+        high = math.inf if condition.lte is None else condition.lte
+        return {position for position, doc in enumerate(self.docs)
+                if any(low <= value <= high for value in self._values(doc, path))}
+
+    @classmethod
+    def _values(cls, value: object, path: list[str]) -> list:
+        # Значения по пути с точками с разворачиванием вложенных списков (genre.name).
+        if isinstance(value, list):
+            return [item for element in value for item in cls._values(element, path)]
+        if not path:
+            return [] if value is None else [value]
+        if not isinstance(value, dict):
+            return []
+        return cls._values(value.get(path[0]), path[1:])
+
+
+class MemoryDataBase(DataBase):
+    """
+    DataBase в памяти процесса для небольших развертываний и бенчмарков.
+
+    Поиск match по текстовым полям идет по инвертированному индексу, фильтр по жанру - по спискам
+    документов для каждого токена названия жанра, сортировка - по заранее упорядоченным позициям.
+    В отличие от Elasticsearch, стемминг не выполняется, а релевантность считается по tf-idf, а не BM25.
+    """
+
+    def __init__(self, documents: dict[str, list[dict]] | None = None):
+        self.indexes: dict[str, Index] = {}
+        for source, docs in (documents or {}).items():
+            self.load(source, docs)
+
+    @classmethod
+    def from_dir(cls, path: str | Path) -> 'MemoryDataBase':
+        # Каждый индекс - файл <индекс>.json с JSON-массивом документов или с документом на строку (NDJSON).
+        documents = {}
+        for file in sorted(Path(path).glob('*.json')):
+            data = file.read_bytes()
+            documents[file.stem] = (
+                orjson.loads(data) if data.lstrip().startswith(b'[')
+                else [orjson.loads(line) for line in data.splitlines() if line.strip()]
+            )
+        return cls(documents)
+
+    def load(self, source: str, docs: list[dict]) -> None:
+        index = Index(list(docs))
+        for field in INDEXED_FIELDS.get(source, ()):
+            index.postings_for(field)
+        for field in SORTED_FIELDS.get(source, ()):
+            index.order_for(field)
+            index.order_for('-' + field)
+        self.indexes[source] = index
+
+    async def get(self, source: str, id_: UUID4, return_class: object.__class__,
+                  fields: list[str] | None = None) -> object.__class__ | None:
+        index = self.indexes.get(source)
+        position = index.positions.get(str(id_)) if index else None
+        if position is None:
+            return None
+        return return_class(**self._project(index.docs[position], fields))
+
+    async def mget(self, source: str, ids: list[UUID4], return_class: object.__class__,
+                   fields: list[str] | None = None) -> list:
+        index = self.indexes.get(source)
+        if index is None:
+            return []
+        positions = (index.positions.get(str(id_)) for id_ in ids)
+        return [return_class(**self._project(index.docs[position], fields))
+                for position in positions if position is not None]
+
+    async def search(self, source: str, return_class: object.__class__, search_field: str | None = None,
+                     search_string: str | None = None, filter_field: str | None = None,
+                     filter_string: str | None = None, sort: str | None = None, page: int | None = 1,
+                     per_page: int | None = 1, fields: list[str] | None = None,
+                     filters: list[Filter] | None = None) -> list | None:
+        index = self.indexes.get(source)
+        if index is None:
+            return None
+        start = (page - 1) * per_page
+        if not (search_field and search_string) and not (filter_field and filter_string) and not filters:
+            # Без условий страница - просто срез заранее упорядоченного списка.
+            positions = index.order_for(sort) if sort else range(len(index.docs))
+            page_positions = positions[start:start + per_page]
+        else:
+            keys = self._ordered(index, search_field, search_string, filter_field, filter_string, sort, filters)
+            page_positions = [position for _, position in keys[start:start + per_page]]
+        return [return_class(**self._project(index.docs[position], fields)) for position in page_positions]
+
+    async def search_after(self, source: str, return_class: object.__class__, search_field: str | None = None,
+                           search_string: str | None = None, filter_field: str | None = None,
+                           filter_string: str | None = None, sort: str | None = None, per_page: int | None = 1,
+                           fields: list[str] | None = None, cursor: str | None = None,
+                           filters: list[Filter] | None = None) -> tuple[list, str | None]:
+        # Как и в Elastic, курсор хранит ключ сортировки последнего документа страницы и отпечаток запроса,
+        # а уникальность ключа обеспечивает идентификатор документа. PIT здесь не бывает.
+        scope = cursor_scope(source, search_field, search_string, filter_field, filter_string, filters, sort)
+        sort_size = 2 if sort or search_field and search_string else 1
+        after = None
+        if cursor:
+            state = read_cursor(cursor, scope, sort_size)
+            if state.get('pit') is not None:
+                raise ValueError('invalid cursor')
+            after = tuple(state['after'])
+        index = self.indexes.get(source)
+        if index is None:
+            return [], None
+        keys = self._ordered(
+            index, search_field, search_string, filter_field, filter_string, sort, filters, by_uuid=True
+        )
+        start = 0
+        if after is not None:
+            try:
+                start = bisect.bisect_right(keys, (after, len(index.docs)))
+            except TypeError:
+                # Значения ключа другого типа, чем у сортировки: в Elastic это тоже ошибка запроса.
+                raise ValueError('invalid cursor') from None
+        page = keys[start:start + per_page]
+        next_cursor = encode_cursor({'after': list(page[-1][0]), 'scope': scope}) if len(page) == per_page else None
+        return [return_class(**self._project(index.docs[position], fields)) for _, position in page], next_cursor
+
+    async def count(self, source: str, search_field: str | None = None, search_string: str | None = None,
+                    filter_field: str | None = None, filter_string: str | None = None,
+                    filters: list[Filter] | None = None, limit: int = 10000) -> Total:
+        index = self.indexes.get(source)
+        if index is None:
+            return Total(value=0)
+        if not (search_field and search_string) and not (filter_field and filter_string) and not filters:
+            value = len(index.docs)
+        else:
+            value = len(self._ordered(index, search_field, search_string, filter_field, filter_string, None, filters))
+        return Total(value=min(value, limit), exact=value <= limit)
+
+    async def scan(self, source: str, fields: list[str] | None = None, after: str | None = None,
+                   batch_size: int = 1000) -> AsyncIterator[list[dict]]:
+        index = self.indexes.get(source)
+        if index is None:
+            return
+        order = index.order_for('uuid')
+        start = bisect.bisect_right(order, after, key=lambda position: index.docs[position]['uuid']) if after else 0
+        for offset in range(start, len(order), batch_size):
+            yield [self._project(index.docs[position], fields) for position in order[offset:offset + batch_size]]
+
+    async def ping(self):
+        pass
+
+    async def close(self):
+        self.indexes.clear()
+
+    @staticmethod
+    def _ordered(index: Index, search_field: str | None, search_string: str | None, filter_field: str | None,
+                 filter_string: str | None, sort: str | None, filters: list[Filter] | None = None,
+                 by_uuid: bool = False) -> list[tuple[tuple, int]]:
+        # Возвращает отсортированные пары (ключ сортировки, позиция документа) для всех подходящих документов.
+        matched = None
+        if filter_field and filter_string:
+            matched = set(index.match(filter_field, filter_string))
+        for condition in filters or ():
+            selected = index.select(condition)
+            matched = selected if matched is None else matched & selected
+        scores = None
+        if search_field and search_string:
+            scores = index.match(search_field, search_string)
+            matched = set(scores) if matched is None else matched & set(scores)
+
+        def tiebreak(position: int) -> tuple:
+            return (index.docs[position]['uuid'],) if by_uuid else ()
+
+        if sort:
+            # Ключ - место документа в заранее упорядоченном списке.
+            keys = [((rank,) + tiebreak(position), position) for rank, position in enumerate(index.order_for(sort))
+                    if matched is None or position in matched]
+        elif scores is not None:
+            keys = [((-score,) + tiebreak(position), position)
+                    for position, score in scores.items() if position in matched]
+        else:
+            positions = range(len(index.docs)) if matched is None else sorted(matched)
+            keys = [(tiebreak(position) or (position,), position) for position in positions]
+
+        if by_uuid or scores is not None and not sort:
+            keys.sort()
+        return keys
+
+    @staticmethod
+    def _project(doc: dict, fields: list[str] | None) -> dict:
+        return {field: doc[field] for field in fields if field in doc} if fields else doc
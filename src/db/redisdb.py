@@ -1,38 +1,298 @@
+import random
+import time
+from typing import Callable, Iterable, Sequence
+
 from orjson import orjson
+from pydantic import BaseModel
 from redis.asyncio import Redis
 
-from db.cache import Cache
+from core.metrics import cache_errors, cache_lookup
+from core.timing import phase
+from db.cache import Cache, CachedResponse, NOT_FOUND
+from db.codec import Codec, codec_for, json_codec
+from db.compression import Compressor
+from db.tags import TAG_KEY_PREFIX, entity_tags
+from db.xfetch import should_recompute
+
+# Метка слоя кеша в метриках.
+LAYER = 'redis'
+# Представление отметки NOT_FOUND в Redis.
+TOMBSTONE = b'null'
+# Начало списка в старом формате: JSON-массив из JSON-строк с отдельно сериализованными объектами.
+LEGACY_LIST_PREFIX = b'["'
+# Поле хеша ответа с несжатым телом; сжатые варианты лежат в полях "body:<Content-Encoding>".
+BODY_FIELD = 'body'
+# Условное чтение ответа: метаданные, оставшееся время жизни и поле тела, которое будет отдано (ARGV[1],
+# если оно есть, иначе несжатое). Само тело - только если ETag отдаваемого представления (у сжатого варианта
+# с суффиксом кодировки, см. api.v1.responses.representation_etag) не совпал ни с одним из ARGV[2..]
+# ("*" совпадает с любым). Возвращает nil, если записи нет.
+RESPONSE_SCRIPT = """
+local pttl = redis.call('PTTL', KEYS[1])
+if pttl == -2 then
+    return nil
+end
+local meta = redis.call('HMGET', KEYS[1], 'etag', 'delta', 'expiry')
+local field = ARGV[1]
+if field ~= 'body' and redis.call('HEXISTS', KEYS[1], field) == 0 then
+    field = 'body'
+end
+if meta[1] then
+    local etag = meta[1]
+    if field ~= 'body' then
+        etag = string.sub(etag, 1, -2) .. '-' .. string.sub(field, 6) .. '"'
+    end
+    for i = 2, #ARGV do
+        if ARGV[i] == etag or ARGV[i] == '*' then
+            return {pttl, meta[1], meta[2], meta[3], field}
+        end
+    end
+end
+return {pttl, meta[1], meta[2], meta[3], field, redis.call('HGET', KEYS[1], field)}
+"""
+# Добавление записи ARGV[1] в множества ее тегов KEYS. Множества упорядочены по моменту истечения записей
+# (ARGV[3] - текущее время, ARGV[2] - время жизни записи, 0 - бессрочно): при каждой записи из них удаляются
+# истекшие записи, а само множество живет ровно столько, сколько самая долгоживущая из оставшихся.
+# Скрипт обращается только к переданным в KEYS множествам.
+TAG_SCRIPT = """
+local now = tonumber(ARGV[3])
+local ex = tonumber(ARGV[2])
+for _, tag in ipairs(KEYS) do
+    redis.call('ZREMRANGEBYSCORE', tag, '-inf', now)
+    if ex == 0 then
+        redis.call('ZADD', tag, '+inf', ARGV[1])
+    else
+        redis.call('ZADD', tag, now + ex, ARGV[1])
+    end
+    if redis.call('ZCOUNT', tag, '+inf', '+inf') > 0 then
+        redis.call('PERSIST', tag)
+    else
+        local last = redis.call('ZRANGE', tag, -1, -1, 'WITHSCORES')
+        redis.call('EXPIRE', tag, math.ceil(tonumber(last[2]) - now))
+    end
+end
+return 0
+"""
+# Число ключей в одной команде UNLINK или ZREM при сбросе по тегам.
+INVALIDATE_BATCH_SIZE = 1000
 
 
 class RedisDb(Cache):
 
-    def __init__(self, cache_instance: Redis):
+    def __init__(self, cache_instance: Redis, xfetch_beta: float = 1.0,
+                 clock: Callable[[], float] = time.time, rand: Callable[[], float] = random.random,
+                 compressor: Compressor | None = None, codec: Codec = json_codec, tagging: bool = True,
+                 key_prefix: str = ''):
         self.cache_instance = cache_instance
+        # Префикс всех ключей: версия формата значений. Процессы разных версий не читают записи друг друга.
+        self.key_prefix = key_prefix
+        # Помечать ли записи тегами входящих в них сущностей для адресного сброса.
+        self.tagging = tagging
+        self._tag_script = cache_instance.register_script(TAG_SCRIPT)
+        self._response_script = cache_instance.register_script(RESPONSE_SCRIPT)
+        # Кодек используется для записи, при чтении формат определяется по самому значению.
+        self.codec = codec
+        # Без компрессора значения пишутся несжатыми, но ранее сжатые записи все равно читаются.
+        self.compressor = compressor or Compressor(threshold=None)
+        self.xfetch_beta = xfetch_beta
+        # Часы и генератор случайных чисел для XFetch подменяются в тестах.
+        self.clock = clock
+        self.rand = rand
 
     async def get(self, name: bytes | str, return_class: object.__class__) -> object.__class__ | None:
-        data = await self.cache_instance.get(name)
-        if not data:
-            return None
-
-        item = return_class.model_validate_json(data)
-        return item
+        with cache_errors(LAYER, name), phase('redis'):
+            data = await self.cache_instance.get(self._key(name))
+        cache_lookup(LAYER, name, data)
+        return self._decode(data, return_class)
 
     async def get_list(self, name: bytes | str, return_class: object.__class__) -> list | None:
-        data = await self.cache_instance.get(name)
+        with cache_errors(LAYER, name), phase('redis'):
+            data = await self.cache_instance.get(self._key(name))
+        cache_lookup(LAYER, name, data)
         if not data:
             return None
+        with phase('decode'):
+            data = self.compressor.decompress(data)
+            if data.startswith(LEGACY_LIST_PREFIX):
+                # Записи старого формата дочитываем как раньше, пока они не истекут.
+                return [return_class.model_validate_json(item) for item in orjson.loads(data)]
+
+            return codec_for(data).loads_list(data, return_class)
+
+    async def mget(self, names: list[bytes | str], return_class: object.__class__) -> list:
+        if not names:
+            return []
+        with cache_errors(LAYER, names[0]), phase('redis'):
+            values = await self.cache_instance.mget([self._key(name) for name in names])
+        for name, data in zip(names, values):
+            cache_lookup(LAYER, name, data)
+        # Результат выровнен по names: None для отсутствующих ключей.
+        return [self._decode(data, return_class) for data in values]
+
+    async def set(self, name: bytes | str, value: object, ex: int | None = None, tags: Iterable[str] = ()) -> None:
+        tags = entity_tags(value).union(tags) if self.tagging else None
+        with cache_errors(LAYER, name), phase('redis'):
+            if not tags:
+                await self.cache_instance.set(
+                    name=self._key(name),
+                    value=self._encode(value),
+                    ex=ex
+                )
+                return
+            async with self.cache_instance.pipeline(transaction=False) as pipe:
+                pipe.set(name=self._key(name), value=self._encode(value), ex=ex)
+                await self._tag(pipe, self._key(name), tags, ex)
+                await pipe.execute()
+
+    async def mset(self, mapping: dict[bytes | str, object], ex: int | None = None) -> None:
+        if not mapping:
+            return
+        # MSET не умеет задавать время жизни, поэтому отправляем SET-ы одним конвейером.
+        with cache_errors(LAYER, next(iter(mapping))), phase('redis'):
+            async with self.cache_instance.pipeline(transaction=False) as pipe:
+                for name, value in mapping.items():
+                    pipe.set(name=self._key(name), value=self._encode(value), ex=ex)
+                    if self.tagging:
+                        await self._tag(pipe, self._key(name), entity_tags(value), ex)
+                await pipe.execute()
 
-        return [return_class.model_validate_json(item) for item in orjson.loads(data)]
+    async def get_response(
+            self, name: bytes | str, etags: Sequence[str] = (), encoding: str | None = None
+    ) -> CachedResponse | None:
+        # Ответы хранятся в хеше, чтобы рядом с телом можно было держать его метаданные.
+        with cache_errors(LAYER, name), phase('redis'):
+            if etags or encoding:
+                # Условный запрос и выбор сжатого варианта: при совпадении ETag тело не передается,
+                # а сжатый вариант передается вместо несжатого.
+                field = f'{BODY_FIELD}:{encoding}' if encoding else BODY_FIELD
+                reply = await self._response_script(keys=[self._key(name)], args=[field, *etags])
+                reply = reply or [-2, None, None, None, BODY_FIELD, None]
+            else:
+                # Оставшееся время жизни запрашиваем в том же конвейере.
+                async with self.cache_instance.pipeline(transaction=False) as pipe:
+                    pipe.pttl(self._key(name))
+                    pipe.hmget(self._key(name), ['etag', 'delta', 'expiry', BODY_FIELD])
+                    pttl, (etag, delta, expiry, body) = await pipe.execute()
+                reply = [pttl, etag, delta, expiry, BODY_FIELD, body]
+        not_modified = len(reply) == 5
+        pttl, etag, delta, expiry, field, body = reply if not not_modified else (*reply, None)
+        field = field.decode('ascii') if isinstance(field, bytes) else field
+        cache_lookup(LAYER, name, True if not_modified else body)
+        if not not_modified:
+            if body is None:
+                return None
+            if not body:
+                return NOT_FOUND
 
-    async def set(self, name: bytes | str, value: bytes | str | int | float, ex: int | None = None) -> None:
-        await self.cache_instance.set(
-            name=name,
-            value=value,
-            ex=ex
+        # Несжатое тело может быть сжато zlib для хранения; готовые варианты отдаются как есть.
+        compressed = field != BODY_FIELD
+        response = CachedResponse(
+            body=b'' if not_modified else body if compressed else self.compressor.decompress(body),
+            ttl=pttl / 1000 if pttl >= 0 else None,
+            delta=float(delta or 0),
+            expiry=float(expiry) if expiry else None,
+            etag=etag.decode('ascii') if etag else None,
+            not_modified=not_modified,
+            encoding=field.partition(':')[2] if compressed else None
         )
+        if response.expiry is not None:
+            # XFetch: по стоимости вычисления и близости устаревания решаем, не обновить ли ответ заранее.
+            response.refresh = should_recompute(
+                response.delta, response.expiry, self.clock(), self.rand(), self.xfetch_beta
+            )
+        return response
+
+    async def set_response(
+            self, name: bytes | str, response: CachedResponse, ex: int | None = None, tags: Iterable[str] = ()
+    ) -> None:
+        key = self._key(name)
+        with cache_errors(LAYER, name), phase('redis'):
+            async with self.cache_instance.pipeline(transaction=True) as pipe:
+                # Поля прежней версии (ETag, сжатые варианты) не должны пережить замену ответа.
+                pipe.delete(key)
+                # Пустое тело означает закешированное отсутствие данных.
+                if response is NOT_FOUND:
+                    pipe.hset(key, mapping={BODY_FIELD: b''})
+                else:
+                    # Рядом с телом храним стоимость вычисления и момент устаревания для XFetch.
+                    # Если есть сжатые варианты, несжатое тело читают только клиенты без сжатия:
+                    # его не сжимаем, чтобы не хранить то же тело сжатым трижды и не распаковывать при чтении.
+                    body = response.body if response.variants else self.compressor.compress(response.body)
+                    mapping = {BODY_FIELD: body, 'delta': response.delta}
+                    for encoding, data in response.variants.items():
+                        mapping[f'{BODY_FIELD}:{encoding}'] = data
+                    if response.expiry is not None:
+                        mapping['expiry'] = response.expiry
+                    if response.etag is not None:
+                        mapping['etag'] = response.etag
+                    pipe.hset(key, mapping=mapping)
+                if ex:
+                    pipe.expire(key, ex)
+                if self.tagging:
+                    await self._tag(pipe, key, response.tags.union(tags) if response else set(tags), ex)
+                await pipe.execute()
+
+    async def invalidate(self, tags: Iterable[str]) -> int:
+        names = [TAG_KEY_PREFIX + tag for tag in tags]
+        if not names:
+            return 0
+        # Ключи записей читаются из множеств и удаляются отдельными командами, а не скриптом: скрипт
+        # обращался бы к ключам, не переданным в KEYS, что не работает в Redis Cluster.
+        tag_keys = [self._key(name) for name in names]
+        with cache_errors(LAYER, names[0]), phase('redis'):
+            async with self.cache_instance.pipeline(transaction=False) as pipe:
+                for tag_key in tag_keys:
+                    pipe.zrange(tag_key, 0, -1)
+                members = await pipe.execute()
+            keys = list(dict.fromkeys(key for chunk in members for key in chunk))
+            if not keys:
+                return 0
+            batches = range(0, len(keys), INVALIDATE_BATCH_SIZE)
+            async with self.cache_instance.pipeline(transaction=False) as pipe:
+                for start in batches:
+                    pipe.unlink(*keys[start:start + INVALIDATE_BATCH_SIZE])
+                # Из множеств удаляются только прочитанные ключи: записи, помеченные тегом за это время, остаются.
+                for tag_key, chunk in zip(tag_keys, members):
+                    for start in range(0, len(chunk), INVALIDATE_BATCH_SIZE):
+                        pipe.zrem(tag_key, *chunk[start:start + INVALIDATE_BATCH_SIZE])
+                replies = await pipe.execute()
+        # Удаленными считаются записи, которые еще существовали (ответы UNLINK).
+        return sum(replies[:len(batches)])
+
+    async def acquire(self, name: bytes | str, ex: int) -> bool:
+        with cache_errors(LAYER, name), phase('redis'):
+            return bool(await self.cache_instance.set(self._key(name), b'1', nx=True, ex=ex))
 
     async def ping(self):
         await self.cache_instance.ping()
 
     async def close(self):
         await self.cache_instance.close()
+
+    async def _tag(self, pipe, name: bytes | str, tags: Iterable[str], ex: int | None) -> None:
+        # Скрипт ставится в тот же конвейер, что и сама запись.
+        keys = [self._key(TAG_KEY_PREFIX + tag) for tag in tags]
+        if keys:
+            await self._tag_script(keys=keys, args=[name, ex or 0, self.clock()], client=pipe)
+
+    def _key(self, name: bytes | str) -> bytes | str:
+        if not self.key_prefix:
+            return name
+        return self.key_prefix.encode('utf-8') + name if isinstance(name, bytes) else self.key_prefix + name
+
+    def _encode(self, value: object) -> bytes | str | int | float:
+        # Модели и списки моделей сериализуем выбранным кодеком и сжимаем, если результат достаточно велик,
+        # остальные значения пишем как есть.
+        if value is NOT_FOUND:
+            return TOMBSTONE
+        if isinstance(value, (BaseModel, list)):
+            return self.compressor.compress(self.codec.dumps(value))
+        return value
+
+    def _decode(self, data: bytes | None, return_class: object.__class__) -> object.__class__ | None:
+        if not data:
+            return None
+        if data == TOMBSTONE:
+            return NOT_FOUND
+        with phase('decode'):
+            data = self.compressor.decompress(data)
+            return codec_for(data).loads(data, return_class)
@@ -0,0 +1,69 @@
+from functools import lru_cache
+from typing import get_args, Iterable
+
+from pydantic import BaseModel
+
+# Вид сущности по имени класса модели: тег записи кеша - "<вид>:<uuid>" для каждой входящей в нее сущности.
+# Вложенные модели фильма (Genre, Person) и ссылки на фильмы персоны (PersonFilms) тегируются так же.
+ENTITY_KINDS = {
+    'Film': 'film',
+    'FilmShort': 'film',
+    'PersonFilms': 'film',
+    'Genre': 'genre',
+    'Person': 'person',
+}
+# Префикс ключа Redis-множества с ключами записей, помеченных тегом.
+TAG_KEY_PREFIX = 'tag:'
+
+
+# Индексы, от содержимого которых зависят записи без сущностей (число найденных документов и отметки
+# о пустом результате), по виду сущности: изменение фильма или жанра меняет результаты отбора фильмов,
+# изменение жанра - еще и список жанров, изменение персоны - поиск персон.
+INDEX_KINDS = {
+    'film': ('movies',),
+    'genre': ('movies', 'genres'),
+    'person': ('persons',),
+}
+
+
+def entity_tag(kind: str, id_: object) -> str:
+    return f'{kind}:{id_}'
+
+
+def index_tag(source: str) -> str:
+    return f'index:{source}'
+
+
+def index_tags(tags: Iterable[str]) -> set[str]:
+    # Теги индексов, затронутых изменением сущностей с тегами tags.
+    return {index_tag(source) for tag in tags for source in INDEX_KINDS.get(tag.partition(':')[0], ())}
+
+
+def entity_tags(value: object) -> set[str]:
+    # Собирает теги всех сущностей в значении: модели, списке моделей и их вложенных полях.
+    tags = set()
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, list):
+            stack.extend(item)
+        elif isinstance(item, BaseModel):
+            kind = ENTITY_KINDS.get(type(item).__name__)
+            uuid = getattr(item, 'uuid', None)
+            if kind and uuid is not None:
+                tags.add(entity_tag(kind, uuid))
+            for name in _nested_fields(type(item)):
+                nested = getattr(item, name)
+                if nested is not None:
+                    stack.append(nested)
+    return tags
+
+
+@lru_cache(maxsize=None)
+def _nested_fields(cls: type[BaseModel]) -> tuple[str, ...]:
+    # Поля модели, в которых по аннотации могут быть вложенные модели: остальные поля не обходим.
+    def nested(annotation: object) -> bool:
+        if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+            return True
+        return any(nested(arg) for arg in get_args(annotation))
+    return tuple(name for name, field in cls.model_fields.items() if nested(field.annotation))
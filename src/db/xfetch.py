@@ -0,0 +1,16 @@
+import math
+import sys
+
+
+def should_recompute(delta: float, expiry: float, now: float, rand: float, beta: float = 1.0) -> bool:
+    """
+    Вероятностное досрочное обновление записи кеша (XFetch).
+
+    Чем ближе момент expiry и чем дороже вычисление значения (delta, секунды), тем выше вероятность,
+    что очередной читатель решит обновить запись заранее. Так обновления разных процессов и подов
+    распределяются во времени вместо одновременного промаха в момент истечения. После expiry
+    функция всегда возвращает True.
+
+    rand - равномерно распределенное случайное число из (0, 1], beta - агрессивность (1 - по умолчанию).
+    """
+    return now - delta * beta * math.log(max(rand, sys.float_info.min)) >= expiry
@@ -1,8 +1,59 @@
+import math
+import os
+import shutil
+
 from core.config import gunicorn_settings
 from core.logger import LOGGING
 
+# Классы воркеров по профилям (GUNICORN_PROFILE).
+WORKER_CLASSES = {
+    'performance': 'core.workers.UvicornHttptoolsWorker',
+    'compat': 'uvicorn.workers.UvicornH11Worker',
+}
+
+
+def available_cpus() -> int:
+    # Ядра, на которых процессу разрешено выполняться, с учетом квоты CPU контейнера (cgroup v2).
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+    try:
+        quota, period = open('/sys/fs/cgroup/cpu.max').read().split()
+        if quota != 'max':
+            cpus = min(cpus, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+def default_workers() -> int:
+    # Асинхронный воркер сам загружает ядро целиком, поэтому воркеров нужно не больше, чем ядер.
+    count = max(round(available_cpus() * gunicorn_settings.workers_per_core), 1)
+    return min(count, gunicorn_settings.max_workers) if gunicorn_settings.max_workers else count
+
+
 bind = f'{gunicorn_settings.host}:{gunicorn_settings.port}'
-workers = gunicorn_settings.workers
+workers = gunicorn_settings.workers or default_workers()
+worker_class = WORKER_CLASSES[gunicorn_settings.profile]
+keepalive = gunicorn_settings.keepalive
+backlog = gunicorn_settings.backlog
+max_requests = gunicorn_settings.max_requests
+max_requests_jitter = gunicorn_settings.max_requests_jitter
 logconfig_dict = LOGGING
 loglevel = gunicorn_settings.loglevel
-worker_class = 'uvicorn.workers.UvicornH11Worker'
+
+# Воркеры пишут метрики Prometheus в общий каталог, откуда /metrics собирает их вместе.
+# Переменная должна быть задана до импорта prometheus_client в воркерах.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', gunicorn_settings.metrics_dir)
+
+
+def on_starting(server):
+    # Значения от предыдущего запуска не должны попасть в метрики.
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    # Убираем живые gauge-метрики завершившегося воркера.
+    multiprocess.mark_process_dead(worker.pid)
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 
@@ -7,27 +8,74 @@ from fastapi import FastAPI
 from fastapi.responses import ORJSONResponse
 from redis.asyncio import Redis
 
+from api import compression, internal, metrics, timing
 from api.v1 import films, genres, persons
-from core.config import redis_settings, elastic_settings, project_settings
+from core.config import (
+    redis_settings, elastic_settings, project_settings, local_cache_settings, cache_settings, server_timing_settings,
+    database_settings, genre_catalog_settings, warmup_settings, internal_api_settings, response_compression_settings
+)
 from core.logger import LOGGING
 from db import cache
 from db import database
+from db.codec import get_codec
+from db.compression import Compressor
 from db.elastic import Elastic
+from db.localcache import LocalCache
+from db.memory import MemoryDataBase
 from db.redisdb import RedisDb
+from services import genre
+from services.genre import GenreCatalog
+from warmup import warm_up_current
 
 
 @asynccontextmanager
 async def lifespan(_: FastAPI):
     # Создаем подключение к базам при старте сервера.
-    cache.cache = RedisDb(Redis(host=redis_settings.host, port=redis_settings.port))
-    database.db = Elastic(AsyncElasticsearch(hosts=[f'http://{elastic_settings.host}:{elastic_settings.port}']))
+    cache.cache = RedisDb(
+        Redis(host=redis_settings.host, port=redis_settings.port),
+        xfetch_beta=cache_settings.xfetch_beta,
+        compressor=Compressor(
+            threshold=cache_settings.compress_threshold or None, level=cache_settings.compress_level
+        ),
+        codec=get_codec(cache_settings.codec),
+        tagging=cache_settings.tags_enabled,
+        key_prefix=f'{cache_settings.key_version}:' if cache_settings.key_version else ''
+    )
+    if local_cache_settings.enabled:
+        # Оборачиваем Redis локальным кешем процесса для самых горячих ключей.
+        cache.cache = LocalCache(cache.cache, max_size=local_cache_settings.max_size, ttl=local_cache_settings.ttl)
+    if database_settings.engine == 'memory':
+        # Небольшие развертывания обходятся без Elasticsearch: документы загружаются в память процесса.
+        database.db = MemoryDataBase.from_dir(database_settings.memory_data_dir)
+    else:
+        database.db = Elastic(AsyncElasticsearch(hosts=[f'http://{elastic_settings.host}:{elastic_settings.port}']),
+                              pit_keep_alive=elastic_settings.pit_keep_alive)
 
     # Проверяем соединения с базами.
     await cache.cache.ping()
     await database.db.ping()
 
+    if genre_catalog_settings.enabled:
+        # Загружаем справочник жанров целиком и дальше обновляем его в фоне.
+        genre.catalog = GenreCatalog(database.db, refresh_interval=genre_catalog_settings.refresh_interval)
+        await genre.catalog.load()
+        genre.catalog.start()
+
+    warmup = None
+    if warmup_settings.on_startup:
+        # Прогреваем кеш в фоне, не задерживая готовность приложения к запросам. Блокировка в Redis
+        # не дает каждому воркеру повторять тот же прогрев.
+        warmup = asyncio.create_task(warm_up_current(
+            lock_ttl=warmup_settings.lock_ttl, pages=warmup_settings.pages, top_films=warmup_settings.top_films,
+            concurrency=warmup_settings.concurrency
+        ))
+
     yield
 
+    if warmup and not warmup.done():
+        warmup.cancel()
+    if genre.catalog:
+        await genre.catalog.stop()
     # Отключаемся от баз при выключении сервера
     await cache.cache.close()
     await database.db.close()
@@ -48,6 +96,24 @@ app = FastAPI(
     description="API для получения информации о фильмах, жанрах и людях, участвовавших в их создании",
 )
 
+if response_compression_settings.enabled:
+    # Сжатие ответов без заранее сжатого варианта. Подключается первым, чтобы метрики видели размер после сжатия.
+    app.add_middleware(compression.CompressionMiddleware)
+
+# Измеряем время обработки и размер ответа каждого запроса.
+app.add_middleware(metrics.MetricsMiddleware)
+
+if server_timing_settings.enabled:
+    # Разбивка времени обработки запроса по фазам в заголовке Server-Timing.
+    app.add_middleware(timing.ServerTimingMiddleware)
+
+# Метрики в формате Prometheus.
+app.include_router(metrics.router, prefix='/metrics')
+
+if internal_api_settings.token:
+    # Служебный API (сброс кеша по тегам) доступен только при заданном токене.
+    app.include_router(internal.router, prefix='/internal')
+
 # Подключаем роутер к серверу с указанием префикса для API (/v1/films).
 app.include_router(films.router, prefix='/api/v1/films', tags=['Films'])
 
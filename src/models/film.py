@@ -31,14 +31,18 @@ class Person(BaseModel):
     """Фильмы, в которых принимала участия указанная персона"""
 
 
-class Film(BaseModel):
-    """Фильм"""
+class FilmShort(BaseModel):
+    """Краткое представление фильма (для списков)"""
     uuid: UUID
     """Идентификатор фильма (UUID)"""
     title: Annotated[str, IsNotNan, MinLen(1)]
     """Название фильма"""
     imdb_rating: Annotated[float, Ge(0)] | None
     """Рейтинг фильма"""
+
+
+class Film(FilmShort):
+    """Фильм"""
     description: str | None
     """Описание фильма"""
     genre: list[Genre]
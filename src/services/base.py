@@ -0,0 +1,185 @@
+import asyncio
+import hashlib
+import logging
+import time
+from typing import AsyncIterator, Awaitable, Callable, Iterable, Sequence
+
+import orjson
+
+from core.config import cache_settings, export_settings
+from core.content_encoding import encode_all
+from core.timing import phase
+from db.cache import Cache, CachedResponse, NOT_FOUND
+from db.database import DataBase
+from db.tags import entity_tags
+
+logger = logging.getLogger(__name__)
+
+
+def make_etag(body: bytes | str) -> str:
+    # Строгий ETag: короткий хеш тела ответа в кавычках.
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+class BaseService:
+    """
+    BaseService содержит общую для сервисов логику чтения данных через кеш.
+    """
+
+    def __init__(self, cache: Cache, db: DataBase, clock: Callable[[], float] = time.time):
+        self.cache = cache
+        self.db = db
+        # Часы для момента устаревания ответа: те же, по которым кеш решает о досрочном обновлении (XFetch).
+        self.clock = clock
+        # Выполняющиеся в данный момент загрузки из базы по ключу кеша.
+        self._in_flight: dict[str, asyncio.Future] = {}
+
+    # _get_item возвращает объект из кеша, а при его отсутствии загружает из базы и сохраняет в кеш.
+    # Отметка об отсутствии объекта помечается tags и negative_tags: сущностей в ней нет, поэтому ее сбрасывают
+    # теги запрошенной сущности или индекса, в котором она может появиться.
+    async def _get_item(
+            self, *, name: str, return_class: object.__class__, loader: Callable[[], Awaitable], ex: int,
+            tags: Iterable[str] = (), negative_tags: Iterable[str] = ()
+    ) -> object.__class__ | None:
+        # Пытаемся получить данные из кеша, потому что оно работает быстрее
+        item = await self.cache.get(name=name, return_class=return_class)
+        if item is None:
+            # Если объекта нет в кеше, то загружаем его из базы.
+            # Одновременные запросы одного и того же ключа ждут одну общую загрузку.
+            item = await self._single_flight(
+                name,
+                lambda: self._load_item(name=name, loader=loader, ex=ex, tags=tags, negative_tags=negative_tags)
+            )
+
+        # NOT_FOUND означает, что отсутствие объекта в базе уже закешировано.
+        return item or None
+
+    # _get_items_by_ids возвращает объекты по списку идентификаторов: из кеша одним запросом,
+    # а недостающие - одним запросом из базы
+    async def _get_items_by_ids(
+            self, *, prefix: str, ids: list, return_class: object.__class__,
+            loader: Callable[[list], Awaitable], ex: int
+    ) -> list:
+        if not ids:
+            return []
+        items = await self.cache.mget(names=[prefix + str(id_) for id_ in ids], return_class=return_class)
+        missing = [id_ for id_, item in zip(ids, items) if item is None]
+        if missing:
+            loaded = {str(item.uuid): item for item in (await loader(missing) or [])}
+            if loaded:
+                # Сохраняем загруженные объекты в кэше одним конвейером, указывая время жизни.
+                await self.cache.mset(
+                    mapping={prefix + uuid: item for uuid, item in loaded.items()}, ex=ex
+                )
+            items = [item or loaded.get(str(id_)) for id_, item in zip(ids, items)]
+
+        return [item for item in items if item]
+
+    # _get_response возвращает готовое тело ответа API из кеша, а при его отсутствии
+    # загружает данные, сериализует их переданным serializer-ом и сохраняет результат в кеш.
+    # Ответ свеж ex секунд, после чего еще stale_ex секунд отдается из кеша, пока в фоне загружается новый.
+    # Ближе к концу свежести кеш может заранее попросить обновить ответ (XFetch), чтобы процессы
+    # не обновляли популярный ключ все одновременно.
+    # Ответ помечается тегами входящих в него сущностей и дополнительными tags для адресного сброса кеша,
+    # отметка об отсутствии ответа - tags и negative_tags (см. _get_item).
+    # Etags - значения If-None-Match клиента: при совпадении кеш может вернуть ответ без тела (not_modified).
+    # Encoding - выбранный по Accept-Encoding Content-Encoding: кеш может вернуть заранее сжатое тело.
+    async def _get_response(
+            self, *, name: str, loader: Callable[[], Awaitable], serializer: Callable[[object], bytes], ex: int,
+            stale_ex: int = 0, tags: Iterable[str] = (), negative_tags: Iterable[str] = (),
+            etags: Sequence[str] = (), encoding: str | None = None
+    ) -> CachedResponse | None:
+        def load(refresh: bool = False) -> Awaitable:
+            return self._load_response(
+                name=name, loader=loader, serializer=serializer, ex=ex, stale_ex=stale_ex, tags=tags,
+                negative_tags=negative_tags, refresh=refresh
+            )
+
+        response = await self.cache.get_response(name=name, etags=etags, encoding=encoding)
+        if response is None:
+            response = await self._single_flight(name, load)
+        elif response and (response.refresh or response.ttl is not None and response.ttl < stale_ex):
+            # Ответ устарел или скоро устареет: отдаем его сразу, а обновление запускаем в фоне.
+            self._start(name, lambda: load(refresh=True))
+
+        return response or None
+
+    # _export выгружает все документы источника в формате NDJSON (документ на строку) частями по пачке
+    # документов: потребление памяти не зависит от размера каталога. Документы не кешируются.
+    async def _export(self, *, source: str, fields: list[str] | None, after: str | None) -> AsyncIterator[bytes]:
+        async for docs in self.db.scan(
+                source=source, fields=fields, after=after, batch_size=export_settings.batch_size
+        ):
+            yield b''.join(orjson.dumps(doc, option=orjson.OPT_APPEND_NEWLINE) for doc in docs)
+
+    async def _load_item(
+            self, *, name: str, loader: Callable[[], Awaitable], ex: int, tags: Iterable[str] = (),
+            negative_tags: Iterable[str] = ()
+    ) -> object.__class__ | None:
+        item = await loader()
+        if item:
+            # Сохраняем данные в кэше, указывая время жизни.
+            await self.cache.set(name=name, value=item, ex=ex, tags=tags)
+        elif cache_settings.negative_enabled:
+            # Запоминаем отсутствие объекта на короткое время, чтобы повторные промахи не доходили до базы.
+            await self.cache.set(
+                name=name, value=NOT_FOUND, ex=cache_settings.negative_ttl, tags=[*tags, *negative_tags]
+            )
+        return item
+
+    async def _load_response(
+            self, *, name: str, loader: Callable[[], Awaitable], serializer: Callable[[object], bytes], ex: int,
+            stale_ex: int = 0, tags: Iterable[str] = (), negative_tags: Iterable[str] = (), refresh: bool = False
+    ) -> CachedResponse | None:
+        started = time.monotonic()
+        result = await loader()
+        if result:
+            with phase('serialize'):
+                body = serializer(result)
+                etag = make_etag(body)
+            with phase('compress'):
+                # Сжатые варианты тела готовятся один раз при записи, попадания в кеш отдают их без сжатия.
+                variants = encode_all(body)
+            # Стоимость вычисления и момент устаревания нужны XFetch при последующих чтениях.
+            response = CachedResponse(
+                body=body, delta=time.monotonic() - started, expiry=self.clock() + ex, etag=etag,
+                variants=variants,
+                tags=frozenset(entity_tags(result)).union(tags)
+            )
+            await self.cache.set_response(name=name, response=response, ex=ex + stale_ex)
+            return response
+        if refresh:
+            # Фоновое обновление не заменяет устаревший ответ отметкой об отсутствии: пустой результат бывает
+            # временным (например, во время переиндексации), а устаревший ответ и так истечет через stale_ex.
+            return None
+        if cache_settings.negative_enabled:
+            await self.cache.set_response(
+                name=name, response=NOT_FOUND, ex=cache_settings.negative_ttl, tags=[*tags, *negative_tags]
+            )
+        return None
+
+    async def _single_flight(self, name: str, loader: Callable[[], Awaitable]) -> object:
+        # Shield не дает отмене одного из ожидающих запросов прервать общую загрузку.
+        return await asyncio.shield(self._start(name, loader))
+
+    def _start(self, name: str, loader: Callable[[], Awaitable]) -> asyncio.Future:
+        # Если загрузка этого ключа уже выполняется, присоединяемся к ней вместо повторного запроса в базу.
+        task = self._in_flight.get(name)
+        if task is None:
+            task = asyncio.ensure_future(loader())
+            self._in_flight[name] = task
+            task.add_done_callback(lambda done: self._finish(name, done))
+        return task
+
+    def _finish(self, name: str, task: asyncio.Future) -> None:
+        self._in_flight.pop(name, None)
+        # Ошибку фоновой загрузки, которую никто не ждет, нужно хотя бы записать в лог.
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning('Cache load of %s failed: %r', name, task.exception())
+
+    @staticmethod
+    def _key(prefix: str, **kwargs) -> str:
+        # Канонический ключ списка: параметры запроса в отсортированном по имени JSON.
+        return prefix + orjson.dumps(kwargs, option=orjson.OPT_SORT_KEYS).decode('utf-8')
@@ -1,67 +1,190 @@
 from functools import lru_cache
+from typing import AsyncIterator, Callable, Sequence
 
-import orjson
 from fastapi import Depends
 from pydantic import UUID4
 
-from db.cache import Cache, get_cache
-from db.database import DataBase, get_db
-from models.film import Film
+from core.config import cache_settings, pagination_settings
+from db.cache import Cache, CachedResponse, get_cache
+from db.database import AnyOf, DataBase, Filter, get_db, Range, Total
+from db.tags import entity_tag, index_tag
+from models.film import Film, FilmShort
+from services.base import BaseService
 
 FILM_CACHE_EXPIRE_IN_SECONDS = 60 * 5  # 5 минут
-
-
-class FilmService:
+# Поля документа, которые запрашиваются из базы для списков фильмов.
+FILM_SHORT_FIELDS = list(FilmShort.model_fields)
+# Поля документа, доступные для выгрузки каталога.
+FILM_EXPORT_FIELDS = list(Film.model_fields)
+
+
+# Film_filters собирает условия отбора фильмов: жанры по названию или идентификатору (любой из перечисленных)
+# и границы рейтинга. Значения упорядочиваются, чтобы одинаковые наборы давали один ключ кеша
+def film_filters(
+        *, genre: str | list[str] | None = None, genre_id: list[UUID4] | None = None,
+        rating_gte: float | None = None, rating_lte: float | None = None
+) -> dict:
+    genres = [genre] if isinstance(genre, str) else genre
+    return {
+        'genre': sorted(set(genres)) if genres else None,
+        'genre_id': sorted({str(id_) for id_ in genre_id}) if genre_id else None,
+        'rating_gte': rating_gte,
+        'rating_lte': rating_lte,
+    }
+
+
+def _db_filters(*, genre: list[str] | None, genre_id: list[str] | None,
+                rating_gte: float | None, rating_lte: float | None) -> list[Filter]:
+    filters = []
+    if genre:
+        filters.append(AnyOf('genre.name', tuple(genre), text=True))
+    if genre_id:
+        filters.append(AnyOf('genre.uuid', tuple(genre_id)))
+    if rating_gte is not None or rating_lte is not None:
+        filters.append(Range('imdb_rating', gte=rating_gte, lte=rating_lte))
+    return filters
+
+
+class FilmService(BaseService):
     """
     FilmService содержит бизнес-логику по работе с фильмами.
     """
-    def __init__(self, cache: Cache, db: DataBase):
-        self.cache = cache
-        self.db = db
 
     # Get_by_id возвращает объект фильма. Он опционален, так как фильм может отсутствовать в базе
     async def get_by_id(self, film_id: UUID4) -> Film | None:
-        # Пытаемся получить данные из кеша, потому что оно работает быстрее
-        film = await self._film_from_cache(film_id)
-        if not film:
-            # Если фильма нет в кеше, то ищем его в Elasticsearch
-            film = await self._get_film_from_db(film_id)
-            if not film:
-                # Если он отсутствует в Elasticsearch, значит, фильма вообще нет в базе
-                return None
-            # Сохраняем фильм в кеш
-            await self._put_film_to_cache(film)
-
-        return film
-
-    async def get_films(
-            self, *, sort: str | None, genre: str | None = None,
-            page: int | None = 1, per_page: int | None = 1, query: str | None = None
-    ) -> list[Film]:
-        # Пытаемся получить данные из кеша, потому что оно работает быстрее.
-        films = await self._films_list_from_cache(sort=sort, genre=genre, page=page, per_page=per_page, query=query)
-        if not films:
-            # Если фильмов нет в кеше, то ищем их в Elasticsearch
-            films = await self._get_films_list_from_db(
-                sort=sort, genre=genre, page=page, per_page=per_page, film=query
-            )
-            if not films:
-                # Если он отсутствует в Elasticsearch, значит, фильма вообще нет в базе
-                return []
-            # Сохраняем фильм в кеш
-            await self._put_films_list_to_cache(sort=sort, genre=genre, page=page, per_page=per_page,
-                                                query=query, films=films)
-
-        return films
+        return await self._get_item(
+            name="movie:" + str(film_id),
+            return_class=Film,
+            loader=lambda: self._get_film_from_db(film_id),
+            ex=FILM_CACHE_EXPIRE_IN_SECONDS,
+            negative_tags=[entity_tag('film', film_id)]
+        )
+
+    # Get_many возвращает найденные фильмы по списку идентификаторов, отсутствующие в базе пропускаются
+    async def get_many(self, film_ids: list[UUID4]) -> list[Film]:
+        return await self._get_items_by_ids(
+            prefix="movie:",
+            ids=film_ids,
+            return_class=Film,
+            loader=self._get_films_from_db,
+            ex=FILM_CACHE_EXPIRE_IN_SECONDS
+        )
+
+    # Get_films_page возвращает страницу фильмов в режиме курсорной пагинации и курсор следующей страницы
+    async def get_films_page(
+            self, *, cursor: str | None, sort: str | None, genre: str | list[str] | None = None,
+            genre_id: list[UUID4] | None = None, rating_gte: float | None = None, rating_lte: float | None = None,
+            per_page: int | None = 1, query: str | None = None
+    ) -> tuple[list[FilmShort], str | None]:
+        filters = film_filters(genre=genre, genre_id=genre_id, rating_gte=rating_gte, rating_lte=rating_lte)
+        # Страницы курсора привязаны к снимку индекса, поэтому не кешируются.
+        return await self.db.search_after(
+            source='movies',
+            search_field='title',
+            search_string=query,
+            filters=_db_filters(**filters),
+            sort=sort,
+            per_page=max(per_page, 1),
+            return_class=FilmShort,
+            fields=FILM_SHORT_FIELDS,
+            cursor=cursor or None
+        )
+
+    # Count_films возвращает число фильмов, подходящих под строку поиска и фильтры. Число кешируется
+    # для каждого набора условий отдельно и не зависит от сортировки и страницы
+    async def count_films(
+            self, *, genre: str | list[str] | None = None, genre_id: list[UUID4] | None = None,
+            rating_gte: float | None = None, rating_lte: float | None = None, query: str | None = None
+    ) -> Total:
+        filters = film_filters(genre=genre, genre_id=genre_id, rating_gte=rating_gte, rating_lte=rating_lte)
+        return await self._get_item(
+            name=self._key("count:movies:", query=query, **filters),
+            return_class=Total,
+            loader=lambda: self.db.count(
+                source='movies',
+                search_field='title',
+                search_string=query,
+                filters=_db_filters(**filters),
+                limit=pagination_settings.total_hits_cap
+            ),
+            ex=pagination_settings.count_ttl,
+            # В числе нет сущностей, поэтому его сбрасывает тег индекса (см. services.invalidation).
+            tags=[index_tag('movies')]
+        )
+
+    # Export выгружает все фильмы в формате NDJSON по возрастанию идентификатора, начиная после after
+    def export(self, *, fields: list[str] | None = None, after: UUID4 | None = None) -> AsyncIterator[bytes]:
+        return self._export(
+            source='movies', fields=fields or FILM_EXPORT_FIELDS, after=str(after) if after else None
+        )
+
+    # Get_top_film_ids возвращает идентификаторы limit фильмов с наибольшим рейтингом. Читает базу напрямую,
+    # минуя кеш: прогреву нужны только идентификаторы, а не записи кеша списков, которые API не читает
+    async def get_top_film_ids(self, limit: int) -> list[UUID4]:
+        if limit <= 0:
+            return []
+        films = await self.db.search(
+            source='movies',
+            sort='-imdb_rating',
+            page=1,
+            per_page=limit,
+            return_class=FilmShort,
+            fields=FILM_SHORT_FIELDS
+        )
+        return [film.uuid for film in films or []]
+
+    # Get_by_id_response возвращает готовое тело ответа с данными фильма
+    async def get_by_id_response(
+            self, film_id: UUID4, *, serializer: Callable[[Film], bytes], etags: Sequence[str] = (),
+            encoding: str | None = None
+    ) -> CachedResponse | None:
+        return await self._get_response(
+            name="response:movie:" + str(film_id),
+            loader=lambda: self._get_film_from_db(film_id),
+            serializer=serializer,
+            ex=FILM_CACHE_EXPIRE_IN_SECONDS,
+            stale_ex=cache_settings.film_stale_ttl,
+            negative_tags=[entity_tag('film', film_id)],
+            etags=etags,
+            encoding=encoding
+        )
+
+    # Get_films_response возвращает готовое тело ответа со списком фильмов
+    async def get_films_response(
+            self, *, serializer: Callable[[list[FilmShort]], bytes], sort: str | None,
+            genre: str | list[str] | None = None, genre_id: list[UUID4] | None = None,
+            rating_gte: float | None = None, rating_lte: float | None = None,
+            page: int | None = 1, per_page: int | None = 1, query: str | None = None, etags: Sequence[str] = (),
+            encoding: str | None = None
+    ) -> CachedResponse | None:
+        filters = film_filters(genre=genre, genre_id=genre_id, rating_gte=rating_gte, rating_lte=rating_lte)
+        return await self._get_response(
+            name=self._key("response:movies:", sort=sort, page=page, per_page=per_page, query=query, **filters),
+            loader=lambda: self._get_films_list_from_db(
+                sort=sort, page=page, per_page=per_page, film=query, **filters
+            ),
+            serializer=serializer,
+            ex=FILM_CACHE_EXPIRE_IN_SECONDS,
+            stale_ex=cache_settings.film_stale_ttl,
+            # Пустой результат поиска сбрасывается изменением любого фильма.
+            negative_tags=[index_tag('movies')],
+            etags=etags,
+            encoding=encoding
+        )
 
     async def _get_film_from_db(self, film_id: UUID4) -> Film | None:
         doc = await self.db.get(source='movies', id_=film_id, return_class=Film)
         return doc
 
+    async def _get_films_from_db(self, film_ids: list[UUID4]) -> list[Film]:
+        docs = await self.db.mget(source='movies', ids=film_ids, return_class=Film)
+        return docs
+
     async def _get_films_list_from_db(
-            self, *, sort: str | None, genre: str | None,
+            self, *, sort: str | None, genre: list[str] | None = None, genre_id: list[str] | None = None,
+            rating_gte: float | None = None, rating_lte: float | None = None,
             page: int | None = 1, per_page: int | None = 1, film: str | None = None
-    ) -> list[Film] | None:
+    ) -> list[FilmShort] | None:
         # Проверка аргументов.
         if page <= 0:
             page = 1
@@ -71,40 +194,16 @@ class FilmService:
             source='movies',
             search_field='title',
             search_string=film,
-            filter_field='genre.name',
-            filter_string=genre,
+            filters=_db_filters(genre=genre, genre_id=genre_id, rating_gte=rating_gte, rating_lte=rating_lte),
             sort=sort,
             page=page,
             per_page=per_page,
-            return_class=Film
+            return_class=FilmShort,
+            # Для списков читаем из базы только поля краткого представления.
+            fields=FILM_SHORT_FIELDS
         )
         return doc
 
-    async def _film_from_cache(self, film_id: UUID4) -> Film | None:
-        film = await self.cache.get(name="movie:" + str(film_id), return_class=Film)
-        return film
-
-    async def _films_list_from_cache(self, **kwargs) -> list[Film] | None:
-        films_list = await self.cache.get_list(
-            name="movies:" + orjson.dumps(kwargs, option=orjson.OPT_SORT_KEYS).decode('utf-8'),
-            return_class=Film)
-        return films_list
-
-    async def _put_film_to_cache(self, film: Film):
-        # Сохраняем данные о фильме в кэше, указывая время жизни.
-        await self.cache.set(
-            name="movie:" + str(film.uuid),
-            value=film.model_dump_json(),
-            ex=FILM_CACHE_EXPIRE_IN_SECONDS
-        )
-
-    async def _put_films_list_to_cache(self, films: list[Film], **kwargs):
-        await self.cache.set(
-            name="movies:" + orjson.dumps(kwargs, option=orjson.OPT_SORT_KEYS).decode('utf-8'),
-            value=orjson.dumps([ob.model_dump_json() for ob in films]),
-            ex=FILM_CACHE_EXPIRE_IN_SECONDS
-        )
-
 
 # Get_film_service — это провайдер FilmService.
 # Используем lru_cache-декоратор, чтобы создать объект сервиса в едином экземпляре (синглтон)
@@ -1,57 +1,181 @@
+import asyncio
+import logging
 from functools import lru_cache
+from typing import Callable, Sequence
 
-import orjson
 from fastapi import Depends
 from pydantic import UUID4
 
-from db.cache import Cache, get_cache
+from core.config import cache_settings
+from db.cache import Cache, CachedResponse, get_cache
 from db.database import DataBase, get_db
+from db.tags import entity_tag, index_tag
 from models.genre import Genre
+from core.content_encoding import encode_all
+from services.base import BaseService, make_etag
 
 GENRE_CACHE_EXPIRE_IN_SECONDS = 60 * 5  # 5 минут
+# Размер страницы при загрузке справочника жанров из базы.
+CATALOG_LOAD_PAGE_SIZE = 1000
+# Наибольший размер страницы API: для всех размеров до него страницы справочника готовятся заранее.
+CATALOG_MAX_PAGE_SIZE = 100
 
+logger = logging.getLogger(__name__)
 
-class GenreService:
+
+# Load_genres загружает из базы все жанры постранично, минуя кеш
+async def load_genres(db: DataBase) -> list[Genre]:
+    genres = []
+    page = 1
+    while True:
+        chunk = await db.search(source='genres', page=page, per_page=CATALOG_LOAD_PAGE_SIZE, return_class=Genre) or []
+        genres += chunk
+        if len(chunk) < CATALOG_LOAD_PAGE_SIZE:
+            return genres
+        page += 1
+
+
+class GenreCatalog:
     """
-    GenreService содержит бизнес-логику по работе с жанрами.
+    Полный справочник жанров в памяти процесса. Загружается целиком при старте и периодически
+    обновляется в фоне; страницы списка раскладываются заранее, тела ответов строятся один раз на версию.
     """
 
-    def __init__(self, cache: Cache, db: DataBase):
-        self.cache = cache
+    def __init__(self, db: DataBase, refresh_interval: float):
         self.db = db
+        self.refresh_interval = refresh_interval
+        self.by_id: dict[str, Genre] = {}
+        # Размер страницы -> страницы жанров по порядку.
+        self.pages: dict[int, list[list[Genre]]] = {}
+        self._responses: dict[tuple, CachedResponse] = {}
+        self._task: asyncio.Task | None = None
+
+    async def load(self) -> None:
+        genres = await load_genres(self.db)
+        pages = {
+            per_page: [genres[start:start + per_page] for start in range(0, len(genres), per_page)]
+            for per_page in range(1, CATALOG_MAX_PAGE_SIZE + 1)
+        }
+        # Подменяем все структуры разом, чтобы запросы не увидели смесь старой и новой версии.
+        self.by_id, self.pages, self._responses = {str(genre.uuid): genre for genre in genres}, pages, {}
+        logger.info('Genre catalog loaded: %d genres', len(genres))
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._refresh())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get(self, genre_id: UUID4) -> Genre | None:
+        return self.by_id.get(str(genre_id))
+
+    def page(self, page: int, per_page: int) -> list[Genre]:
+        page, per_page = max(page, 1), max(per_page, 1)
+        pages = self.pages.get(per_page)
+        if pages is None:
+            genres = [genre for chunk in self.pages.get(1, []) for genre in chunk]
+            return genres[(page - 1) * per_page:page * per_page]
+        return pages[page - 1] if page <= len(pages) else []
+
+    def response(self, key: tuple, result: object, serializer: Callable[[object], bytes]) -> CachedResponse | None:
+        # Тело ответа сериализуется при первом запросе и хранится до следующего обновления справочника.
+        if not result:
+            return None
+        responses = self._responses
+        response = responses.get(key)
+        if response is None:
+            body = serializer(result)
+            response = responses[key] = CachedResponse(body=body, etag=make_etag(body), variants=encode_all(body))
+        return response
+
+    async def _refresh(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.load()
+            except Exception as exc:
+                # При ошибке продолжаем отдавать прежнюю версию справочника.
+                logger.warning('Genre catalog refresh failed: %r', exc)
+
+
+# Справочник жанров; None, если режим справочника выключен.
+catalog: GenreCatalog | None = None
+
+
+async def get_genre_catalog() -> GenreCatalog | None:
+    return catalog
+
+
+class GenreService(BaseService):
+    """
+    GenreService содержит бизнес-логику по работе с жанрами.
+    Если передан справочник жанров, все запросы обслуживаются из него, без кеша и базы.
+    """
+
+    def __init__(self, cache: Cache, db: DataBase, catalog: GenreCatalog | None = None):
+        super().__init__(cache, db)
+        self.catalog = catalog
 
     # Get_by_id возвращает объект жанра. Он опционален, так как жанр может отсутствовать в базе
     async def get_by_id(self, genre_id: UUID4) -> Genre | None:
-        # Пытаемся получить данные из кеша, потому что оно работает быстрее
-        genre = await self._genre_from_cache(genre_id)
-        if not genre:
-            # Если жанра нет в кеше, то ищем его в Elasticsearch
-            genre = await self._get_genre_from_db(genre_id)
-            if not genre:
-                # Если он отсутствует в Elasticsearch, значит, жанра вообще нет в базе
-                return None
-            # Сохраняем жанр в кеш
-            await self._put_genre_to_cache(genre)
-
-        return genre
-
-    async def get_genres(
-            self, *, page: int | None = 1, per_page: int | None = 1
-    ) -> list[Genre]:
-        # Пытаемся получить данные из кеша, потому что оно работает быстрее.
-        genres = await self._genres_list_from_cache(page=page, per_page=per_page)
-        if not genres:
-            # Если жанров нет в кеше, то ищем их в Elasticsearch
-            genres = await self._get_genres_list_from_db(page=page, per_page=per_page
-                                                         )
-            if not genres:
-                # Если он отсутствует в Elasticsearch, значит, жанра вообще нет в базе
-                return []
-            # Сохраняем жанр в кеш
-            await self._put_genres_list_to_cache(page=page, per_page=per_page,
-                                                 genres=genres)
-
-        return genres
+        if self.catalog:
+            return self.catalog.get(genre_id)
+        return await self._get_item(
+            name="genre:" + str(genre_id),
+            return_class=Genre,
+            loader=lambda: self._get_genre_from_db(genre_id),
+            ex=GENRE_CACHE_EXPIRE_IN_SECONDS,
+            negative_tags=[entity_tag('genre', genre_id)]
+        )
+
+    # Get_all_genres возвращает все жанры без записи в кеш: из справочника, если он есть, иначе из базы
+    async def get_all_genres(self) -> list[Genre]:
+        if self.catalog:
+            return list(self.catalog.by_id.values())
+        return await load_genres(self.db)
+
+    # Get_by_id_response возвращает готовое тело ответа с данными жанра
+    async def get_by_id_response(
+            self, genre_id: UUID4, *, serializer: Callable[[Genre], bytes], etags: Sequence[str] = (),
+            encoding: str | None = None
+    ) -> CachedResponse | None:
+        if self.catalog:
+            return self.catalog.response(('genre', str(genre_id)), self.catalog.get(genre_id), serializer)
+        return await self._get_response(
+            name="response:genre:" + str(genre_id),
+            loader=lambda: self._get_genre_from_db(genre_id),
+            serializer=serializer,
+            ex=GENRE_CACHE_EXPIRE_IN_SECONDS,
+            stale_ex=cache_settings.genre_stale_ttl,
+            negative_tags=[entity_tag('genre', genre_id)],
+            etags=etags,
+            encoding=encoding
+        )
+
+    # Get_genres_response возвращает готовое тело ответа со списком жанров
+    async def get_genres_response(
+            self, *, serializer: Callable[[list[Genre]], bytes], page: int | None = 1, per_page: int | None = 1,
+            etags: Sequence[str] = (),
+            encoding: str | None = None
+    ) -> CachedResponse | None:
+        if self.catalog:
+            return self.catalog.response(('genres', page, per_page), self.catalog.page(page, per_page), serializer)
+        return await self._get_response(
+            name=self._key("response:genres:", page=page, per_page=per_page),
+            loader=lambda: self._get_genres_list_from_db(page=page, per_page=per_page),
+            serializer=serializer,
+            ex=GENRE_CACHE_EXPIRE_IN_SECONDS,
+            stale_ex=cache_settings.genre_stale_ttl,
+            negative_tags=[index_tag('genres')],
+            etags=etags,
+            encoding=encoding
+        )
 
     async def _get_genre_from_db(self, genre_id: UUID4) -> Genre | None:
         doc = await self.db.get(source='genres', id_=genre_id, return_class=Genre)
@@ -73,31 +197,6 @@ class GenreService:
         )
         return doc
 
-    async def _genre_from_cache(self, genre_id: UUID4) -> Genre | None:
-        genre = await self.cache.get(name="genre:" + str(genre_id), return_class=Genre)
-        return genre
-
-    async def _genres_list_from_cache(self, **kwargs) -> list[Genre] | None:
-        genres_list = await self.cache.get_list(
-            name="genres:" + orjson.dumps(kwargs, option=orjson.OPT_SORT_KEYS).decode('utf-8'),
-            return_class=Genre)
-        return genres_list
-
-    async def _put_genre_to_cache(self, genre: Genre):
-        # Сохраняем данные о жанре в кэше, указывая время жизни.
-        await self.cache.set(
-            name="genre:" + str(genre.uuid),
-            value=genre.model_dump_json(),
-            ex=GENRE_CACHE_EXPIRE_IN_SECONDS
-        )
-
-    async def _put_genres_list_to_cache(self, genres: list[Genre], **kwargs):
-        await self.cache.set(
-            name="genres:" + orjson.dumps(kwargs, option=orjson.OPT_SORT_KEYS).decode('utf-8'),
-            value=orjson.dumps([ob.model_dump_json() for ob in genres]),
-            ex=GENRE_CACHE_EXPIRE_IN_SECONDS
-        )
-
 
 # Get_genre_service — это провайдер GenreService.
 # Используем lru_cache-декоратор, чтобы создать объект сервиса в едином экземпляре (синглтон)
@@ -105,5 +204,6 @@ class GenreService:
 def get_genre_service(
         cache: Cache = Depends(get_cache),
         db: DataBase = Depends(get_db),
+        catalog: GenreCatalog | None = Depends(get_genre_catalog),
 ) -> GenreService:
-    return GenreService(cache, db)
+    return GenreService(cache, db, catalog)
@@ -0,0 +1,22 @@
+import logging
+from typing import Iterable
+
+from db.cache import get_cache
+from db.tags import index_tags
+from services import genre
+
+logger = logging.getLogger(__name__)
+
+
+# Invalidate удаляет из кеша все записи, содержащие хотя бы одну из сущностей, и возвращает их число.
+# Теги имеют вид "<film|genre|person>:<uuid>" (см. db.tags.entity_tag). Вместе с ними сбрасываются
+# записи, помеченные тегами затронутых индексов (число найденных фильмов и персон).
+async def invalidate(tags: Iterable[str]) -> int:
+    tags = list(dict.fromkeys(tags))
+    cache = await get_cache()
+    deleted = await cache.invalidate([*tags, *sorted(index_tags(tags))])
+    if genre.catalog is not None and any(tag.startswith('genre:') for tag in tags):
+        # Справочник жанров не хранится в Redis, поэтому перечитываем его сразу, не дожидаясь фонового обновления.
+        await genre.catalog.load()
+    logger.info('Cache invalidated by %d tags: %d entries deleted', len(tags), deleted)
+    return deleted
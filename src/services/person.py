@@ -1,59 +1,129 @@
 from functools import lru_cache
+from typing import AsyncIterator, Awaitable, Callable, Sequence
 
-import orjson
 from fastapi import Depends
 from pydantic import UUID4
 
-from db.cache import Cache, get_cache
-from db.database import DataBase, get_db
+from core.config import cache_settings, pagination_settings
+from db.cache import Cache, CachedResponse, get_cache
+from db.database import DataBase, get_db, Total
+from db.tags import entity_tag, index_tag
 from models.person import Person
+from services.base import BaseService
 
 PERSON_CACHE_EXPIRE_IN_SECONDS = 60 * 5  # 5 минут
+# Поля документа, доступные для выгрузки каталога.
+PERSON_EXPORT_FIELDS = list(Person.model_fields)
 
 
-class PersonService:
+class PersonService(BaseService):
     """
     PersonService содержит бизнес-логику по работе с персонами.
     """
 
-    def __init__(self, cache: Cache, db: DataBase):
-        self.cache = cache
-        self.db = db
-
     # Get_by_id возвращает объект персоны. Он опционален, так как персона может отсутствовать в базе
     async def get_by_id(self, person_id: UUID4) -> Person | None:
-        # Пытаемся получить данные из кеша, потому что оно работает быстрее
-        person = await self._person_from_cache(person_id)
-        if not person:
-            # Если персоны нет в кеше, то ищем его в Elasticsearch
-            person = await self._get_person_from_db(person_id)
+        return await self._get_item(
+            name="person:" + str(person_id),
+            return_class=Person,
+            loader=lambda: self._get_person_from_db(person_id),
+            ex=PERSON_CACHE_EXPIRE_IN_SECONDS,
+            negative_tags=[entity_tag('person', person_id)]
+        )
+
+    # Get_persons_page возвращает страницу персон в режиме курсорной пагинации и курсор следующей страницы
+    async def get_persons_page(
+            self, *, cursor: str | None, per_page: int | None = 1, query: str | None = None
+    ) -> tuple[list[Person], str | None]:
+        # Страницы курсора привязаны к снимку индекса, поэтому не кешируются.
+        return await self.db.search_after(
+            source='persons',
+            search_field='full_name',
+            search_string=query,
+            per_page=max(per_page, 1),
+            return_class=Person,
+            cursor=cursor or None
+        )
+
+    # Count_persons возвращает число персон, найденных по строке поиска (кешируется для каждой строки)
+    async def count_persons(self, *, query: str | None = None) -> Total:
+        return await self._get_item(
+            name=self._key("count:persons:", query=query),
+            return_class=Total,
+            loader=lambda: self.db.count(
+                source='persons',
+                search_field='full_name',
+                search_string=query,
+                limit=pagination_settings.total_hits_cap
+            ),
+            ex=pagination_settings.count_ttl,
+            tags=[index_tag('persons')]
+        )
+
+    # Export выгружает всех персон в формате NDJSON по возрастанию идентификатора, начиная после after
+    def export(self, *, fields: list[str] | None = None, after: UUID4 | None = None) -> AsyncIterator[bytes]:
+        return self._export(
+            source='persons', fields=fields or PERSON_EXPORT_FIELDS, after=str(after) if after else None
+        )
+
+    # Get_by_id_response возвращает готовое тело ответа с данными персоны
+    async def get_by_id_response(
+            self, person_id: UUID4, *, serializer: Callable[[Person], bytes], etags: Sequence[str] = (),
+            encoding: str | None = None
+    ) -> CachedResponse | None:
+        return await self._get_response(
+            name="response:person:" + str(person_id),
+            loader=lambda: self._get_person_from_db(person_id),
+            serializer=serializer,
+            ex=PERSON_CACHE_EXPIRE_IN_SECONDS,
+            stale_ex=cache_settings.person_stale_ttl,
+            negative_tags=[entity_tag('person', person_id)],
+            etags=etags,
+            encoding=encoding
+        )
+
+    # Get_films_response возвращает готовое тело ответа со списком фильмов персоны.
+    # Фильмы загружаются переданным films_loader-ом по списку идентификаторов.
+    async def get_films_response(
+            self, person_id: UUID4, *, films_loader: Callable[[list[UUID4]], Awaitable[list]],
+            serializer: Callable[[list], bytes], etags: Sequence[str] = (),
+            encoding: str | None = None
+    ) -> CachedResponse | None:
+        async def loader() -> list | None:
+            person = await self.get_by_id(person_id)
             if not person:
-                # Если он отсутствует в Elasticsearch, значит, персона вообще нет в базе
                 return None
-            # Сохраняем персону в кеш
-            await self._put_person_to_cache(person)
-
-        return person
-
-    async def get_persons(
-            self, *, page: int | None = 1,
-            per_page: int | None = 1, query: str | None = None
-    ) -> list[Person]:
-        # Пытаемся получить данные из кеша, потому что оно работает быстрее.
-        persons = await self._persons_list_from_cache(page=page, per_page=per_page, query=query)
-        if not persons:
-            # Если персон нет в кеше, то ищем их в Elasticsearch
-            persons = await self._get_persons_list_from_db(
-                page=page, per_page=per_page, person=query
-            )
-            if not persons:
-                # Если он отсутствует в Elasticsearch, значит, персон вообще нет в базе
-                return []
-            # Сохраняем персоны в кеш
-            await self._put_persons_list_to_cache(page=page, per_page=per_page,
-                                                  query=query, persons=persons)
-
-        return persons
+            return await films_loader(list(set(n.uuid for n in person.films)))
+
+        return await self._get_response(
+            name="response:person_films:" + str(person_id),
+            loader=loader,
+            serializer=serializer,
+            ex=PERSON_CACHE_EXPIRE_IN_SECONDS,
+            stale_ex=cache_settings.person_stale_ttl,
+            # Состав фильмов зависит от самой персоны, которой нет в теле ответа.
+            tags=[entity_tag('person', person_id)],
+            negative_tags=[index_tag('movies')],
+            etags=etags,
+            encoding=encoding
+        )
+
+    # Get_persons_response возвращает готовое тело ответа со списком найденных персон
+    async def get_persons_response(
+            self, *, serializer: Callable[[list[Person]], bytes], page: int | None = 1,
+            per_page: int | None = 1, query: str | None = None, etags: Sequence[str] = (),
+            encoding: str | None = None
+    ) -> CachedResponse | None:
+        return await self._get_response(
+            name=self._key("response:persons:", page=page, per_page=per_page, query=query),
+            loader=lambda: self._get_persons_list_from_db(page=page, per_page=per_page, person=query),
+            serializer=serializer,
+            ex=PERSON_CACHE_EXPIRE_IN_SECONDS,
+            stale_ex=cache_settings.person_stale_ttl,
+            negative_tags=[index_tag('persons')],
+            etags=etags,
+            encoding=encoding
+        )
 
     async def _get_person_from_db(self, person_id: UUID4) -> Person | None:
         doc = await self.db.get(source='persons', id_=person_id, return_class=Person)
@@ -77,31 +147,6 @@ class PersonService:
         )
         return doc
 
-    async def _person_from_cache(self, person_id: UUID4) -> Person | None:
-        person = await self.cache.get(name="person:" + str(person_id), return_class=Person)
-        return person
-
-    async def _persons_list_from_cache(self, **kwargs) -> list[Person] | None:
-        persons_list = await self.cache.get_list(
-            name="persons:" + orjson.dumps(kwargs, option=orjson.OPT_SORT_KEYS).decode('utf-8'),
-            return_class=Person)
-        return persons_list
-
-    async def _put_person_to_cache(self, person: Person):
-        # Сохраняем данные о персоне в кэше, указывая время жизни.
-        await self.cache.set(
-            name="person:" + str(person.uuid),
-            value=person.model_dump_json(),
-            ex=PERSON_CACHE_EXPIRE_IN_SECONDS
-        )
-
-    async def _put_persons_list_to_cache(self, persons: list[Person], **kwargs):
-        await self.cache.set(
-            name="persons:" + orjson.dumps(kwargs, option=orjson.OPT_SORT_KEYS).decode('utf-8'),
-            value=orjson.dumps([ob.model_dump_json() for ob in persons]),
-            ex=PERSON_CACHE_EXPIRE_IN_SECONDS
-        )
-
 
 # Get_person_service — это провайдер PersonService.
 # Используем lru_cache-декоратор, чтобы создать объект сервиса в едином экземпляре (синглтон)
@@ -0,0 +1,113 @@
+"""
+Прогрев кеша: заранее загружает в Redis ответы, которые первыми понадобятся после выкладки или очистки кеша -
+первые страницы /films для каждой сортировки и жанра, полный список жанров и карточки фильмов с наибольшим рейтингом.
+
+Запускается при старте приложения (WARMUP_ON_STARTUP=true) или отдельной командой:
+    python warmup.py [--pages 3] [--top-films 100] [--concurrency 8]
+"""
+import argparse
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable
+
+from api.v1.films import film_details_json, films_json
+from api.v1.genres import genres_json
+from core.config import warmup_settings
+from services.film import FilmService
+from services.genre import GenreService
+
+logger = logging.getLogger(__name__)
+
+# Сортировки списка фильмов, доступные в API.
+FILM_SORTS = (None, 'imdb_rating', '-imdb_rating')
+# Размер страницы по умолчанию в API.
+API_PAGE_SIZE = 50
+# Блокировка прогрева при старте: прогрев запускает только воркер, который взял ее первым.
+LOCK_KEY = 'lock:warmup'
+
+
+async def warm_up(
+        film_service: FilmService, genre_service: GenreService, *, pages: int = 3, page_size: int = API_PAGE_SIZE,
+        top_films: int = 100, concurrency: int = 8, progress_every: int = 50
+) -> dict[str, int]:
+    started = time.perf_counter()
+    semaphore = asyncio.Semaphore(concurrency)
+    stats = {'done': 0, 'failed': 0, 'total': 0}
+
+    async def run(job: Callable[[], Awaitable]) -> None:
+        async with semaphore:
+            try:
+                await job()
+            except Exception as exc:
+                stats['failed'] += 1
+                logger.warning('Warm-up request failed: %r', exc)
+        stats['done'] += 1
+        if stats['done'] % progress_every == 0 or stats['done'] == stats['total']:
+            logger.info('Warm-up: %d/%d (%d failed)', stats['done'], stats['total'], stats['failed'])
+
+    async def run_all(jobs: list[Callable[[], Awaitable]]) -> None:
+        stats['total'] += len(jobs)
+        await asyncio.gather(*(run(job) for job in jobs))
+
+    # Полный список жанров: страницы ответа /genres и названия жанров для фильтра /films.
+    genres = await genre_service.get_all_genres()
+    await run_all([
+        lambda page=page: genre_service.get_genres_response(serializer=genres_json, page=page, per_page=page_size)
+        for page in range(1, len(genres) // page_size + 2)
+    ])
+
+    # Параметры вызовов совпадают с обработчиками API, поэтому прогреваются те же ключи кеша.
+    await run_all([
+        lambda sort=sort, genre=genre, page=page: film_service.get_films_response(
+            serializer=films_json, sort=sort, genre=genre, page=page, per_page=page_size
+        )
+        for sort in FILM_SORTS
+        for genre in [None] + [genre.name for genre in genres]
+        for page in range(1, pages + 1)
+    ])
+
+    await run_all([
+        lambda film_id=film_id: film_service.get_by_id_response(film_id, serializer=film_details_json)
+        for film_id in await film_service.get_top_film_ids(top_films)
+    ])
+
+    logger.info('Warm-up finished in %.1f s: %d requests, %d failed',
+                time.perf_counter() - started, stats['total'], stats['failed'])
+    return stats
+
+
+# Warm_up_current прогревает кеш через текущие подключения приложения. Если задан lock_ttl, прогрев
+# выполняется, только если удалось взять блокировку, иначе возвращается None
+async def warm_up_current(*, lock_ttl: int | None = None, **kwargs) -> dict[str, int] | None:
+    from db.cache import get_cache
+    from db.database import get_db
+    from services.film import get_film_service
+    from services.genre import get_genre_catalog, get_genre_service
+
+    # Провайдеры вызываются с теми же именованными аргументами, что и из Depends, чтобы lru_cache вернул
+    # те же экземпляры сервисов, которые обслуживают запросы.
+    cache, db = await get_cache(), await get_db()
+    if lock_ttl and not await cache.acquire(LOCK_KEY, ex=lock_ttl):
+        logger.info('Warm-up skipped: already started by another worker')
+        return None
+    film_service = get_film_service(cache=cache, db=db)
+    genre_service = get_genre_service(cache=cache, db=db, catalog=await get_genre_catalog())
+    return await warm_up(film_service, genre_service, **kwargs)
+
+
+async def main(args: argparse.Namespace) -> None:
+    from main import app, lifespan
+
+    # Подключения создаются так же, как при старте приложения, но без повторного прогрева в фоне.
+    warmup_settings.on_startup = False
+    async with lifespan(app):
+        await warm_up_current(pages=args.pages, top_films=args.top_films, concurrency=args.concurrency)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=warmup_settings.pages)
+    parser.add_argument('--top-films', type=int, default=warmup_settings.top_films)
+    parser.add_argument('--concurrency', type=int, default=warmup_settings.concurrency)
+    asyncio.run(main(parser.parse_args()))
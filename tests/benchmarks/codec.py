@@ -0,0 +1,82 @@
+"""
+Сравнение кодеков кеша (JSON и msgpack): время сериализации и разбора и размер значения
+для Film, Person и Genre, а также для страницы списка фильмов (100 элементов).
+
+Запуск из корня репозитория (для msgpack нужен установленный пакет msgpack):
+    python tests/benchmarks/codec.py
+"""
+import sys
+import timeit
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'src'))
+
+from db.codec import json_codec, msgpack_codec  # noqa: E402
+from models.film import Film  # noqa: E402
+from models.genre import Genre  # noqa: E402
+from models.person import Person  # noqa: E402
+
+PAGE_SIZE = 100
+REPEAT = 5
+NUMBER = 500
+
+
+def make_samples() -> dict[str, tuple[object, object.__class__]]:
+    persons = [Person(
+        uuid=uuid.uuid4(),
+        full_name=f'Person {i}',
+        films=[{'uuid': uuid.uuid4(), 'roles': ['actor', 'writer']} for _ in range(10)]
+    ) for i in range(20)]
+    genres = [Genre(uuid=uuid.uuid4(), name=name) for name in ('Action', 'Adventure', 'Sci-Fi')]
+    # Film содержит собственные вложенные модели жанров и персон, поэтому передаем их словарями.
+    cast = [{'uuid': person.uuid, 'full_name': person.full_name} for person in persons]
+    page = [Film(
+        uuid=uuid.uuid4(),
+        title=f'Star Wars: Episode {i}',
+        imdb_rating=i % 10 + 0.5,
+        description='A long time ago in a galaxy far, far away. ' * 5,
+        genre=[genre.model_dump() for genre in genres],
+        actors=cast[:10],
+        writers=cast[10:13],
+        directors=cast[13:15],
+    ) for i in range(PAGE_SIZE)]
+    return {
+        'Film': (page[0], Film),
+        'Person': (persons[0], Person),
+        'Genre': (genres[0], Genre),
+        f'list[Film] x{PAGE_SIZE}': (page, Film),
+    }
+
+
+def best_of(statement, number: int) -> float:
+    # Лучшее время одной операции в микросекундах.
+    return min(timeit.repeat(statement, repeat=REPEAT, number=number)) / number * 1e6
+
+
+def measure(codec, value: object, return_class: object.__class__) -> tuple[int, float, float]:
+    loads = codec.loads_list if isinstance(value, list) else codec.loads
+    data = codec.dumps(value)
+    assert loads(data, return_class) == value
+    number = NUMBER // PAGE_SIZE if isinstance(value, list) else NUMBER
+    return (
+        len(data),
+        best_of(lambda: codec.dumps(value), number),
+        best_of(lambda: loads(data, return_class), number),
+    )
+
+
+def main():
+    codecs = [json_codec] + ([msgpack_codec] if msgpack_codec else [])
+    if msgpack_codec is None:
+        print('msgpack is not installed, only json is measured')
+
+    print(f'{"value":<18}{"codec":<10}{"bytes":>10}{"encode, us":>14}{"decode, us":>14}')
+    for name, (value, return_class) in make_samples().items():
+        for codec in codecs:
+            size, encode, decode = measure(codec, value, return_class)
+            print(f'{name:<18}{codec.name:<10}{size:>10}{encode:>14.1f}{decode:>14.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Сравнение стоимости разбора закешированной страницы списка фильмов (100 элементов)
+в старом формате (JSON-массив JSON-строк) и в новом (один плоский JSON-массив).
+
+Запуск из корня репозитория:
+    python tests/benchmarks/list_decode.py
+"""
+import sys
+import timeit
+import uuid
+from pathlib import Path
+
+import orjson
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'src'))
+
+from db.codec import list_adapter  # noqa: E402
+from models.film import Film  # noqa: E402
+
+PAGE_SIZE = 100
+REPEAT = 5
+NUMBER = 200
+
+
+def make_page(size: int = PAGE_SIZE) -> list[Film]:
+    persons = [{'uuid': str(uuid.uuid4()), 'full_name': f'Person {i}'} for i in range(20)]
+    genres = [{'uuid': str(uuid.uuid4()), 'name': name} for name in ('Action', 'Adventure', 'Sci-Fi')]
+    return [Film(
+        uuid=uuid.uuid4(),
+        title=f'Star Wars: Episode {i}',
+        imdb_rating=i % 10 + 0.5,
+        description='A long time ago in a galaxy far, far away. ' * 5,
+        genre=genres,
+        actors=persons[:10],
+        writers=persons[10:13],
+        directors=persons[13:15],
+    ) for i in range(size)]
+
+
+def best_of(statement) -> float:
+    # Лучшее время одного разбора в микросекундах.
+    return min(timeit.repeat(statement, repeat=REPEAT, number=NUMBER)) / NUMBER * 1e6
+
+
+def main():
+    page = make_page()
+    legacy = orjson.dumps([film.model_dump_json() for film in page])
+    flat = list_adapter(Film).dump_json(page)
+    adapter = list_adapter(Film)
+
+    assert [Film.model_validate_json(item) for item in orjson.loads(legacy)] == adapter.validate_json(flat) == page
+
+    results = {
+        'legacy (json of json strings)': (
+            len(legacy), best_of(lambda: [Film.model_validate_json(item) for item in orjson.loads(legacy)])
+        ),
+        'flat (TypeAdapter)': (len(flat), best_of(lambda: adapter.validate_json(flat))),
+    }
+
+    print(f'{PAGE_SIZE}-item page of Film')
+    print(f'{"format":<32}{"bytes":>10}{"decode, us":>14}')
+    for name, (size, elapsed) in results.items():
+        print(f'{name:<32}{size:>10}{elapsed:>14.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+"""
+Сравнение профилей сервера (GUNICORN_PROFILE): performance (uvloop + httptools) и compat (asyncio + h11).
+
+Для каждого профиля запускается gunicorn с src/gunicorn.conf.py и одинаковым числом воркеров.
+Документы обслуживает движок db.memory (DATABASE_ENGINE=memory) на сгенерированном наборе из stands.py,
+поэтому Elasticsearch не нужен; нужен Redis по адресу REDIS_HOST:REDIS_PORT.
+После прогрева ответов в кеше нагрузка подается по keep-alive соединениям: так измеряется то,
+чем профили отличаются - цикл событий и разбор HTTP, а не походы в базу.
+
+Запуск из корня репозитория:
+    python tests/benchmarks/server_profiles.py [--workers 1] [--connections 64] [--requests 20000]
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'src'))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from stands import make_dataset  # noqa: E402
+
+SRC = Path(__file__).resolve().parents[2] / 'src'
+HOST = '127.0.0.1'
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+async def get(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, path: str) -> int:
+    # Минимальный клиент HTTP/1.1: GET по уже открытому соединению, тело читается по Content-Length.
+    writer.write(f'GET {path} HTTP/1.1\r\nHost: {HOST}\r\n\r\n'.encode())
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while (line := await reader.readline()) not in (b'\r\n', b''):
+        name, _, value = line.partition(b':')
+        if name.strip().lower() == b'content-length':
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def wait_ready(port: int, process: subprocess.Popen, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'gunicorn exited with code {process.returncode}')
+        try:
+            reader, writer = await asyncio.open_connection(HOST, port)
+        except OSError:
+            await asyncio.sleep(0.2)
+            continue
+        try:
+            if await get(reader, writer, '/api/v1/genres/') == 200:
+                return
+        except (OSError, IndexError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+        await asyncio.sleep(0.2)
+    raise RuntimeError('gunicorn did not become ready')
+
+
+async def load(port: int, paths: list[str], requests: int, connections: int) -> dict:
+    latencies = []
+    errors = 0
+    position = 0
+
+    async def connection() -> None:
+        nonlocal errors, position
+        reader, writer = await asyncio.open_connection(HOST, port)
+        try:
+            while position < requests:
+                path = paths[position % len(paths)]
+                position += 1
+                started = time.perf_counter()
+                if await get(reader, writer, path) != 200:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+        finally:
+            writer.close()
+
+    # Первый проход заполняет кеш, чтобы дальше замерялась только обработка запросов сервером.
+    await asyncio.gather(*(load_once(port, chunk) for chunk in (paths[i::connections] for i in range(connections))))
+    started = time.perf_counter()
+    await asyncio.gather(*(connection() for _ in range(connections)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(latencies[len(latencies) // 2] * 1000, 2),
+        'p99_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 2),
+        'errors': errors,
+    }
+
+
+async def load_once(port: int, paths: list[str]) -> None:
+    if not paths:
+        return
+    reader, writer = await asyncio.open_connection(HOST, port)
+    try:
+        for path in paths:
+            await get(reader, writer, path)
+    finally:
+        writer.close()
+
+
+def run_profile(profile: str, args: argparse.Namespace, data_dir: str, paths: list[str]) -> dict:
+    port = free_port()
+    env = {
+        **os.environ,
+        'GUNICORN_PROFILE': profile,
+        'GUNICORN_HOST': HOST,
+        'GUNICORN_PORT': str(port),
+        'GUNICORN_WORKERS': str(args.workers),
+        'GUNICORN_LOGLEVEL': 'warning',
+        'DATABASE_ENGINE': 'memory',
+        'DATABASE_MEMORY_DATA_DIR': data_dir,
+        'PROMETHEUS_MULTIPROC_DIR': tempfile.mkdtemp(prefix='prometheus-'),
+        'SERVER_TIMING_SLOW_REQUEST_MS': '0',
+    }
+    # Журнал доступа пишется в stdout и в отчет не нужен; ошибки запуска остаются в stderr.
+    process = subprocess.Popen(
+        ['gunicorn', 'main:app', '-c', 'gunicorn.conf.py'], cwd=SRC, env=env, stdout=subprocess.DEVNULL
+    )
+    try:
+        asyncio.run(wait_ready(port, process))
+        return asyncio.run(load(port, paths, args.requests, args.connections))
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--profiles', nargs='+', default=['compat', 'performance'])
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--connections', type=int, default=64)
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--films', type=int, default=2000)
+    parser.add_argument('--persons', type=int, default=500)
+    args = parser.parse_args()
+
+    data = make_dataset(films=args.films, persons=args.persons)
+    # Смесь карточек фильмов, персон и списка жанров; все ответы отдаются из кеша.
+    paths = (
+        [f'/api/v1/films/{doc["uuid"]}' for doc in data['movies'][:300]]
+        + [f'/api/v1/persons/{doc["uuid"]}' for doc in data['persons'][:100]]
+        + ['/api/v1/genres/'] * 20
+    )
+    results = {}
+    with tempfile.TemporaryDirectory() as data_dir:
+        for index, docs in data.items():
+            Path(data_dir, f'{index}.json').write_text(json.dumps(docs))
+        for profile in args.profiles:
+            results[profile] = run_profile(profile, args, data_dir, paths)
+
+    baseline = next(iter(results.values()))
+    print(f'{args.requests} requests, {args.connections} connections, {args.workers} worker(s)')
+    print(f'{"profile":<14}{"RPS":>10}{"p50, ms":>10}{"p99, ms":>10}{"errors":>8}{"RPS vs first":>14}')
+    for profile, row in results.items():
+        print(f'{profile:<14}{row["rps"]:>10.1f}{row["p50_ms"]:>10.2f}{row["p99_ms"]:>10.2f}{row["errors"]:>8}'
+              f'{(row["rps"] - baseline["rps"]) / baseline["rps"] * 100:>+13.1f}%')
+    return 1 if any(row['errors'] for row in results.values()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
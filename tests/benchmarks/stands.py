@@ -0,0 +1,300 @@
+"""
+Заменители Redis и Elasticsearch в памяти процесса для бенчмарков.
+
+MemoryRedis повторяет ту часть API redis.asyncio.Redis, которой пользуется RedisDb, поэтому
+кодеки, сжатие, метаданные ответов и теги работают так же, как с настоящим Redis.
+LatencyDataBase - хранилище документов db.memory.MemoryDataBase.
+Оба заменителя могут добавлять к каждому обращению задержку, имитируя сетевой запрос.
+"""
+import asyncio
+import heapq
+import math
+import random
+import time
+import uuid
+
+from db.memory import MemoryDataBase
+from db.redisdb import RESPONSE_SCRIPT, TAG_SCRIPT
+
+WORDS = (
+    'star', 'war', 'empire', 'return', 'hope', 'night', 'city', 'love', 'dark', 'light', 'king', 'ring',
+    'space', 'time', 'ghost', 'river', 'storm', 'game', 'last', 'first', 'secret', 'island', 'dream', 'road',
+)
+GENRES = (
+    'Action', 'Adventure', 'Animation', 'Comedy', 'Crime', 'Documentary', 'Drama', 'Family', 'Fantasy',
+    'History', 'Horror', 'Music', 'Mystery', 'Romance', 'Sci-Fi', 'Thriller', 'War', 'Western',
+)
+
+
+def make_dataset(films: int = 2000, persons: int = 500, seed: int = 1) -> dict[str, list[dict]]:
+    # Документы в том же виде, в каком они лежат в индексах Elasticsearch.
+    rnd = random.Random(seed)
+    genres = [{'uuid': str(uuid.UUID(int=rnd.getrandbits(128))), 'name': name} for name in GENRES]
+    people = [{'uuid': str(uuid.UUID(int=rnd.getrandbits(128))), 'full_name': f'{rnd.choice(WORDS).title()} '
+               f'{rnd.choice(WORDS).title()}son {i}', 'films': []} for i in range(persons)]
+    movies = []
+    for i in range(films):
+        cast = rnd.sample(people, 8)
+        movie = {
+            'uuid': str(uuid.UUID(int=rnd.getrandbits(128))),
+            'title': ' '.join(rnd.choice(WORDS) for _ in range(3)).title() + f' {i}',
+            'imdb_rating': round(rnd.uniform(1, 10), 1),
+            'description': ' '.join(rnd.choice(WORDS) for _ in range(40)),
+            'genre': rnd.sample(genres, rnd.randint(1, 3)),
+            'actors': [{'uuid': p['uuid'], 'full_name': p['full_name']} for p in cast[:5]],
+            'writers': [{'uuid': p['uuid'], 'full_name': p['full_name']} for p in cast[5:7]],
+            'directors': [{'uuid': p['uuid'], 'full_name': p['full_name']} for p in cast[7:]],
+        }
+        for role, members in (('actor', cast[:5]), ('writer', cast[5:7]), ('director', cast[7:])):
+            for person in members:
+                person['films'].append({'uuid': movie['uuid'], 'roles': [role]})
+        movies.append(movie)
+    return {'movies': movies, 'persons': people, 'genres': genres}
+
+
+class MemoryPipeline:
+    # Накапливает команды и выполняет их за одно обращение, как конвейер redis-py.
+
+    def __init__(self, redis: 'MemoryRedis'):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        self.commands.clear()
+
+    def __getattr__(self, command: str):
+        def queue(*args, **kwargs):
+            self.commands.append((getattr(self.redis, '_' + command), args, kwargs))
+            return self
+        return queue
+
+    async def execute(self) -> list:
+        await self.redis.roundtrip()
+        return [method(*args, **kwargs) for method, args, kwargs in self.commands]
+
+
+class MemoryScript:
+    # Lua-скрипт RedisDb, выполняемый на Python: сразу или в составе конвейера, как AsyncScript из redis-py.
+
+    def __init__(self, redis: 'MemoryRedis', method):
+        self.redis = redis
+        self.method = method
+
+    async def __call__(self, keys: list | None = None, args: list | None = None, client=None):
+        if isinstance(client, MemoryPipeline):
+            client.commands.append((self.method, (keys or [], args or []), {}))
+            return client
+        await self.redis.roundtrip()
+        return self.method(keys or [], args or [])
+
+
+class MemoryZSet:
+    # Упорядоченное множество: оценки элементов, наибольшая оценка и куча для удаления элементов с наименьшими
+    # оценками (в куче могут оставаться устаревшие пары, они пропускаются).
+
+    def __init__(self):
+        self.scores: dict[bytes, float] = {}
+        self.heap: list[tuple[float, bytes]] = []
+        self.top = -math.inf
+
+    def add(self, member: bytes, score: float) -> None:
+        previous = self.scores.get(member)
+        self.scores[member] = score
+        heapq.heappush(self.heap, (score, member))
+        if score >= self.top:
+            self.top = score
+        elif previous == self.top:
+            self.top = max(self.scores.values())
+
+    def remove(self, member: bytes) -> bool:
+        score = self.scores.pop(member, None)
+        if score is not None and score == self.top:
+            self.top = max(self.scores.values(), default=-math.inf)
+        return score is not None
+
+    def trim(self, max_score: float) -> None:
+        # Удаленные элементы не больше max_score, а следующий добавленный больше, поэтому top не пересчитывается.
+        while self.heap and self.heap[0][0] <= max_score:
+            score, member = heapq.heappop(self.heap)
+            if self.scores.get(member) == score:
+                del self.scores[member]
+
+
+class MemoryRedis:
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        # Ключ -> (значение, момент истечения по time.monotonic или None).
+        self.data: dict[str, tuple[object, float | None]] = {}
+
+    async def roundtrip(self) -> None:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def pipeline(self, transaction: bool = True) -> MemoryPipeline:
+        return MemoryPipeline(self)
+
+    def __getattr__(self, command: str):
+        method = getattr(type(self), '_' + command, None)
+        if method is None:
+            raise AttributeError(command)
+
+        async def call(*args, **kwargs):
+            await self.roundtrip()
+            return method(self, *args, **kwargs)
+        return call
+
+    async def ping(self) -> bool:
+        return True
+
+    async def close(self) -> None:
+        pass
+
+    @staticmethod
+    def _key(name: bytes | str) -> str:
+        return name.decode('utf-8') if isinstance(name, bytes) else name
+
+    @staticmethod
+    def _bytes(value: object) -> bytes:
+        # Redis хранит только строки: числа и str приводятся к байтам так же, как в redis-py.
+        if isinstance(value, bytes):
+            return value
+        if isinstance(value, float):
+            return repr(value).encode()
+        return str(value).encode()
+
+    def _entry(self, name: bytes | str) -> object | None:
+        key = self._key(name)
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self.data[key]
+            return None
+        return value
+
+    def _get(self, name: bytes | str) -> bytes | None:
+        value = self._entry(name)
+        return value if isinstance(value, bytes) else None
+
+    def _mget(self, names: list) -> list:
+        return [self._get(name) for name in names]
+
+    def _set(self, name: bytes | str, value: object, ex: int | None = None) -> bool:
+        self.data[self._key(name)] = (self._bytes(value), time.monotonic() + ex if ex else None)
+        return True
+
+    def _hset(self, name: bytes | str, mapping: dict) -> int:
+        value = self._entry(name)
+        fields = value if isinstance(value, dict) else {}
+        fields.update({field: self._bytes(item) for field, item in mapping.items()})
+        entry = self.data.get(self._key(name))
+        self.data[self._key(name)] = (fields, entry[1] if entry and value is not None else None)
+        return len(mapping)
+
+    def _hmget(self, name: bytes | str, keys: list) -> list:
+        value = self._entry(name)
+        fields = value if isinstance(value, dict) else {}
+        return [fields.get(key) for key in keys]
+
+    def _expire(self, name: bytes | str, ex: int) -> bool:
+        value = self._entry(name)
+        if value is None:
+            return False
+        self.data[self._key(name)] = (value, time.monotonic() + ex)
+        return True
+
+    def _zset(self, name: bytes | str) -> 'MemoryZSet':
+        value = self._entry(name)
+        return value if isinstance(value, MemoryZSet) else MemoryZSet()
+
+    def _zrange(self, name: bytes | str, start: int, end: int) -> list[bytes]:
+        members = sorted(self._zset(name).scores.items(), key=lambda item: (item[1], item[0]))
+        return [member for member, _ in members[start:end + 1 if end != -1 else None]]
+
+    def _zrem(self, name: bytes | str, *members) -> int:
+        zset = self._zset(name)
+        removed = sum(zset.remove(self._bytes(member)) for member in members)
+        if not zset.scores:
+            self._delete(name)
+        return removed
+
+    def _unlink(self, *names) -> int:
+        return self._delete(*names)
+
+    def register_script(self, script: str) -> 'MemoryScript':
+        return MemoryScript(self, {
+            TAG_SCRIPT: self._tag, RESPONSE_SCRIPT: self._response
+        }[script])
+
+    def _tag(self, keys: list, args: list) -> int:
+        # То же, что TAG_SCRIPT в db.redisdb.
+        name, ex, now = args
+        for tag in keys:
+            zset = self._zset(tag)
+            zset.trim(now)
+            zset.add(self._bytes(name), now + ex if ex else math.inf)
+            expires_at = None if zset.top == math.inf else time.monotonic() + math.ceil(zset.top - now)
+            self.data[self._key(tag)] = (zset, expires_at)
+        return 0
+
+    def _response(self, keys: list, args: list) -> list | None:
+        # То же, что RESPONSE_SCRIPT в db.redisdb.
+        pttl = self._pttl(keys[0])
+        if pttl == -2:
+            return None
+        meta = self._hmget(keys[0], ['etag', 'delta', 'expiry'])
+        field = args[0]
+        if self._hmget(keys[0], [field])[0] is None:
+            field = 'body'
+        etag = meta[0]
+        if etag is not None and field != 'body':
+            etag = etag[:-1] + b'-' + self._bytes(field)[5:] + b'"'
+        if etag is not None and any(self._bytes(candidate) in (etag, b'*') for candidate in args[1:]):
+            return [pttl, *meta, field]
+        return [pttl, *meta, field, self._hmget(keys[0], [field])[0]]
+
+    def _pttl(self, name: bytes | str) -> int:
+        if self._entry(name) is None:
+            return -2
+        expires_at = self.data[self._key(name)][1]
+        return -1 if expires_at is None else int((expires_at - time.monotonic()) * 1000)
+
+    def _delete(self, *names) -> int:
+        return sum(self.data.pop(self._key(name), None) is not None for name in names)
+
+
+class LatencyDataBase(MemoryDataBase):
+    # Движок db.memory с задержкой каждого обращения, имитирующей сетевой запрос к Elasticsearch.
+
+    def __init__(self, documents: dict[str, list[dict]], latency: float = 0.0):
+        super().__init__(documents)
+        self.latency = latency
+
+    async def get(self, *args, **kwargs):
+        await self._roundtrip()
+        return await super().get(*args, **kwargs)
+
+    async def mget(self, *args, **kwargs):
+        await self._roundtrip()
+        return await super().mget(*args, **kwargs)
+
+    async def search(self, *args, **kwargs):
+        await self._roundtrip()
+        return await super().search(*args, **kwargs)
+
+    async def search_after(self, *args, **kwargs):
+        await self._roundtrip()
+        return await super().search_after(*args, **kwargs)
+
+    async def count(self, *args, **kwargs):
+        await self._roundtrip()
+        return await super().count(*args, **kwargs)
+
+    async def _roundtrip(self) -> None:
+        if self.latency:
+            await asyncio.sleep(self.latency)
@@ -0,0 +1,219 @@
+"""
+Сквозной бенчмарк пропускной способности API.
+
+Приложение main:app запускается в этом же процессе без lifespan: вместо Redis и Elasticsearch
+подставляются заменители из stands.py. Смешанная нагрузка (карточка фильма, поиск фильмов,
+список жанров, фильмы персоны) подается напрямую через ASGI заданным числом одновременных клиентов.
+Отчет содержит RPS и перцентили задержки по сценариям и сравнение с сохраненным базовым замером.
+
+Запуск из корня репозитория:
+    python tests/benchmarks/throughput.py                  # замер и сравнение с baseline.json
+    python tests/benchmarks/throughput.py --save-baseline  # замер и сохранение нового baseline.json
+
+Код выхода 1 означает регрессию относительно базового замера (с учетом --tolerance).
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'src'))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from core.config import local_cache_settings  # noqa: E402
+from db import cache, database  # noqa: E402
+from db.localcache import LocalCache  # noqa: E402
+from db.redisdb import RedisDb  # noqa: E402
+from main import app  # noqa: E402
+from stands import WORDS, LatencyDataBase, MemoryRedis, make_dataset  # noqa: E402
+
+BASELINE = Path(__file__).resolve().parent / 'baseline.json'
+
+# Доли сценариев в нагрузке.
+MIX = {
+    'film_details': 0.4,
+    'film_search': 0.25,
+    'genre_list': 0.1,
+    'person_films': 0.25,
+}
+
+
+class Workload:
+    """
+    Генератор запросов: популярность фильмов и персон распределена по закону Ципфа,
+    как у реального каталога, где небольшая часть карточек получает большую часть трафика.
+    """
+
+    def __init__(self, data: dict[str, list[dict]], seed: int):
+        self.random = random.Random(seed)
+        self.films = [doc['uuid'] for doc in data['movies']]
+        self.persons = [doc['uuid'] for doc in data['persons']]
+        self.film_weights = [1 / rank for rank in range(1, len(self.films) + 1)]
+        self.person_weights = [1 / rank for rank in range(1, len(self.persons) + 1)]
+
+    def next(self) -> tuple[str, str, str]:
+        scenario = self.random.choices(list(MIX), weights=list(MIX.values()))[0]
+        if scenario == 'film_details':
+            film_id = self.random.choices(self.films, weights=self.film_weights)[0]
+            return scenario, f'/api/v1/films/{film_id}', ''
+        if scenario == 'film_search':
+            query = self.random.choice(WORDS)
+            page = self.random.choices((1, 2, 3), weights=(6, 3, 1))[0]
+            return scenario, '/api/v1/films/search', f'query={query}&page_size=50&page_number={page}'
+        if scenario == 'genre_list':
+            return scenario, '/api/v1/genres/', 'page_size=50'
+        person_id = self.random.choices(self.persons, weights=self.person_weights)[0]
+        return scenario, f'/api/v1/persons/{person_id}/film/', ''
+
+
+async def request(path: str, query: str) -> int:
+    # Минимальный ASGI-клиент: GET без тела, возвращает код ответа.
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': path, 'raw_path': path.encode(), 'query_string': query.encode(), 'root_path': '',
+        'headers': [(b'host', b'benchmark')], 'client': ('127.0.0.1', 0), 'server': ('benchmark', 80),
+    }
+    sent = False
+    done = asyncio.Event()
+    status = 0
+
+    async def receive() -> dict:
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await done.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message: dict) -> None:
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+        elif message['type'] == 'http.response.body' and not message.get('more_body'):
+            done.set()
+
+    await app(scope, receive, send)
+    done.set()
+    return status
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def summary(latencies: list[float]) -> dict[str, float]:
+    return {
+        'count': len(latencies),
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 3),
+        'p90_ms': round(percentile(latencies, 0.9) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    data = make_dataset(films=args.films, persons=args.persons, seed=args.seed)
+    redis_db = RedisDb(MemoryRedis(latency=args.redis_latency_ms / 1000))
+    cache.cache = (
+        LocalCache(redis_db, max_size=local_cache_settings.max_size, ttl=local_cache_settings.ttl)
+        if args.local_cache else redis_db
+    )
+    database.db = LatencyDataBase(data, latency=args.es_latency_ms / 1000)
+
+    workload = Workload(data, args.seed)
+    plan = [workload.next() for _ in range(args.requests)]
+    latencies: dict[str, list[float]] = {scenario: [] for scenario in MIX}
+    errors = 0
+    position = 0
+
+    async def client():
+        nonlocal position, errors
+        while position < len(plan):
+            scenario, path, query = plan[position]
+            position += 1
+            started = time.perf_counter()
+            status = await request(path, query)
+            latencies[scenario].append(time.perf_counter() - started)
+            if status >= 500:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        'requests': args.requests,
+        'concurrency': args.concurrency,
+        'errors': errors,
+        'rps': round(args.requests / elapsed, 1),
+        'overall': summary([value for values in latencies.values() for value in values]),
+        'scenarios': {scenario: summary(values) for scenario, values in latencies.items() if values},
+    }
+
+
+def report(result: dict, baseline: dict | None) -> None:
+    def delta(current: float, previous: float | None) -> str:
+        return f'{(current - previous) / previous * 100:+.1f}%' if previous else ''
+
+    previous_rps = baseline['rps'] if baseline else None
+    print(f'{result["requests"]} requests, concurrency {result["concurrency"]}, errors {result["errors"]}')
+    print(f'RPS {result["rps"]:.1f} {delta(result["rps"], previous_rps)}')
+    print(f'{"scenario":<16}{"count":>8}{"p50, ms":>10}{"p90, ms":>10}{"p99, ms":>10}{"p99 vs baseline":>18}')
+    rows = {'overall': result['overall'], **result['scenarios']}
+    for name, row in rows.items():
+        previous = (baseline or {}).get('overall' if name == 'overall' else 'scenarios', {})
+        previous = previous if name == 'overall' else previous.get(name, {})
+        print(f'{name:<16}{row["count"]:>8}{row["p50_ms"]:>10.2f}{row["p90_ms"]:>10.2f}{row["p99_ms"]:>10.2f}'
+              f'{delta(row["p99_ms"], previous.get("p99_ms")):>18}')
+
+
+def regressions(result: dict, baseline: dict, tolerance: float) -> list[str]:
+    found = []
+    if result['errors']:
+        found.append(f'{result["errors"]} requests failed')
+    if result['rps'] < baseline['rps'] * (1 - tolerance):
+        found.append(f'RPS {result["rps"]} < baseline {baseline["rps"]}')
+    if result['overall']['p99_ms'] > baseline['overall']['p99_ms'] * (1 + tolerance):
+        found.append(f'p99 {result["overall"]["p99_ms"]} ms > baseline {baseline["overall"]["p99_ms"]} ms')
+    return found
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--films', type=int, default=2000)
+    parser.add_argument('--persons', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--redis-latency-ms', type=float, default=0.2)
+    parser.add_argument('--es-latency-ms', type=float, default=3.0)
+    parser.add_argument('--local-cache', action=argparse.BooleanOptionalAction, default=local_cache_settings.enabled)
+    parser.add_argument('--tolerance', type=float, default=0.25, help='допустимое ухудшение RPS и p99 (доля)')
+    parser.add_argument('--baseline', type=Path, default=BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() and not args.save_baseline else None
+    report(result, baseline)
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(result, indent=2) + '\n')
+        print(f'baseline saved to {args.baseline}')
+        return 0
+    if baseline is None:
+        return 0
+    if baseline['requests'] != result['requests'] or baseline['concurrency'] != result['concurrency']:
+        print('baseline was recorded with other --requests/--concurrency, comparison skipped')
+        return 0
+    found = regressions(result, baseline, args.tolerance)
+    for problem in found:
+        print(f'REGRESSION: {problem}')
+    return 1 if found else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""
+Модульные тесты сервиса: запускаются без Elasticsearch и Redis (вместо Redis - fakeredis с Lua).
+
+Запуск из корня репозитория:
+    pip install -r src/requirements.txt -r tests/unit/requirements.txt
+    pytest tests/unit
+"""
+import sys
+import uuid
+from pathlib import Path
+
+import fakeredis
+import httpx
+import pytest
+import pytest_asyncio
+
+# Модули сервиса импортируются так же, как при запуске из src.
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'src'))
+
+from db.memory import MemoryDataBase  # noqa: E402
+from db.redisdb import RedisDb  # noqa: E402
+
+
+@pytest_asyncio.fixture
+async def redis_client() -> fakeredis.aioredis.FakeRedis:
+    # Отдельный сервер на каждый тест: данные тестов не пересекаются.
+    client = fakeredis.aioredis.FakeRedis(server=fakeredis.FakeServer())
+    yield client
+    await client.aclose()
+
+
+def make_catalog(films: int = 30, persons: int = 10) -> dict[str, list[dict]]:
+    # Небольшой каталог: три жанра по кругу, рейтинг растет с номером фильма, половина названий содержит "Star".
+    genres = [{'uuid': str(uuid.UUID(int=index + 1)), 'name': name}
+              for index, name in enumerate(('Drama', 'Comedy', 'Sci-Fi'))]
+    people = [{'uuid': str(uuid.uuid4()), 'full_name': f'Person {index}'} for index in range(persons)]
+    movies = [{
+        'uuid': str(uuid.uuid4()),
+        'title': f'Star film {index}' if index % 2 else f'Other film {index}',
+        'imdb_rating': round(index * 10 / films, 1),
+        'description': 'Description',
+        'genre': [genres[index % len(genres)]],
+        'actors': people[:3],
+        'writers': people[3:4],
+        'directors': people[4:5],
+    } for index in range(films)]
+    persons_docs = [{**person, 'films': [{'uuid': movie['uuid'], 'roles': ['actor']} for movie in movies[:5]]}
+                    for person in people]
+    return {'movies': movies, 'genres': genres, 'persons': persons_docs}
+
+
+@pytest.fixture
+def catalog() -> dict[str, list[dict]]:
+    return make_catalog()
+
+
+@pytest_asyncio.fixture
+async def api_client(redis_client, catalog) -> httpx.AsyncClient:
+    # Приложение без lifespan: кеш - RedisDb поверх fakeredis, база - движок в памяти с каталогом из catalog.
+    from db import cache, database
+    from main import app
+    from services.film import get_film_service
+    from services.genre import get_genre_service
+    from services.person import get_person_service
+
+    cache.cache = RedisDb(redis_client)
+    database.db = MemoryDataBase(catalog)
+    # Провайдеры сервисов кешируют экземпляры вместе с прежними cache и db.
+    for provider in (get_film_service, get_genre_service, get_person_service):
+        provider.cache_clear()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://test') as client:
+        yield client
+    for provider in (get_film_service, get_genre_service, get_person_service):
+        provider.cache_clear()
@@ -0,0 +1,39 @@
+from http import HTTPStatus
+
+import orjson
+import pytest
+
+from db import database
+from db.memory import MemoryDataBase
+
+
+@pytest.mark.asyncio
+async def test_film_details_are_served_from_cached_bytes(api_client, catalog):
+    # 1. Подготовка данных.
+    film = catalog['movies'][0]
+
+    # 2. Первый запрос собирает тело ответа и сохраняет его в кеш.
+    first = await api_client.get(f'/api/v1/films/{film["uuid"]}')
+    assert first.status_code == HTTPStatus.OK
+    assert orjson.loads(first.content)['title'] == film['title']
+
+    # 3. Без базы ответ отдается из кеша байт в байт.
+    database.db = MemoryDataBase({})
+    second = await api_client.get(f'/api/v1/films/{film["uuid"]}')
+    assert second.status_code == HTTPStatus.OK
+    assert second.content == first.content
+    assert second.headers['content-type'] == 'application/json'
+
+
+@pytest.mark.asyncio
+async def test_film_list_is_served_from_cached_bytes(api_client, catalog):
+    # 1. Первый запрос списка.
+    first = await api_client.get('/api/v1/films/', params={'sort': '-imdb_rating', 'page_size': 5})
+    assert first.status_code == HTTPStatus.OK
+    ratings = [film['imdb_rating'] for film in first.json()]
+    assert ratings == sorted(ratings, reverse=True) and len(ratings) == 5
+
+    # 2. Повторный запрос - те же байты из кеша.
+    database.db = MemoryDataBase({})
+    second = await api_client.get('/api/v1/films/', params={'sort': '-imdb_rating', 'page_size': 5})
+    assert second.content == first.content
@@ -0,0 +1,55 @@
+import uuid
+
+import pytest
+
+from db.codec import codec_for, get_codec, json_codec, MSGPACK_HEADER, msgpack_codec
+from db.compression import Compressor
+from db.redisdb import RedisDb
+from models.film import FilmShort
+
+
+def make_films(count: int) -> list[FilmShort]:
+    return [FilmShort(uuid=uuid.uuid4(), title=f'Film {i}', imdb_rating=i / 10) for i in range(count)]
+
+
+def test_msgpack_round_trip_and_header():
+    # 1. Подготовка данных.
+    films = make_films(3)
+
+    # 2. Модель и список проходят через msgpack без потерь, значение помечено заголовком.
+    data = msgpack_codec.dumps(films)
+    assert data.startswith(MSGPACK_HEADER)
+    assert msgpack_codec.loads_list(data, FilmShort) == films
+    assert msgpack_codec.loads(msgpack_codec.dumps(films[0]), FilmShort) == films[0]
+    assert msgpack_codec.loads_list(msgpack_codec.dumps([]), FilmShort) == []
+    # UUID хранится 16 байтами, поэтому значение короче JSON.
+    assert len(data) < len(json_codec.dumps(films))
+
+
+def test_codec_is_chosen_by_header():
+    films = make_films(2)
+    assert codec_for(msgpack_codec.dumps(films)) is msgpack_codec
+    assert codec_for(json_codec.dumps(films)) is json_codec
+    assert get_codec('json') is json_codec and get_codec('msgpack') is msgpack_codec
+    with pytest.raises(ValueError):
+        get_codec('pickle')
+
+
+@pytest.mark.asyncio
+async def test_values_of_both_codecs_are_read_by_any_writer(redis_client):
+    # 1. Подготовка данных: процессы с разными кодеками и сжатием пишут в один кеш.
+    films = make_films(50)
+    writers = {
+        'json': RedisDb(redis_client),
+        'msgpack': RedisDb(redis_client, codec=msgpack_codec),
+        'msgpack-zlib': RedisDb(redis_client, codec=msgpack_codec, compressor=Compressor(threshold=100)),
+    }
+    for name, cache in writers.items():
+        await cache.set('movies:' + name, films)
+        await cache.set('movie:' + name, films[0])
+
+    # 2. Любой из них читает записи всех остальных.
+    for cache in writers.values():
+        for name in writers:
+            assert await cache.get_list('movies:' + name, FilmShort) == films
+            assert await cache.get('movie:' + name, FilmShort) == films[0]
@@ -0,0 +1,51 @@
+import uuid
+
+import pytest
+
+from db.compression import Compressor, ZLIB_HEADER
+from db.redisdb import RedisDb
+from models.film import FilmShort
+
+
+def make_films(count: int) -> list[FilmShort]:
+    return [FilmShort(uuid=uuid.uuid4(), title=f'Film {i}', imdb_rating=i / 10) for i in range(count)]
+
+
+def test_compressor_skips_small_values_and_marks_large_ones():
+    # 1. Подготовка данных.
+    compressor = Compressor(threshold=100)
+    small, large = b'{"a":1}', b'{"a":"' + b'x' * 1000 + b'"}'
+
+    # 2. Маленькое значение хранится как есть, большое - сжатым и с заголовком.
+    assert compressor.compress(small) == small
+    packed = compressor.compress(large)
+    assert packed.startswith(ZLIB_HEADER) and len(packed) < len(large)
+
+    # 3. Распаковка возвращает исходные байты и пропускает несжатые значения.
+    assert compressor.decompress(packed) == large
+    assert compressor.decompress(small) == small
+    stats = compressor.stats()
+    assert stats['compressed'] == 1 and stats['decompressed'] == 1 and stats['ratio'] > 1
+
+
+def test_compressor_without_threshold_only_decompresses():
+    compressor = Compressor(threshold=None)
+    large = b'[' + b'1,' * 1000 + b'1]'
+    assert compressor.compress(large) == large
+    assert compressor.decompress(Compressor(threshold=1).compress(large)) == large
+
+
+@pytest.mark.asyncio
+async def test_compressed_and_plain_values_are_read_interchangeably(redis_client):
+    # 1. Подготовка данных: один процесс пишет со сжатием, другой - без.
+    films = make_films(50)
+    compressing = RedisDb(redis_client, compressor=Compressor(threshold=100))
+    plain = RedisDb(redis_client)
+
+    # 2. Записи обоих читаются любым из них.
+    await compressing.set('movies:compressed', films)
+    await plain.set('movies:plain', films)
+    assert (await redis_client.get('movies:compressed')).startswith(ZLIB_HEADER)
+    for cache in (compressing, plain):
+        assert await cache.get_list('movies:compressed', FilmShort) == films
+        assert await cache.get_list('movies:plain', FilmShort) == films
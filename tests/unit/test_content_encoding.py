@@ -0,0 +1,74 @@
+import gzip
+
+import brotli
+import pytest
+
+from core.config import response_compression_settings
+from core.content_encoding import encode_all, encode_stream, negotiate
+from db.cache import CachedResponse
+from db.compression import Compressor, ZLIB_HEADER
+from db.redisdb import RedisDb
+
+BODY = b'[' + b','.join(b'{"title":"Film %d"}' % i for i in range(200)) + b']'
+
+
+@pytest.mark.parametrize('header, expected', [
+    (None, None),
+    ('', None),
+    ('identity', None),
+    ('gzip', 'gzip'),
+    ('gzip, deflate, br', 'br'),
+    ('br;q=0.5, gzip', 'gzip'),
+    ('gzip;q=0, br;q=0', None),
+    ('*', 'br'),
+    ('*;q=0.1, br;q=0', 'gzip'),
+    ('GZIP;q=0.8', 'gzip'),
+    ('br;q=bad, gzip;q=0.1', 'gzip'),
+])
+def test_negotiate(header, expected):
+    assert negotiate(header) == expected
+
+
+def test_negotiate_is_off_when_compression_disabled(monkeypatch):
+    monkeypatch.setattr(response_compression_settings, 'enabled', False)
+    assert negotiate('gzip, br') is None
+    assert encode_all(BODY) == {}
+
+
+def test_encode_all_skips_small_bodies():
+    assert encode_all(b'{}') == {}
+    variants = encode_all(BODY)
+    assert gzip.decompress(variants['gzip']) == BODY
+    assert brotli.decompress(variants['br']) == BODY
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('encoding, decompress', [('gzip', gzip.decompress), ('br', brotli.decompress)])
+async def test_encode_stream_round_trip(encoding, decompress):
+    # 1. Подготовка данных: тело приходит частями.
+    async def chunks():
+        for i in range(0, len(BODY), 500):
+            yield BODY[i:i + 500]
+
+    # 2. Каждая часть сжимается сразу, а склеенный поток распаковывается в исходное тело.
+    parts = [part async for part in encode_stream(chunks(), encoding)]
+    assert all(parts[:-1])
+    assert decompress(b''.join(parts)) == BODY
+
+
+@pytest.mark.asyncio
+async def test_body_with_variants_is_stored_uncompressed(redis_client):
+    # 1. Подготовка данных: кеш сжимает большие значения.
+    cache = RedisDb(redis_client, compressor=Compressor(threshold=100))
+    await cache.set_response('response:with', CachedResponse(body=BODY, etag='"e"', variants=encode_all(BODY)))
+    await cache.set_response('response:without', CachedResponse(body=BODY, etag='"e"'))
+
+    # 2. Рядом со сжатыми вариантами тело хранится как есть, без вариантов - сжатым zlib.
+    assert await redis_client.hget('response:with', 'body') == BODY
+    assert (await redis_client.hget('response:without', 'body')).startswith(ZLIB_HEADER)
+
+    # 3. Оба читаются одинаково, а сжатый вариант отдается готовым.
+    for name in ('response:with', 'response:without'):
+        assert (await cache.get_response(name)).body == BODY
+    gzipped = await cache.get_response('response:with', encoding='gzip')
+    assert gzipped.encoding == 'gzip' and gzip.decompress(gzipped.body) == BODY
@@ -0,0 +1,74 @@
+from http import HTTPStatus
+
+import pytest
+
+from core.config import pagination_settings
+from db import cache as cache_module
+from db.memory import MemoryDataBase
+from db.redisdb import RedisDb
+from services.film import FilmService
+from services.invalidation import invalidate
+from services.person import PersonService
+
+
+class CountingDataBase(MemoryDataBase):
+    # Считает подсчеты в базе.
+
+    def __init__(self, documents: dict[str, list[dict]]):
+        super().__init__(documents)
+        self.counts = 0
+
+    async def count(self, *args, **kwargs):
+        self.counts += 1
+        return await super().count(*args, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_count_is_cached_per_conditions(redis_client, catalog):
+    # 1. Подготовка данных.
+    db = CountingDataBase(catalog)
+    service = FilmService(RedisDb(redis_client), db)
+
+    # 2. Повторный подсчет с теми же условиями (в другом порядке) берется из кеша, с другими - считается заново.
+    total = await service.count_films(genre=['Drama', 'Comedy'], query='star')
+    assert await service.count_films(genre=['Comedy', 'Drama'], query='star') == total
+    assert db.counts == 1
+    assert (await service.count_films()).value == len(catalog['movies'])
+    assert db.counts == 2
+    keys = await redis_client.keys('*count:movies:*')
+    assert len(keys) == 2
+    for key in keys:
+        assert 0 < await redis_client.ttl(key) <= pagination_settings.count_ttl
+
+
+@pytest.mark.asyncio
+async def test_invalidation_clears_counts_of_affected_index(redis_client, catalog, monkeypatch):
+    # 1. Подготовка данных: подсчеты фильмов и персон в кеше.
+    db = CountingDataBase(catalog)
+    cache = RedisDb(redis_client)
+    monkeypatch.setattr(cache_module, 'cache', cache)
+    films, persons = FilmService(cache, db), PersonService(cache, db)
+    await films.count_films()
+    await persons.count_persons()
+
+    # 2. Изменение персоны сбрасывает только подсчет персон.
+    await invalidate(['person:' + catalog['persons'][0]['uuid']])
+    await films.count_films()
+    await persons.count_persons()
+    assert db.counts == 3
+
+    # 3. Изменение фильма или жанра сбрасывает подсчет фильмов.
+    for tag in ('film:' + catalog['movies'][0]['uuid'], 'genre:' + catalog['genres'][0]['uuid']):
+        await invalidate([tag])
+        await films.count_films()
+    assert db.counts == 5
+
+
+@pytest.mark.asyncio
+async def test_api_total_headers(api_client, catalog):
+    # Число найденных и признак следующей страницы в заголовках списка.
+    response = await api_client.get('/api/v1/films/', params={'page_size': 10, 'page_number': 3, 'with_total': True})
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['x-total-count'] == str(len(catalog['movies']))
+    assert response.headers['x-total-count-relation'] == 'eq'
+    assert response.headers['x-has-next'] == 'false'
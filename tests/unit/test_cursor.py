@@ -0,0 +1,133 @@
+from http import HTTPStatus
+
+import pytest
+from elasticsearch import BadRequestError
+
+from db.database import decode_cursor, encode_cursor
+from db.elastic import Elastic
+from db.memory import MemoryDataBase
+from models.film import FilmShort
+
+
+class FakeElasticsearch:
+    # Минимальный клиент Elasticsearch для search_after по одному полю сортировки и тайбрейкеру:
+    # как и настоящий, отвечает 400 на ключ сортировки не того типа.
+
+    def __init__(self, docs: list[dict]):
+        self.docs = docs
+        self.pits = 0
+
+    async def open_point_in_time(self, index: str, keep_alive: str) -> dict:
+        self.pits += 1
+        return {'id': f'pit-{self.pits}'}
+
+    async def close_point_in_time(self, id: str) -> None:
+        pass
+
+    async def search(self, sort: list, size: int, search_after: list | None = None, **kwargs) -> dict:
+        fields = [next(iter(item)) for item in sort]
+        keys = sorted(
+            ([doc[field] for field in fields], doc) for doc in self.docs if all(field in doc for field in fields)
+        )
+        if search_after is not None:
+            if any(type(value) is not type(key) for value, key in zip(search_after, keys[0][0])):
+                raise BadRequestError('search_after type mismatch', meta=None, body={})
+            keys = [(key, doc) for key, doc in keys if key > search_after]
+        return {'hits': {'hits': [{'_source': doc, 'sort': key} for key, doc in keys[:size]]}}
+
+
+def engines(catalog: dict) -> list:
+    return [MemoryDataBase(catalog), Elastic(FakeElasticsearch(catalog['movies']))]
+
+
+async def read_all(db, **kwargs) -> list[str]:
+    ids, cursor = [], None
+    while True:
+        films, cursor = await db.search_after('movies', FilmShort, per_page=7, cursor=cursor, **kwargs)
+        ids.extend(str(film.uuid) for film in films)
+        if cursor is None:
+            return ids
+
+
+@pytest.mark.asyncio
+async def test_cursor_pages_cover_index_once(catalog):
+    # 1. Подготовка данных.
+    expected = sorted(film['uuid'] for film in catalog['movies'])
+
+    # 2. Обход всех страниц возвращает каждый фильм один раз на обоих движках.
+    for db in engines(catalog):
+        assert await read_all(db) == expected
+
+
+@pytest.mark.asyncio
+async def test_cursor_is_bound_to_its_query(catalog):
+    for db in engines(catalog):
+        # 1. Курсор выдан для сортировки по рейтингу.
+        _, cursor = await db.search_after('movies', FilmShort, sort='imdb_rating', per_page=5)
+        assert cursor
+
+        # 2. С другой сортировкой, другим индексом или другим отбором он не принимается.
+        with pytest.raises(ValueError):
+            await db.search_after('movies', FilmShort, sort='-imdb_rating', per_page=5, cursor=cursor)
+        with pytest.raises(ValueError):
+            await db.search_after('persons', FilmShort, sort='imdb_rating', per_page=5, cursor=cursor)
+        with pytest.raises(ValueError):
+            await db.search_after('movies', FilmShort, sort='imdb_rating', per_page=5, cursor=cursor,
+                                  search_field='title', search_string='star')
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('change', [
+    {'after': ['x']},
+    {'after': [1, 2, 3]},
+    {'after': 'x'},
+    {'after': [{'a': 1}, 'x']},
+    {'pit': 42},
+    {'pit': 'forged'},
+])
+async def test_forged_cursor_is_rejected_by_both_engines(catalog, change):
+    for db in engines(catalog):
+        # 1. Подделываем поле настоящего курсора.
+        _, cursor = await db.search_after('movies', FilmShort, sort='imdb_rating', per_page=5)
+        forged = encode_cursor(decode_cursor(cursor) | change)
+
+        # 2. Оба движка отвечают одной и той же ошибкой клиента.
+        with pytest.raises(ValueError):
+            await db.search_after('movies', FilmShort, sort='imdb_rating', per_page=5, cursor=forged)
+
+
+@pytest.mark.asyncio
+async def test_elastic_bad_request_becomes_invalid_cursor(catalog):
+    # Ключ сортировки правильной длины, но строка вместо числа: в Elastic это видит только сам Elasticsearch,
+    # и его ошибка 400 должна стать той же ValueError, что и у движка в памяти.
+    for db in engines(catalog):
+        _, cursor = await db.search_after('movies', FilmShort, sort='imdb_rating', per_page=5)
+        forged = encode_cursor(decode_cursor(cursor) | {'after': ['high', catalog['movies'][0]['uuid']]})
+        with pytest.raises(ValueError):
+            await db.search_after('movies', FilmShort, sort='imdb_rating', per_page=5, cursor=forged)
+
+
+@pytest.mark.asyncio
+async def test_pit_is_opt_in(catalog):
+    # 1. Без pit_keep_alive снимок не открывается и в курсор не попадает.
+    client = FakeElasticsearch(catalog['movies'])
+    _, cursor = await Elastic(client).search_after('movies', FilmShort, per_page=5)
+    assert client.pits == 0
+    assert decode_cursor(cursor)['pit'] is None
+
+    # 2. С pit_keep_alive снимок открывается один раз на обход.
+    assert await read_all(Elastic(client, pit_keep_alive='1m')) == sorted(film['uuid'] for film in catalog['movies'])
+    assert client.pits == 1
+
+
+@pytest.mark.asyncio
+async def test_api_answers_400_on_forged_cursor(api_client):
+    # 1. Получаем настоящий курсор.
+    first = await api_client.get('/api/v1/films/', params={'sort': '-imdb_rating', 'page_size': 5, 'cursor': ''})
+    assert first.status_code == HTTPStatus.OK
+
+    # 2. Курсор с подставленным PIT - ошибка клиента, а не сервера.
+    cursor = first.headers['x-next-cursor']
+    forged = encode_cursor(decode_cursor(cursor) | {'pit': 'forged'})
+    response = await api_client.get('/api/v1/films/', params={'sort': '-imdb_rating', 'page_size': 5, 'cursor': forged})
+    assert response.status_code == HTTPStatus.BAD_REQUEST
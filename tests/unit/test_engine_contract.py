@@ -0,0 +1,128 @@
+"""
+Контракт движков базы: одни и те же сценарии выполняются на MemoryDataBase и на Elastic.
+
+Elastic проверяется на настоящем Elasticsearch (ES_HOST, по умолчанию http://127.0.0.1:9200) с маппингами
+функциональных тестов; если он недоступен, эти варианты пропускаются.
+"""
+import os
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+import pytest_asyncio
+from elasticsearch import AsyncElasticsearch
+
+from db.database import AnyOf, decode_cursor, encode_cursor, Range
+from db.elastic import Elastic
+from db.memory import MemoryDataBase
+from models.film import FilmShort
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'functional'))
+
+from settings import film_test_settings, genre_test_settings, person_test_settings  # noqa: E402
+
+INDEX_SETTINGS = {'movies': film_test_settings, 'genres': genre_test_settings, 'persons': person_test_settings}
+
+
+@pytest_asyncio.fixture(params=['memory', 'elastic'])
+async def engine(request, catalog):
+    # Движок и имена его индексов: у Elastic это временные индексы с уникальным суффиксом.
+    if request.param == 'memory':
+        yield MemoryDataBase(catalog), {name: name for name in catalog}
+        return
+    client = AsyncElasticsearch(hosts=[os.environ.get('ES_HOST', 'http://127.0.0.1:9200')], request_timeout=5)
+    if not await client.ping():
+        await client.close()
+        pytest.skip('Elasticsearch is not available')
+    suffix = uuid.uuid4().hex[:8]
+    names = {name: f'contract-{name}-{suffix}' for name in catalog}
+    try:
+        for name, docs in catalog.items():
+            settings = INDEX_SETTINGS[name]
+            await client.indices.create(
+                index=names[name], settings=settings.es_index_settings, mappings=settings.es_index_mapping[name]
+            )
+            operations = []
+            for doc in docs:
+                operations += [{'index': {'_index': names[name], '_id': doc['uuid']}}, doc]
+            await client.bulk(operations=operations, refresh='wait_for')
+        yield Elastic(client), names
+    finally:
+        await client.indices.delete(index=','.join(names.values()), ignore_unavailable=True)
+        await client.close()
+
+
+def ids(films: list) -> list[str]:
+    return [str(film.uuid) for film in films]
+
+
+@pytest.mark.asyncio
+async def test_sorted_search_pages(engine, catalog):
+    # Полнотекстовый поиск с сортировкой и постраничной выдачей.
+    db, names = engine
+    stars = sorted((film for film in catalog['movies'] if film['title'].startswith('Star')),
+                   key=lambda film: -film['imdb_rating'])
+    page = await db.search(names['movies'], FilmShort, search_field='title', search_string='star',
+                           sort='-imdb_rating', page=2, per_page=4)
+    assert ids(page) == [film['uuid'] for film in stars[4:8]]
+
+
+@pytest.mark.asyncio
+async def test_filters_and_count(engine, catalog):
+    # Фильтры по названию и идентификатору жанра и диапазону рейтинга, и подсчет по тем же условиям.
+    db, names = engine
+    filters = [AnyOf('genre.name', ('drama', 'Sci-Fi'), text=True), Range('imdb_rating', gte=2, lte=8)]
+    expected = sorted(film['uuid'] for film in catalog['movies']
+                      if film['genre'][0]['name'] in ('Drama', 'Sci-Fi') and 2 <= film['imdb_rating'] <= 8)
+    found = await db.search(names['movies'], FilmShort, filters=filters, sort='uuid', per_page=100)
+    assert ids(found) == expected
+    total = await db.count(names['movies'], filters=filters)
+    assert (total.value, total.exact) == (len(expected), True)
+    capped = await db.count(names['movies'], limit=10)
+    assert (capped.value, capped.exact) == (10, False)
+
+    by_id = await db.search(names['movies'], FilmShort, filters=[AnyOf('genre.uuid', (str(uuid.UUID(int=2)),))],
+                            sort='uuid', per_page=100)
+    assert ids(by_id) == sorted(film['uuid'] for film in catalog['movies'] if film['genre'][0]['name'] == 'Comedy')
+
+
+@pytest.mark.asyncio
+async def test_cursor_walk_and_forged_cursors(engine, catalog):
+    # Курсорный обход отдает те же фильмы в том же порядке, а чужой или подделанный курсор отклоняется.
+    db, names = engine
+    walked, cursor = [], None
+    while True:
+        films, cursor = await db.search_after(names['movies'], FilmShort, sort='-imdb_rating', per_page=7,
+                                              cursor=cursor)
+        walked += ids(films)
+        if cursor is None:
+            break
+    expected = [film['uuid'] for film in sorted(catalog['movies'], key=lambda film: -film['imdb_rating'])]
+    assert walked == expected
+
+    _, cursor = await db.search_after(names['movies'], FilmShort, sort='-imdb_rating', per_page=7)
+    state = decode_cursor(cursor)
+    for forged in (
+            cursor[:-4],
+            encode_cursor(state | {'pit': 'forged'}),
+            encode_cursor(state | {'after': state['after'][:1]}),
+            encode_cursor(state | {'after': ['high', state['after'][1]]}),
+    ):
+        with pytest.raises(ValueError):
+            await db.search_after(names['movies'], FilmShort, sort='-imdb_rating', per_page=7, cursor=forged)
+    with pytest.raises(ValueError):
+        await db.search_after(names['movies'], FilmShort, sort='imdb_rating', per_page=7, cursor=cursor)
+
+
+@pytest.mark.asyncio
+async def test_scan_resumes_after_id(engine, catalog):
+    # Выгрузка всех документов по порядку идентификаторов и продолжение после заданного.
+    db, names = engine
+    expected = sorted(film['uuid'] for film in catalog['movies'])
+    batches = [batch async for batch in db.scan(names['movies'], fields=['uuid', 'title'], batch_size=8)]
+    assert [len(batch) for batch in batches] == [8, 8, 8, 6]
+    assert [doc['uuid'] for batch in batches for doc in batch] == expected
+    assert set(batches[0][0]) == {'uuid', 'title'}
+    resumed = [doc['uuid'] async for batch in db.scan(names['movies'], after=expected[9]) for doc in batch]
+    assert resumed == expected[10:]
@@ -0,0 +1,58 @@
+from http import HTTPStatus
+
+import pytest
+
+# Страница списка больше порога сжатия, поэтому у нее есть сжатые варианты.
+LIST_PARAMS = {'sort': '-imdb_rating', 'page_size': 30}
+
+
+async def get_films(client, encoding: str, etag: str | None = None):
+    headers = {'Accept-Encoding': encoding}
+    if etag:
+        headers['If-None-Match'] = etag
+    return await client.get('/api/v1/films/', params=LIST_PARAMS, headers=headers)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('encoding', ['identity', 'gzip', 'br'])
+async def test_not_modified_for_same_representation(api_client, encoding):
+    # 1. Получаем представление ответа в выбранной кодировке.
+    first = await get_films(api_client, encoding)
+    assert first.status_code == HTTPStatus.OK
+    assert first.headers.get('content-encoding', 'identity') == encoding
+    etag = first.headers['etag']
+
+    # 2. Его ETag (в том числе слабый) дает 304 с тем же ETag.
+    for candidate in (etag, 'W/' + etag, f'"other", {etag}'):
+        second = await get_films(api_client, encoding, candidate)
+        assert second.status_code == HTTPStatus.NOT_MODIFIED
+        assert second.headers['etag'] == etag
+        assert not second.content
+
+
+@pytest.mark.asyncio
+async def test_etag_of_other_encoding_does_not_match(api_client):
+    # 1. ETag-и одного ответа в разных кодировках различаются.
+    etags = {
+        encoding: (await get_films(api_client, encoding)).headers['etag'] for encoding in ('identity', 'gzip', 'br')
+    }
+    assert len(set(etags.values())) == 3
+
+    # 2. ETag другого представления - не совпадение: ответ отдается целиком в запрошенной кодировке.
+    for encoding, etag in (('gzip', etags['br']), ('gzip', etags['identity']), ('identity', etags['gzip'])):
+        response = await get_films(api_client, encoding, etag)
+        assert response.status_code == HTTPStatus.OK
+        assert response.headers['etag'] == etags[encoding]
+        assert response.json()
+
+
+@pytest.mark.asyncio
+async def test_not_modified_after_reload(api_client, redis_client):
+    # 1. ETag сжатого представления, после чего кеш очищается.
+    etag = (await get_films(api_client, 'gzip')).headers['etag']
+    await redis_client.flushdb()
+
+    # 2. Заново загруженный ответ сравнивается с ETag клиента так же, как ответ из кеша.
+    response = await get_films(api_client, 'gzip', etag)
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    assert (await get_films(api_client, 'br', etag)).status_code == HTTPStatus.OK
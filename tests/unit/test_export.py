@@ -0,0 +1,98 @@
+from http import HTTPStatus
+
+import orjson
+import pytest
+from elasticsearch import NotFoundError
+
+from core.config import export_settings
+from db.elastic import Elastic
+
+
+def lines(response) -> list[dict]:
+    return [orjson.loads(line) for line in response.content.splitlines()]
+
+
+@pytest.fixture(autouse=True)
+def small_batches(monkeypatch):
+    # Несколько пачек даже на маленьком каталоге.
+    monkeypatch.setattr(export_settings, 'batch_size', 7)
+
+
+@pytest.mark.asyncio
+async def test_export_streams_all_films_and_resumes_after_id(api_client, catalog):
+    # 1. Полная выгрузка - все фильмы по возрастанию uuid.
+    expected = sorted(film['uuid'] for film in catalog['movies'])
+    response = await api_client.get('/api/v1/films/export', headers={'Accept-Encoding': 'identity'})
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers['content-type'].startswith('application/x-ndjson')
+    assert [film['uuid'] for film in lines(response)] == expected
+
+    # 2. Продолжение после последнего полученного фильма отдает только оставшиеся.
+    response = await api_client.get('/api/v1/films/export', params={'after': expected[11]})
+    assert [film['uuid'] for film in lines(response)] == expected[12:]
+    response = await api_client.get('/api/v1/films/export', params={'after': expected[-1]})
+    assert response.status_code == HTTPStatus.OK and response.content == b''
+
+
+@pytest.mark.asyncio
+async def test_export_fields_projection(api_client, catalog):
+    # 1. Запрошенные поля и всегда - uuid.
+    response = await api_client.get('/api/v1/persons/export', params={'fields': 'full_name'})
+    assert {tuple(sorted(person)) for person in lines(response)} == {('full_name', 'uuid')}
+    assert len(lines(response)) == len(catalog['persons'])
+
+    # 2. Неизвестное поле - ошибка клиента.
+    response = await api_client.get('/api/v1/films/export', params={'fields': ['title', 'secret']})
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('encoding', ['gzip', 'br'])
+async def test_export_is_compressed_as_a_stream(api_client, catalog, encoding):
+    # Поток сжимается самим обработчиком; httpx распаковывает его так же, как браузер.
+    response = await api_client.get('/api/v1/films/export', headers={'Accept-Encoding': encoding})
+    assert response.headers['content-encoding'] == encoding
+    assert 'content-length' not in response.headers
+    assert len(lines(response)) == len(catalog['movies'])
+
+
+class ExpiringPitElasticsearch:
+    # Клиент Elasticsearch, у которого снимок истекает после первой пачки.
+
+    def __init__(self, docs: list[dict]):
+        self.docs = sorted(docs, key=lambda doc: doc['uuid'])
+        self.closed = []
+
+    async def open_point_in_time(self, index: str, keep_alive: str) -> dict:
+        return {'id': 'pit'}
+
+    async def close_point_in_time(self, id: str) -> None:
+        self.closed.append(id)
+
+    async def search(self, size: int, search_after: list | None = None, pit: dict | None = None, **kwargs) -> dict:
+        if pit and search_after:
+            raise NotFoundError('pit expired', meta=None, body={})
+        docs = [doc for doc in self.docs if not search_after or doc['uuid'] > search_after[0]][:size]
+        return {'hits': {'hits': [{'_source': doc, 'sort': [doc['uuid']]} for doc in docs]}}
+
+
+@pytest.mark.asyncio
+async def test_elastic_scan_continues_without_expired_pit(catalog):
+    # 1. Подготовка данных.
+    client = ExpiringPitElasticsearch(catalog['movies'])
+    db = Elastic(client, pit_keep_alive='1m')
+    expected = sorted(film['uuid'] for film in catalog['movies'])
+
+    # 2. После истечения снимка обход продолжается с той же позиции без пропусков и повторов.
+    batches = [batch async for batch in db.scan('movies', batch_size=8)]
+    assert [len(batch) for batch in batches] == [8, 8, 8, 6]
+    assert [doc['uuid'] for batch in batches for doc in batch] == expected
+    assert client.closed == []
+
+    # 3. Обход в одну пачку снимок не теряет и по завершении закрывает.
+    assert len([batch async for batch in db.scan('movies', batch_size=100)]) == 1
+    assert client.closed == ['pit']
+
+    # 4. Продолжение после заданного uuid.
+    resumed = [doc['uuid'] async for batch in Elastic(client).scan('movies', after=expected[4]) for doc in batch]
+    assert resumed == expected[5:]
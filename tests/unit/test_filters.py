@@ -0,0 +1,83 @@
+import uuid
+from http import HTTPStatus
+
+import pytest
+
+from db.database import AnyOf, Range
+from db.elastic import Elastic
+from db.memory import Index
+from services.film import _db_filters, film_filters
+
+
+def test_query_puts_conditions_into_filter_context():
+    # Строка поиска оценивается в must, условия отбора - в filter; без строки поиска оценка не считается.
+    query = Elastic._query('title', 'star', None, None, [Range('imdb_rating', gte=5, lte=None)])
+    assert query == {'bool': {
+        'must': [{'match': {'title': 'star'}}],
+        'filter': [{'range': {'imdb_rating': {'gte': 5}}}],
+    }}
+    assert Elastic._query(None, None, None, None, [AnyOf('uuid', ('1',))]) == {
+        'constant_score': {'filter': {'bool': {'filter': [{'terms': {'uuid': ['1']}}]}}}
+    }
+    assert Elastic._query(None, None, None, None, []) == {'match_all': {}}
+
+
+def test_filter_clauses():
+    # Ключевые поля - terms, текстовые - match по всем словам значения, вложенные поля - внутри nested.
+    genre_id = uuid.UUID(int=1)
+    assert Elastic._filter(AnyOf('genre.uuid', (genre_id,))) == {
+        'nested': {'path': 'genre', 'query': {'terms': {'genre.uuid': [str(genre_id)]}}}
+    }
+    assert Elastic._filter(AnyOf('genre.name', ('Sci-Fi',), text=True)) == {
+        'nested': {'path': 'genre', 'query': {'match': {'genre.name': {'query': 'Sci-Fi', 'operator': 'and'}}}}
+    }
+    assert Elastic._filter(AnyOf('title', ('a', 'b'), text=True)) == {'bool': {
+        'should': [{'match': {'title': {'query': 'a', 'operator': 'and'}}},
+                   {'match': {'title': {'query': 'b', 'operator': 'and'}}}],
+        'minimum_should_match': 1,
+    }}
+    assert Elastic._filter(Range('imdb_rating', gte=None, lte=7)) == {'range': {'imdb_rating': {'lte': 7}}}
+
+
+def test_memory_text_filter_needs_all_words_of_one_value(catalog):
+    # Как match с operator=and: подходят документы со всеми словами хотя бы одного из значений.
+    index = Index(catalog['movies'])
+    sci_fi = {position for position, film in enumerate(catalog['movies']) if film['genre'][0]['name'] == 'Sci-Fi'}
+    drama = {position for position, film in enumerate(catalog['movies']) if film['genre'][0]['name'] == 'Drama'}
+    assert index.select(AnyOf('genre.name', ('sci-fi',), text=True)) == sci_fi
+    assert index.select(AnyOf('genre.name', ('fi sci',), text=True)) == sci_fi
+    assert index.select(AnyOf('genre.name', ('sci drama',), text=True)) == set()
+    assert index.select(AnyOf('genre.name', ('Sci-Fi', 'drama'), text=True)) == sci_fi | drama
+
+
+def test_film_filters_are_normalized():
+    # Порядок и повторы значений не влияют на условия, а значит, и на ключ кеша.
+    genre_id = uuid.UUID(int=2)
+    assert film_filters(genre=['Drama', 'Comedy', 'Drama'], genre_id=[genre_id, genre_id]) == film_filters(
+        genre=['Comedy', 'Drama'], genre_id=[genre_id]
+    )
+    assert film_filters(genre='Drama')['genre'] == ['Drama']
+    assert _db_filters(**film_filters(genre='Drama', rating_gte=3)) == [
+        AnyOf('genre.name', ('Drama',), text=True), Range('imdb_rating', gte=3, lte=None)
+    ]
+    assert _db_filters(**film_filters()) == []
+
+
+@pytest.mark.asyncio
+async def test_api_filters(api_client, catalog):
+    # 1. Несколько жанров и диапазон рейтинга.
+    response = await api_client.get('/api/v1/films/', params={
+        'genre': ['Drama', 'Comedy'], 'imdb_rating_gte': 3, 'imdb_rating_lte': 6, 'page_size': 50, 'sort': 'uuid'
+    })
+    assert response.status_code == HTTPStatus.OK
+    expected = {film['uuid'] for film in catalog['movies']
+                if film['genre'][0]['name'] in ('Drama', 'Comedy') and 3 <= film['imdb_rating'] <= 6}
+    assert {film['uuid'] for film in response.json()} == expected
+
+    # 2. Отбор по идентификатору жанра и проверка границ рейтинга.
+    response = await api_client.get('/api/v1/films/', params={'genre_id': str(uuid.UUID(int=3)), 'page_size': 50})
+    assert {film['uuid'] for film in response.json()} == {
+        film['uuid'] for film in catalog['movies'] if film['genre'][0]['name'] == 'Sci-Fi'
+    }
+    response = await api_client.get('/api/v1/films/', params={'imdb_rating_gte': 11})
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
@@ -0,0 +1,66 @@
+import uuid
+
+import pytest
+
+from db import localcache
+from db.localcache import LocalCache
+from db.redisdb import RedisDb
+from models.genre import Genre
+
+
+def make_genre(name: str = 'Drama') -> Genre:
+    return Genre(uuid=uuid.uuid4(), name=name)
+
+
+@pytest.mark.asyncio
+async def test_local_cache_serves_repeated_reads_from_l1(redis_client):
+    # 1. Подготовка данных.
+    cache = LocalCache(RedisDb(redis_client), max_size=10, ttl=5)
+    genre = make_genre()
+    await cache.set('genre:1', genre)
+
+    # 2. Первое чтение идет в Redis, повторное - из памяти процесса.
+    assert await cache.get('genre:1', Genre) == genre
+    await redis_client.flushdb()
+    assert await cache.get('genre:1', Genre) == genre
+    assert cache.stats()['hits'] == 1
+
+
+@pytest.mark.asyncio
+async def test_local_cache_evicts_least_recently_used(redis_client):
+    # 1. Подготовка данных.
+    cache = LocalCache(RedisDb(redis_client), max_size=2, ttl=5)
+    genres = {f'genre:{i}': make_genre(f'Genre {i}') for i in range(3)}
+    for name, genre in genres.items():
+        await cache.set(name, genre)
+
+    # 2. Заполняем L1 и обращаемся к genre:0, чтобы вытесненным оказался genre:1.
+    await cache.get('genre:0', Genre)
+    await cache.get('genre:1', Genre)
+    await cache.get('genre:0', Genre)
+    await cache.get('genre:2', Genre)
+
+    # 3. В L1 остались только две последние использованные записи.
+    assert cache.stats()['size'] == 2
+    await redis_client.flushdb()
+    assert await cache.get('genre:0', Genre) == genres['genre:0']
+    assert await cache.get('genre:2', Genre) == genres['genre:2']
+    assert await cache.get('genre:1', Genre) is None
+
+
+@pytest.mark.asyncio
+async def test_local_cache_entries_expire_after_ttl(redis_client, monkeypatch):
+    # 1. Подготовка данных: часы L1 управляются тестом.
+    now = [1000.0]
+    monkeypatch.setattr(localcache.time, 'monotonic', lambda: now[0])
+    cache = LocalCache(RedisDb(redis_client), max_size=10, ttl=5)
+    genre = make_genre()
+    await cache.set('genre:1', genre)
+    await cache.get('genre:1', Genre)
+    await redis_client.flushdb()
+
+    # 2. До истечения TTL запись отдается из L1, после - читается из Redis заново.
+    now[0] += 4.9
+    assert await cache.get('genre:1', Genre) == genre
+    now[0] += 0.2
+    assert await cache.get('genre:1', Genre) is None
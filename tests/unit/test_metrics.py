@@ -0,0 +1,39 @@
+from http import HTTPStatus
+
+import pytest
+
+from core.metrics import REQUEST_LATENCY, RESPONSE_SIZE
+
+
+def sample(metric, suffix: str, **labels) -> float:
+    # Значение серии метрики с заданными метками, 0 - если серии еще нет.
+    for family in metric.collect():
+        for item in family.samples:
+            if item.name == family.name + suffix and item.labels == labels:
+                return item.value
+    return 0.0
+
+
+@pytest.mark.asyncio
+async def test_metrics_use_route_template_status_and_body_size(api_client, catalog):
+    # 1. Подготовка данных: значения метрик до запросов.
+    route = '/api/v1/films/{film_id}'
+    ok = sample(REQUEST_LATENCY, '_count', method='GET', route=route, status='200')
+    not_found = sample(REQUEST_LATENCY, '_count', method='GET', route=route, status='404')
+    unmatched = sample(REQUEST_LATENCY, '_count', method='GET', route='unmatched', status='404')
+    size = sample(RESPONSE_SIZE, '_sum', route=route)
+
+    # 2. Запросы к карточке фильма и к несуществующему пути.
+    # Без сжатия, чтобы размер тела совпадал с content.
+    identity = {'Accept-Encoding': 'identity'}
+    response = await api_client.get('/api/v1/films/' + catalog['movies'][0]['uuid'], headers=identity)
+    assert response.status_code == HTTPStatus.OK
+    missing = await api_client.get('/api/v1/films/00000000-0000-0000-0000-000000000000', headers=identity)
+    assert missing.status_code == HTTPStatus.NOT_FOUND
+    assert (await api_client.get('/nowhere')).status_code == HTTPStatus.NOT_FOUND
+
+    # 3. Запросы учтены по шаблону маршрута и статусу, размер - по отправленному телу.
+    assert sample(REQUEST_LATENCY, '_count', method='GET', route=route, status='200') == ok + 1
+    assert sample(REQUEST_LATENCY, '_count', method='GET', route=route, status='404') == not_found + 1
+    assert sample(REQUEST_LATENCY, '_count', method='GET', route='unmatched', status='404') == unmatched + 1
+    assert sample(RESPONSE_SIZE, '_sum', route=route) == size + len(response.content) + len(missing.content)
@@ -0,0 +1,70 @@
+import uuid
+
+import pytest
+
+from core.config import cache_settings
+from db.cache import NOT_FOUND
+from db.memory import MemoryDataBase
+from db.redisdb import RedisDb
+from models.film import Film
+from services.film import FilmService
+
+
+class CountingDataBase(MemoryDataBase):
+    # Считает обращения к базе.
+
+    def __init__(self, documents: dict[str, list[dict]]):
+        super().__init__(documents)
+        self.calls = 0
+
+    async def get(self, *args, **kwargs):
+        self.calls += 1
+        return await super().get(*args, **kwargs)
+
+    async def search(self, *args, **kwargs):
+        self.calls += 1
+        return await super().search(*args, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_missing_film_is_cached_as_tombstone(redis_client):
+    # 1. Подготовка данных.
+    db = CountingDataBase({'movies': []})
+    cache = RedisDb(redis_client)
+    service = FilmService(cache, db)
+    film_id = str(uuid.uuid4())
+
+    # 2. Отсутствие фильма запоминается на negative_ttl, повторный запрос не доходит до базы.
+    assert await service.get_by_id(film_id) is None
+    assert await service.get_by_id(film_id) is None
+    assert db.calls == 1
+    assert await cache.get('movie:' + film_id, Film) is NOT_FOUND
+    [key] = await redis_client.keys('*movie:' + film_id)
+    ttl = await redis_client.ttl(key)
+    assert 0 < ttl <= cache_settings.negative_ttl
+
+
+@pytest.mark.asyncio
+async def test_missing_response_and_empty_search_are_cached(redis_client):
+    # 1. Подготовка данных.
+    db = CountingDataBase({'movies': []})
+    service = FilmService(RedisDb(redis_client), db)
+    film_id = str(uuid.uuid4())
+
+    # 2. Отсутствующая карточка и пустой результат поиска тоже кешируются.
+    for _ in range(2):
+        assert await service.get_by_id_response(film_id, serializer=bytes) is None
+        assert await service.get_films_response(serializer=bytes, sort=None, query='nothing', per_page=10) is None
+    assert db.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_tombstone_is_not_confused_with_a_miss(redis_client):
+    # 1. Подготовка данных.
+    cache = RedisDb(redis_client)
+    await cache.set('movie:1', NOT_FOUND, ex=30)
+
+    # 2. Отметка об отсутствии отличается от промаха (None) и ложна в условиях.
+    assert await cache.get('movie:1', Film) is NOT_FOUND
+    assert await cache.get('movie:2', Film) is None
+    assert not NOT_FOUND
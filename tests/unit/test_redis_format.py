@@ -0,0 +1,65 @@
+import uuid
+
+import orjson
+import pytest
+
+from db.redisdb import RedisDb
+from models.film import Film
+from models.genre import Genre
+
+
+def make_genres(count: int = 3) -> list[Genre]:
+    return [Genre(uuid=uuid.uuid4(), name=f'Genre {i}') for i in range(count)]
+
+
+@pytest.mark.asyncio
+async def test_list_is_stored_as_one_flat_json_array(redis_client):
+    # 1. Подготовка данных.
+    cache = RedisDb(redis_client)
+    genres = make_genres()
+
+    # 2. Список пишется одним массивом объектов и читается обратно.
+    await cache.set('genres:', genres)
+    stored = orjson.loads(await redis_client.get('genres:'))
+    assert stored == [orjson.loads(genre.model_dump_json()) for genre in genres]
+    assert await cache.get_list('genres:', Genre) == genres
+
+
+@pytest.mark.asyncio
+async def test_legacy_list_of_json_strings_is_still_read(redis_client):
+    # 1. Подготовка данных: запись в формате до user-005 - JSON-массив JSON-строк.
+    cache = RedisDb(redis_client)
+    genres = make_genres()
+    await redis_client.set('genres:', orjson.dumps([genre.model_dump_json() for genre in genres]))
+
+    # 2. Старая запись дочитывается без ошибок.
+    assert await cache.get_list('genres:', Genre) == genres
+
+
+@pytest.mark.asyncio
+async def test_key_prefix_separates_value_formats(redis_client):
+    # 1. Подготовка данных: в общем ключе лежит запись старой версии в формате, который новая не пишет.
+    await redis_client.set('movie:1', b'not a model')
+    old = RedisDb(redis_client)
+    new = RedisDb(redis_client, key_prefix='v2:')
+    genres = make_genres()
+
+    # 2. Версии с разными префиксами не читают записи друг друга.
+    assert await new.get('movie:1', Film) is None
+    await new.set('genres:', genres)
+    assert await old.get_list('genres:', Genre) is None
+    assert await new.get_list('genres:', Genre) == genres
+    assert await redis_client.exists('v2:genres:')
+
+
+@pytest.mark.asyncio
+async def test_key_prefix_applies_to_tags_and_responses(redis_client):
+    # 1. Подготовка данных.
+    cache = RedisDb(redis_client, key_prefix='v2:')
+    genre = make_genres(1)[0]
+    await cache.set('genre:' + str(genre.uuid), genre)
+
+    # 2. Множество тега и его элементы - ключи с префиксом, поэтому сброс по тегу удаляет запись.
+    assert await redis_client.zrange(f'v2:tag:genre:{genre.uuid}', 0, -1) == [f'v2:genre:{genre.uuid}'.encode()]
+    assert await cache.invalidate([f'genre:{genre.uuid}']) == 1
+    assert await cache.get('genre:' + str(genre.uuid), Genre) is None
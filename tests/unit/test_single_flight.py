@@ -0,0 +1,68 @@
+import asyncio
+import uuid
+
+import pytest
+
+from db.memory import MemoryDataBase
+from db.redisdb import RedisDb
+from models.film import Film
+from services.film import FilmService
+
+FILM = {
+    'uuid': str(uuid.uuid4()), 'title': 'Star Wars', 'imdb_rating': 8.6, 'description': None,
+    'genre': [], 'actors': [], 'writers': [], 'directors': [],
+}
+
+
+class GatedDataBase(MemoryDataBase):
+    # Обращения к базе считаются и ждут разрешения теста.
+
+    def __init__(self, documents: dict[str, list[dict]]):
+        super().__init__(documents)
+        self.calls = 0
+        self.gate = asyncio.Event()
+
+    async def get(self, *args, **kwargs):
+        self.calls += 1
+        await self.gate.wait()
+        return await super().get(*args, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_load(redis_client):
+    # 1. Подготовка данных.
+    db = GatedDataBase({'movies': [FILM]})
+    service = FilmService(RedisDb(redis_client), db)
+
+    # 2. Одновременные запросы одного отсутствующего в кеше фильма.
+    requests = [asyncio.ensure_future(service.get_by_id(FILM['uuid'])) for _ in range(10)]
+    await asyncio.sleep(0.01)
+    db.gate.set()
+    films = await asyncio.gather(*requests)
+
+    # 3. База запрошена один раз, результат получили все.
+    assert db.calls == 1
+    assert {str(film.uuid) for film in films} == {FILM['uuid']}
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_cancel_shared_load(redis_client):
+    # 1. Подготовка данных.
+    db = GatedDataBase({'movies': [FILM]})
+    cache = RedisDb(redis_client)
+    service = FilmService(cache, db)
+    first = asyncio.ensure_future(service.get_by_id(FILM['uuid']))
+    second = asyncio.ensure_future(service.get_by_id(FILM['uuid']))
+    await asyncio.sleep(0.01)
+
+    # 2. Отмена одного из ожидающих не прерывает общую загрузку.
+    first.cancel()
+    db.gate.set()
+    film = await second
+
+    # 3. Второй запрос получил фильм, а загруженное значение попало в кеш.
+    assert first.cancelled()
+    assert str(film.uuid) == FILM['uuid']
+    assert db.calls == 1
+    assert not service._in_flight
+    assert await cache.get('movie:' + FILM['uuid'], Film) == film
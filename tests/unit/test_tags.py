@@ -0,0 +1,117 @@
+import uuid
+
+import pytest
+
+from db.cache import CachedResponse, NOT_FOUND
+from db.memory import MemoryDataBase
+from db.redisdb import RedisDb
+from db.tags import entity_tag, entity_tags, index_tag
+from models.film import Film, FilmShort, Genre, Person
+from services.film import FilmService
+
+
+def make_genre() -> Genre:
+    return Genre(uuid=uuid.uuid4(), name='Drama')
+
+
+def test_entity_tags_cover_nested_models():
+    # Фильм помечается своим тегом и тегами жанров и персон, список - тегами всех элементов.
+    genre = make_genre()
+    actor = Person(uuid=uuid.uuid4(), full_name='Actor')
+    film = Film(uuid=uuid.uuid4(), title='Film', imdb_rating=5, description=None, genre=[genre], actors=[actor],
+                writers=[], directors=[])
+    assert entity_tags(film) == {f'film:{film.uuid}', f'genre:{genre.uuid}', f'person:{actor.uuid}'}
+    short = [FilmShort(uuid=uuid.uuid4(), title='A', imdb_rating=None) for _ in range(2)]
+    assert entity_tags(short) == {f'film:{item.uuid}' for item in short}
+
+
+@pytest.mark.asyncio
+async def test_tag_set_lives_as_long_as_longest_entry(redis_client):
+    # 1. Подготовка данных.
+    cache = RedisDb(redis_client)
+    genre = make_genre()
+    tag = f'tag:genre:{genre.uuid}'
+
+    # 2. Время жизни множества растет до самой долгоживущей записи и не сокращается более короткой.
+    await cache.set('genre:a', genre, ex=100)
+    assert 90 < await redis_client.ttl(tag) <= 100
+    await cache.set('genre:b', genre, ex=300)
+    assert 290 < await redis_client.ttl(tag) <= 300
+    await cache.set('genre:c', genre, ex=10)
+    assert 290 < await redis_client.ttl(tag) <= 300
+
+    # 3. Бессрочная запись делает множество бессрочным, и последующие записи с TTL этого не меняют.
+    await cache.set('genre:d', genre)
+    assert await redis_client.ttl(tag) == -1
+    await cache.set('genre:e', genre, ex=10)
+    assert await redis_client.ttl(tag) == -1
+    assert await redis_client.zcard(tag) == 5
+
+
+@pytest.mark.asyncio
+async def test_tag_set_drops_expired_entries_on_write(redis_client):
+    # 1. Подготовка данных: часы кеша управляются тестом.
+    now = [1000.0]
+    cache = RedisDb(redis_client, clock=lambda: now[0])
+    genre = make_genre()
+    tag = f'tag:genre:{genre.uuid}'
+    await cache.set('genre:a', genre, ex=10)
+    await cache.set('genre:b', genre, ex=300)
+
+    # 2. Следующая запись удаляет из множества истекшие записи.
+    now[0] += 20
+    await cache.set('genre:c', genre, ex=100)
+    assert await redis_client.zrange(tag, 0, -1) == [b'genre:c', b'genre:b']
+
+    # 3. Множество живет столько, сколько самая долгоживущая из оставшихся записей.
+    now[0] += 290
+    await cache.set('genre:d', genre, ex=50)
+    assert await redis_client.zrange(tag, 0, -1) == [b'genre:d']
+    assert 40 < await redis_client.ttl(tag) <= 50
+
+
+@pytest.mark.asyncio
+async def test_invalidate_deletes_large_tag_sets_in_chunks(redis_client):
+    # 1. Подготовка данных: записей под одним тегом больше, чем удаляется одной командой DEL.
+    cache = RedisDb(redis_client)
+    genre = make_genre()
+    await cache.mset({f'genre:{i}': genre for i in range(2500)}, ex=60)
+    await cache.set('genre:other', make_genre(), ex=60)
+
+    # 2. Сброс по тегу удаляет все записи и само множество, не трогая остальные ключи.
+    assert await cache.invalidate([f'genre:{genre.uuid}', 'genre:unknown']) == 2500
+    assert not await redis_client.exists(f'tag:genre:{genre.uuid}', 'genre:0', 'genre:2499')
+    assert await cache.get('genre:other', Genre)
+    assert await cache.invalidate([]) == 0
+
+
+@pytest.mark.asyncio
+async def test_invalidate_removes_tagged_responses(redis_client):
+    # 1. Подготовка данных: ответ помечен тегом сущности и дополнительным тегом.
+    cache = RedisDb(redis_client)
+    response = CachedResponse(body=b'[]', etag='"e"', tags=frozenset({'film:1', 'index:movies'}))
+    await cache.set_response('response:movies:', response, ex=60)
+
+    # 2. Ответ удаляется сбросом по любому из тегов.
+    assert await cache.get_response('response:movies:')
+    assert await cache.invalidate(['index:movies']) == 1
+    assert await cache.get_response('response:movies:') is None
+
+
+@pytest.mark.asyncio
+async def test_tombstones_are_tagged(redis_client):
+    # 1. Подготовка данных: фильма нет в базе, поиск ничего не находит.
+    cache = RedisDb(redis_client)
+    service = FilmService(cache, MemoryDataBase({'movies': []}))
+    film_id = '00000000-0000-0000-0000-000000000001'
+    assert await service.get_by_id(film_id) is None
+    assert await service.get_by_id_response(film_id, serializer=bytes) is None
+    assert await service.get_films_response(serializer=bytes, sort=None, query='new', per_page=10) is None
+    assert await cache.get_response('response:movie:' + film_id) is NOT_FOUND
+
+    # 2. Отметки об отсутствии фильма сбрасываются его тегом, отметка о пустом поиске - тегом индекса.
+    assert await cache.invalidate([entity_tag('film', film_id)]) == 2
+    assert await cache.get('movie:' + film_id, Film) is None
+    assert await cache.get_response('response:movie:' + film_id) is None
+    assert await cache.invalidate([index_tag('movies')]) == 1
+    assert not await redis_client.keys('response:movies:*')
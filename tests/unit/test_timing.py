@@ -0,0 +1,24 @@
+import logging
+
+import pytest
+
+from core.config import server_timing_settings
+
+
+@pytest.mark.asyncio
+async def test_server_timing_header_and_slow_request_log(api_client, catalog, monkeypatch, caplog):
+    # 1. Подготовка данных: каждый запрос считается медленным.
+    monkeypatch.setattr(server_timing_settings, 'slow_request_ms', 0.001)
+    path = '/api/v1/films/' + catalog['movies'][0]['uuid']
+
+    # 2. Промах кеша: в заголовке есть фазы загрузки и общее время.
+    with caplog.at_level(logging.WARNING, logger='api.timing'):
+        response = await api_client.get(path)
+    phases = dict(metric.split(';dur=') for metric in response.headers['server-timing'].split(', '))
+    assert {'redis', 'serialize', 'total'} <= set(phases)
+    assert all(float(duration) >= 0 for duration in phases.values())
+
+    # 3. Медленный запрос записан в лог с той же разбивкой по фазам.
+    [record] = [record for record in caplog.records if record.name == 'api.timing']
+    assert record.getMessage().startswith('Slow request GET ' + path)
+    assert response.headers['server-timing'] in record.getMessage()
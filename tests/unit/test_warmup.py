@@ -0,0 +1,48 @@
+import pytest
+
+from db import cache as cache_module
+from db import database
+from db.memory import MemoryDataBase
+from db.redisdb import RedisDb
+from services import genre
+from services.film import FilmService
+from services.genre import GenreService
+from warmup import LOCK_KEY, warm_up, warm_up_current
+
+
+@pytest.mark.asyncio
+async def test_warm_up_caches_top_film_cards_without_list_keys(redis_client, catalog):
+    # 1. Подготовка данных.
+    db = MemoryDataBase(catalog)
+    cache = RedisDb(redis_client)
+    film_service = FilmService(cache, db)
+    stats = await warm_up(film_service, GenreService(cache, db), pages=1, page_size=10, top_films=5)
+
+    # 2. Прогреты карточки пяти фильмов с наибольшим рейтингом.
+    assert stats['failed'] == 0
+    top = sorted(catalog['movies'], key=lambda film: -film['imdb_rating'])[:5]
+    keys = {key.decode() for key in await redis_client.keys('*')}
+    assert {key for key in keys if key.startswith('response:movie:')} == {
+        'response:movie:' + film['uuid'] for film in top
+    }
+
+    # 3. Прогреты все страницы /genres, а записей кеша списков, которые API не читает, прогрев не создает.
+    assert {key for key in keys if key.startswith('response:genres:')}
+    assert not [key for key in keys if key.startswith(('movies:', 'genres:'))]
+
+
+@pytest.mark.asyncio
+async def test_warm_up_current_runs_once_per_lock(redis_client, catalog, monkeypatch):
+    # 1. Подготовка данных: подключения приложения без справочника жанров.
+    cache = RedisDb(redis_client, key_prefix='v1:')
+    monkeypatch.setattr(cache_module, 'cache', cache)
+    monkeypatch.setattr(database, 'db', MemoryDataBase(catalog))
+    monkeypatch.setattr(genre, 'catalog', None)
+
+    # 2. Прогрев выполняет только тот, кто первым взял блокировку; она живет lock_ttl секунд.
+    assert await warm_up_current(lock_ttl=60, pages=1, top_films=1)
+    assert await warm_up_current(lock_ttl=60, pages=1, top_films=1) is None
+    assert 50 < await redis_client.ttl('v1:' + LOCK_KEY) <= 60
+
+    # 3. Без lock_ttl (запуск командой) блокировка не проверяется.
+    assert await warm_up_current(pages=1, top_films=1)
@@ -0,0 +1,101 @@
+import asyncio
+import math
+
+import pytest
+
+from db.cache import CachedResponse
+from db.memory import MemoryDataBase
+from db.redisdb import RedisDb
+from db.xfetch import should_recompute
+from services.film import FILM_CACHE_EXPIRE_IN_SECONDS, FilmService
+
+
+class CountingDataBase(MemoryDataBase):
+    # Считает обращения к базе.
+
+    def __init__(self, documents: dict[str, list[dict]]):
+        super().__init__(documents)
+        self.calls = 0
+
+    async def get(self, *args, **kwargs):
+        self.calls += 1
+        return await super().get(*args, **kwargs)
+
+
+def serialize(film) -> bytes:
+    return film.model_dump_json().encode()
+
+
+def test_should_recompute_window_depends_on_delta_rand_and_beta():
+    # Окно досрочного обновления: delta * beta * -ln(rand) секунд до expiry.
+    window = 10 * -math.log(0.5)
+    assert not should_recompute(delta=10, expiry=100, now=100 - window - 0.01, rand=0.5)
+    assert should_recompute(delta=10, expiry=100, now=100 - window + 0.01, rand=0.5)
+    assert should_recompute(delta=10, expiry=100, now=100 - 2 * window + 0.01, rand=0.5, beta=2)
+    # Дешевое значение или rand = 1 обновляются только по истечении, после него - всегда.
+    assert not should_recompute(delta=0, expiry=100, now=99.99, rand=0.001)
+    assert not should_recompute(delta=10, expiry=100, now=99.99, rand=1.0)
+    assert should_recompute(delta=0, expiry=100, now=100, rand=1.0)
+    assert should_recompute(delta=10, expiry=100, now=150, rand=1.0)
+    # rand = 0 не приводит к ошибке логарифма.
+    assert should_recompute(delta=10, expiry=100, now=0, rand=0.0)
+
+
+@pytest.mark.asyncio
+async def test_get_response_refresh_follows_clock_and_rand(redis_client):
+    # 1. Подготовка данных: часы и случайное число фиксированы.
+    now = [1000.0]
+    cache = RedisDb(redis_client, clock=lambda: now[0], rand=lambda: 0.5)
+    window = 10 * -math.log(0.5)
+    await cache.set_response('response:1', CachedResponse(body=b'{}', delta=10, expiry=1060, etag='"e"'), ex=120)
+
+    # 2. До окна XFetch ответ свежий, в окне и после expiry - просит обновления.
+    assert not (await cache.get_response('response:1')).refresh
+    now[0] = 1060 - window + 0.01
+    assert (await cache.get_response('response:1')).refresh
+    now[0] = 1070
+    assert (await cache.get_response('response:1')).refresh
+
+
+@pytest.mark.asyncio
+async def test_service_expiry_uses_injected_clock(redis_client, catalog):
+    # 1. Подготовка данных: сервис и кеш работают по одним часам.
+    now = [1000.0]
+    film_id = catalog['movies'][0]['uuid']
+    db = CountingDataBase(catalog)
+    service = FilmService(RedisDb(redis_client, clock=lambda: now[0], rand=lambda: 1.0), db, clock=lambda: now[0])
+
+    # 2. Момент устаревания считается по часам сервиса, а не по системному времени.
+    first = await service.get_by_id_response(film_id, serializer=serialize)
+    assert first.expiry == 1000 + FILM_CACHE_EXPIRE_IN_SECONDS
+
+    # 3. Пока часы не дошли до expiry, ответ отдается из кеша без обращения к базе.
+    now[0] += FILM_CACHE_EXPIRE_IN_SECONDS - 1
+    assert not (await service.get_by_id_response(film_id, serializer=serialize)).refresh
+    assert db.calls == 1
+
+    # 4. После expiry ответ отдается из кеша, а обновление идет в фоне.
+    now[0] += 1
+    assert (await service.get_by_id_response(film_id, serializer=serialize)).refresh
+    await asyncio.gather(*service._in_flight.values())
+    assert db.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_background_refresh_keeps_stale_response_on_empty_result(redis_client, catalog):
+    # 1. Подготовка данных: ответ закеширован, после чего документ пропал из базы (например, на время переиндексации).
+    now = [1000.0]
+    film_id = catalog['movies'][0]['uuid']
+    cache = RedisDb(redis_client, clock=lambda: now[0], rand=lambda: 1.0)
+    service = FilmService(cache, MemoryDataBase(catalog), clock=lambda: now[0])
+    first = await service.get_by_id_response(film_id, serializer=serialize)
+    service.db = MemoryDataBase({'movies': []})
+
+    # 2. После expiry фоновое обновление получает пустой результат и не пишет отметку об отсутствии.
+    now[0] += FILM_CACHE_EXPIRE_IN_SECONDS
+    assert (await service.get_by_id_response(film_id, serializer=serialize)).refresh
+    await asyncio.gather(*service._in_flight.values())
+
+    # 3. Устаревший ответ по-прежнему отдается из кеша.
+    stale = await cache.get_response('response:movie:' + film_id)
+    assert stale and stale.body == first.body